@@ -8,7 +8,7 @@ Renamed features:
     - AGE_bin_ --> Age_bin_
     - AGE_rounded_ ---> Age_rounded_
 
-Created: 2021.03.17 / Updated: 2021.03.22
+Created: 2021.03.17 / Updated: 2026.10.19
 """
 import pandas as pd
 import seaborn as sns
@@ -16,9 +16,15 @@ import matplotlib.pyplot as plt
 from sklearn.model_selection import StratifiedShuffleSplit
 
 import mci_info as minfo
+import mci_log as mlog
+import mci_utils as mutils
+import mci_profile as mprof
 
+log = mlog.get_logger('balancing')
 
 
+
+@mprof.profiled
 def train_test_split_baseline(bl_df, age_bins=[50,60,70,80,95], split_categories=['Age_bin_', 'Subgroup_', 'PTGENDER'],
                               random_state=42, test_size=0.2, df_name='bl', sh=True):
     """
@@ -34,13 +40,14 @@ def train_test_split_baseline(bl_df, age_bins=[50,60,70,80,95], split_categories
     split_categories - a list of categories to split
     
     
-    C: 2021.03.17 / M: 2021.03.31
+    C: 2021.03.17 / M: 2026.10.19
     """
 
     age_bin_labels = [f'({age_bins[i]}-{age_bins[i+1]}]' for i in range(len(age_bins[:-1]))]
-    bl_df['Age_bin_'] = pd.cut(bl_df.Age_rounded_, bins=age_bins, labels=age_bin_labels)
+    # in the 'pure' execution mode bl_df is not changed (see mci_utils.set_execution_mode)
+    bl_df = mutils.assign_columns(bl_df, {'Age_bin_': pd.cut(bl_df.Age_rounded_, bins=age_bins, labels=age_bin_labels)})
     if sh:
-        print(f'A new column "Age_bin_" is added to the "{df_name}" table')
+        mlog.event(log, 'A new column "%s" is added to the "%s" table', 'Age_bin_', df_name, column='Age_bin_', table=df_name)
 
     # splitting 
     split = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
@@ -52,7 +59,7 @@ def train_test_split_baseline(bl_df, age_bins=[50,60,70,80,95], split_categories
     train_set = train_set.assign(Usage_='train')
     test_set = test_set.assign(Usage_='test')
     if sh:
-        print(f'A new column "Usage_" is added to the "{df_name}" table')
+        mlog.event(log, 'A new column "%s" is added to the "%s" table', 'Usage_', df_name, column='Usage_', table=df_name)
 
     bl_new = pd.concat([train_set, test_set])
     return bl_new
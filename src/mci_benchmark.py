@@ -0,0 +1,279 @@
+"""
+Auxiliary BENCHMARK functions.
+
+Times the main mci_* pipeline functions on synthetic ADNI-like data (mci_synthetic) of different sizes:
+    - mci_linking.link_*,
+    - mci_preprocessing.count_*, count_sMCI_cAD, faq_pos_neg_classification, reorder_columns,
+    - mci_permutation.shuffle_features_with_groups, dropcol_importances.
+
+Results are appended to a csv file, so runs (e.g. before and after a change) can be compared with compare_benchmarks().
+
+Peak memory of the preprocessing pipeline in execution modes (see mci_utils.set_execution_mode) is measured
+with memory_benchmark().
+
+Usage:
+--------------------------
+res = mbench.run_benchmarks(sizes=[1000, 10000], repeat=3, results_file=RESULTS_DIR / 'benchmarks.csv')
+mbench.compare_benchmarks(RESULTS_DIR / 'benchmarks.csv')
+mbench.memory_benchmark(n_rows=100000)
+
+or from a command line:
+python mci_benchmark.py --sizes 1000 10000 --results benchmarks.csv
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import io
+import sys
+import time
+import logging
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import mci_log as mlog
+import mci_utils as mutils
+import mci_synthetic as msyn
+import mci_linking as mlink
+import mci_preprocessing as mpre
+import mci_permutation as mperm
+
+
+RESULT_COLS = ['run_id', 'benchmark', 'n_rows', 'seconds', 'repeat', 'python', 'pandas', 'numpy']
+
+# features used to fit a RF model in permutation benchmarks
+RF_FEATURES = ['AGE', 'RAVLT_immediate', 'AVDEL30MIN_neuro', 'AVDELTOT_neuro', 'TRAASCOR_neuro', 'TRABSCOR_neuro',
+               'CATANIMSC_neuro', 'GDTOTAL_gds', 'FAQ']
+
+
+def _time(func, args_factory, repeat):
+    """
+    The best wall time of `repeat` calls: func(*args_factory()). Arguments are created (e.g. copied) outside of the timing.
+    Printed and logged (below warnings) output of func is discarded.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    best = np.inf
+    level = logging.getLogger(mlog.ROOT).level
+    mlog.quiet()
+    try:
+        for _ in range(repeat):
+            args = args_factory()
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                func(*args)
+                best = min(best, time.perf_counter() - t0)
+    finally:
+        mlog.set_level(level)
+    return best
+
+
+def make_benchmark_data(n_rows, data_dir, random_state=42):
+    """
+    Creates synthetic tables for benchmarks: the long table before linking, source files in `data_dir`,
+    the linked long table and a bl train/test set for a RF model.
+
+    Returns:
+    --------------------------
+    a dict with: 'long_raw', 'long_sub', 'long_linked', 'data_dir', 'X_train', 'y_train', 'X_test', 'y_test'.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    data_dir = Path(data_dir)
+    merge = msyn.make_adnimerge(n_rows, random_state=random_state)
+    long_raw = msyn.make_long(merge)
+    msyn.write_source_tables(long_raw, data_dir, random_state=random_state)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        long_sub = mpre.count_sMCI_cAD(long_raw)
+        long = long_sub
+        for link in [mlink.link_neurobat, mlink.link_adas, mlink.link_gdscale, mlink.link_faq]:
+            long = link(long, data_dir)
+        long = mlink.link_freesurfer(long, data_dir, msyn.FS_FILE_NAME)
+
+    bl = long.loc[long.VISCODE3_ == 'bl']
+    bl = bl.drop_duplicates(subset=['RID'])
+    X = bl[RF_FEATURES].fillna(bl[RF_FEATURES].median())
+    y = (bl.Subgroup_ == 'cAD').astype(int)
+    n_train = int(0.8 * X.shape[0])
+
+    return {'long_raw': long_raw, 'long_sub': long_sub, 'long_linked': long, 'data_dir': data_dir,
+            'X_train': X.iloc[:n_train], 'y_train': y.iloc[:n_train], 'X_test': X.iloc[n_train:], 'y_test': y.iloc[n_train:]}
+
+
+def _benchmarks(data, n_estimators=50, repetitions=5):
+    """
+    A dict: benchmark name -> (function, arguments factory).
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    d = data
+    rf = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=-1).fit(d['X_train'], d['y_train'])
+
+    return {
+        'link_neurobat': (mlink.link_neurobat, lambda: (d['long_sub'], d['data_dir'])),
+        'link_adas': (mlink.link_adas, lambda: (d['long_sub'], d['data_dir'])),
+        'link_gdscale': (mlink.link_gdscale, lambda: (d['long_sub'], d['data_dir'])),
+        'link_faq': (mlink.link_faq, lambda: (d['long_sub'], d['data_dir'])),
+        'link_freesurfer': (mlink.link_freesurfer, lambda: (d['long_sub'], d['data_dir'], msyn.FS_FILE_NAME)),
+        'count_MR_images_for_patient': (mpre.count_MR_images_for_patient, lambda: (d['long_raw'].copy(),)),
+        'count_visits_for_patient': (mpre.count_visits_for_patient, lambda: (d['long_raw'].copy(),)),
+        'count_score_nr_for_patient': (mpre.count_score_nr_for_patient,
+                                       lambda: (d['long_raw'].copy(), 'ADAS13_adni', 'ADAS13_adni_Nr_')),
+        'count_sMCI_cAD': (mpre.count_sMCI_cAD, lambda: (d['long_raw'],)),
+        'faq_pos_neg_classification': (mpre.faq_pos_neg_classification, lambda: (d['long_linked'].copy(),)),
+        'reorder_columns': (mpre.reorder_columns, lambda: (d['long_linked'],)),
+        'shuffle_features_with_groups': (lambda *a: mperm.shuffle_features_with_groups(*a, verbose=False, repetitions=repetitions),
+                                         lambda: (rf, d['X_test'], d['y_test'])),
+        'dropcol_importances': (lambda *a: mperm.dropcol_importances(*a, verbose=False),
+                                lambda: (rf, d['X_train'], d['y_train'], d['X_test'], d['y_test'])),
+    }
+
+
+def run_benchmarks(sizes=(1000, 10000), repeat=3, benchmarks=None, results_file=None, run_id=None, random_state=42):
+    """
+    Runs benchmarks on synthetic data of each size (number of rows of the long table).
+
+    Parameters:
+    --------------------------
+    sizes - a list of long table sizes (rows), e.g. [1000, 10000, 100000],
+    repeat - number of repetitions, the best time is reported,
+    benchmarks - a list of benchmark names to run (default: all, see _benchmarks()),
+    results_file - a csv file to append the results to (None: not saved),
+    run_id - a name of the run (default: current date and time).
+
+    Returns:
+    --------------------------
+    a df with columns: run_id, benchmark, n_rows, seconds, repeat, python, pandas, numpy.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    run_id = run_id if run_id else time.strftime('%Y.%m.%d-%H:%M:%S')
+    rows = []
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            data = make_benchmark_data(n_rows, tmp, random_state)
+            for name, (func, args_factory) in _benchmarks(data).items():
+                if benchmarks and name not in benchmarks:
+                    continue
+                seconds = _time(func, args_factory, repeat)
+                rows.append([run_id, name, n_rows, seconds, repeat, platform.python_version(), pd.__version__, np.__version__])
+                print(f'{name:<30} n_rows={n_rows:<8} {seconds:.4f} s')
+
+    res = pd.DataFrame(rows, columns=RESULT_COLS)
+    if results_file:
+        results_file = Path(results_file)
+        res.to_csv(results_file, mode='a', header=not results_file.exists(), index=False)
+        print(f'\nBenchmark results appended to:\n\t\t{results_file}\n')
+    return res
+
+
+def compare_benchmarks(results_file, baseline_run=None, current_run=None, tolerance=0.2):
+    """
+    Compares two benchmark runs stored in the results file (default: the last two runs).
+
+    A benchmark is flagged as a regression if: current > baseline * (1 + tolerance).
+
+    Returns:
+    --------------------------
+    a df with columns: benchmark, n_rows, baseline, current, ratio, regression.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    res = pd.read_csv(results_file)
+    runs = res.run_id.drop_duplicates().to_list()
+    if baseline_run is None or current_run is None:
+        if len(runs) < 2:
+            print('At least two runs are needed to compare!')
+            return pd.DataFrame()
+        baseline_run = baseline_run if baseline_run else runs[-2]
+        current_run = current_run if current_run else runs[-1]
+
+    base = res.loc[res.run_id == baseline_run, ['benchmark', 'n_rows', 'seconds']]
+    cur = res.loc[res.run_id == current_run, ['benchmark', 'n_rows', 'seconds']]
+    cmp = base.merge(cur, on=['benchmark', 'n_rows'], suffixes=['_baseline', '_current'])
+    cmp = cmp.rename(columns={'seconds_baseline': 'baseline', 'seconds_current': 'current'})
+    cmp['ratio'] = cmp['current'] / cmp['baseline']
+    cmp['regression'] = cmp['ratio'] > 1 + tolerance
+    print(f'Baseline run: {baseline_run}, current run: {current_run}\n')
+    return cmp
+
+
+def _preprocessing_pipeline(long, copy):
+    """
+    count_* and FAQ stages of the preprocessing. copy=True - a defensive full copy of the input table before each stage.
+    """
+    stages = [mpre.count_MR_images_for_patient, mpre.count_visits_for_patient,
+              lambda df: mpre.count_score_nr_for_patient(df, 'ADAS13_adni', 'ADAS13_adni_Nr_'),
+              mpre.faq_pos_neg_classification]
+    for stage in stages:
+        long = stage(long.copy() if copy else long)
+    return long
+
+
+def memory_benchmark(n_rows=10000, random_state=42):
+    """
+    Peak traced memory (tracemalloc) and wall time of the preprocessing pipeline (count_* and FAQ stages) in modes:
+        'copy'    - 'inplace' execution mode, the caller protects its table with a full copy before each stage,
+        'inplace' - 'inplace' execution mode, the caller's table is modified,
+        'pure'    - 'pure' execution mode with Copy-on-Write, the caller's table is not modified.
+    
+    Returns:
+    --------------------------
+    a df with columns: mode, n_rows, peak_mb, seconds, input_changed.
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        data = make_benchmark_data(n_rows, tmp, random_state)
+    long = data['long_linked']
+    
+    mode0 = mutils.get_execution_mode()
+    cow0 = pd.get_option('mode.copy_on_write')
+    level = logging.getLogger(mlog.ROOT).level
+    mlog.quiet()
+    rows = []
+    try:
+        for mode, execution_mode, copy in [('copy', 'inplace', True), ('inplace', 'inplace', False), ('pure', 'pure', False)]:
+            mutils.set_execution_mode(execution_mode)
+            # a fresh input table (created in the current Copy-on-Write mode), not traced
+            df = long.copy()
+            cols0 = df.shape[1]
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            _preprocessing_pipeline(df, copy)
+            seconds = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rows.append([mode, n_rows, peak / 1024 ** 2, seconds, df.shape[1] != cols0])
+            del df
+    finally:
+        mutils.set_execution_mode(mode0)
+        pd.set_option('mode.copy_on_write', cow0)
+        mlog.set_level(level)
+    return pd.DataFrame(rows, columns=['mode', 'n_rows', 'peak_mb', 'seconds', 'input_changed'])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmarks of mci_* functions on synthetic data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--benchmarks', nargs='*', default=None)
+    parser.add_argument('--results', default=None, help='a csv file to append results to')
+    parser.add_argument('--compare', action='store_true', help='compare the last two runs in the results file')
+    parser.add_argument('--memory', action='store_true', help='peak memory of the preprocessing in execution modes')
+    a = parser.parse_args()
+
+    run_benchmarks(a.sizes, a.repeat, a.benchmarks, a.results)
+    if a.compare and a.results:
+        print(compare_benchmarks(a.results).to_string(), file=sys.stdout)
+    if a.memory:
+        for n_rows in a.sizes:
+            print(memory_benchmark(n_rows).to_string(index=False), file=sys.stdout)
@@ -0,0 +1,127 @@
+"""
+Auxiliary COLUMN FAMILY registry of MCI tables.
+
+Columns are classified by their suffix (the table they come from):
+    - adas  ('_adas'),
+    - neuro ('_neuro'),
+    - gds   ('_gds'),
+    - faq   ('_faq'),
+    - long  ('_long'),
+    - cross ('_cross'),
+    - ours  ('_', columns created by us, e.g. 'Subgroup_', 'FAQFINAN_faq_cod_'),
+    - adni  (all other columns, ADNIMERGE).
+
+A table's columns are classified once; the classification is cached by the column tuple, so it is reused
+by all functions called on the same (or an equally shaped) intermediate table.
+
+Usage:
+--------------------------
+fam = mcol.families(long)
+fam['adas']                  # sorted names of '_adas' columns
+mcol.family_of(long)['DX']   # 'adni'
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import functools
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+import mci_log as mlog
+
+log = mlog.get_logger('columns')
+
+
+FAMILIES = ('adni', 'adas', 'neuro', 'gds', 'faq', 'long', 'cross', 'ours')
+
+# family suffixes; suffixes are mutually exclusive, a column belongs to at most one of them
+SUFFIXES = {'adas': '_adas', 'neuro': '_neuro', 'gds': '_gds', 'faq': '_faq', 'long': '_long', 'cross': '_cross',
+            'ours': '_'}
+
+
+def _family(column):
+    for fam, suffix in SUFFIXES.items():
+        if column.endswith(suffix):
+            return fam
+    return 'adni'
+
+
+@functools.lru_cache(maxsize=256)
+def _classify(columns):
+    """
+    Classifies a tuple of column names (one pass over columns).
+
+    Returns:
+    --------------------------
+    families - a read-only dict: family -> a tuple of sorted column names,
+    family_of - a read-only dict: column name -> family.
+    """
+    family_of = {c: _family(str(c)) for c in columns}
+    families = {fam: [] for fam in FAMILIES}
+    for c, fam in family_of.items():
+        families[fam].append(c)
+    families = {fam: tuple(sorted(cols)) for fam, cols in families.items()}
+    return MappingProxyType(families), MappingProxyType(family_of)
+
+
+def families(df):
+    """
+    Column families of df (or of a list of column names): a read-only dict family -> a tuple of sorted column names.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    columns = df.columns if hasattr(df, 'columns') else df
+    return _classify(tuple(columns))[0]
+
+
+def family_of(df):
+    """
+    A read-only dict: column name -> family, for columns of df (or a list of column names).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    columns = df.columns if hasattr(df, 'columns') else df
+    return _classify(tuple(columns))[1]
+
+
+def compact_dtypes(df, families_lst=FAMILIES, categories=True, max_unique_ratio=0.5):
+    """
+    Reduces memory of columns of the selected families (a new table is returned):
+        - integers are downcast to the smallest integer type,
+        - floats are cast to float32 only if it is lossless (all values are the same after casting back),
+        - strings (object columns) are converted to 'category' if number of unique values / rows <= max_unique_ratio
+          (if categories=True).
+
+    Parameters:
+    --------------------------
+    families_lst - a list of families to compact, e.g. ['adas', 'neuro', 'gds', 'faq'].
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    fam = family_of(df)
+    dtypes = {}
+    for c in df.columns:
+        if fam[c] not in families_lst:
+            continue
+        s = df[c]
+        if pd.api.types.is_bool_dtype(s):
+            continue
+        if pd.api.types.is_integer_dtype(s):
+            dtypes[c] = pd.to_numeric(s, downcast='integer').dtype
+        elif pd.api.types.is_float_dtype(s) and s.dtype != np.float32:
+            v = s.to_numpy()
+            if np.array_equal(v.astype(np.float32).astype(v.dtype), v, equal_nan=True):
+                dtypes[c] = np.float32
+        elif categories and s.dtype == object and s.shape[0]:
+            if s.nunique() / s.shape[0] <= max_unique_ratio:
+                dtypes[c] = 'category'
+
+    new = df.astype(dtypes) if dtypes else df.copy(deep=False)
+    if log.isEnabledFor(mlog.INFO):
+        mb0, mb1 = (t.memory_usage(deep=True).sum() / 1024 ** 2 for t in (df, new))
+        mlog.event(log, 'Compacted %d columns: %.1f MB -> %.1f MB', len(dtypes), mb0, mb1, columns=len(dtypes),
+                   mb_before=mb0, mb_after=mb1)
+    return new
@@ -0,0 +1,253 @@
+"""
+Auxiliary FREESURFER volume functions.
+
+Volumes linked by mlink.link_freesurfer() (Left/Right Lateral Ventricle and Hippocampus, eTIV; '_long' and '_cross'
+FreeSurfer pipelines) are normalized in vectorized block operations (all structures and pipelines at once):
+    - short names (LLV, RLV, LHHC, RHHC), one eTIV column per pipeline,
+    - bilateral sums (LRLV, LRHHC) and eTIV-normalized volumes (<structure>_n, volume / eTIV),
+    - age/sex residualization: a linear regression of volumes on covariates fitted on selected rows only
+      (e.g. controls or the training set); fitted parameters are saved to a json file, so a test set is transformed
+      with the training parameters (no leakage).
+
+Usage:
+--------------------------
+long = mfs.shorten_FS_long_names(long, verbose=True)
+long = mfs.compare_eTIV_x_and_eTIV_y(long)
+long = mfs.normalize_volumes(long)                      # LRLV_long, LRLV_n_long, LRHHC_long, LRHHC_n_long, ... _cross
+
+params = mfs.fit_residualizer(long, ['LRHHC_n_long', 'LRLV_n_long'], mask=long.RID.isin(train_rids))
+mfs.save_params(params, RESULTS_DIR / 'fs-residualizer.json')
+long = mfs.apply_residualizer(long, mfs.load_params(RESULTS_DIR / 'fs-residualizer.json'))   # LRHHC_n_res_long, ...
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import mci_log as mlog
+import mci_utils as mutils
+import mci_profile as mprof
+
+log = mlog.get_logger('freesurfer')
+
+
+# FreeSurfer structure -> a short name
+STRUCTURES = {'Left-Lateral-Ventricle': 'LLV', 'Right-Lateral-Ventricle': 'RLV',
+              'Left-Hippocampus': 'LHHC', 'Right-Hippocampus': 'RHHC'}
+
+# bilateral sum -> (left, right)
+BILATERAL = {'LRLV': ('LLV', 'RLV'), 'LRHHC': ('LHHC', 'RHHC')}
+
+# FreeSurfer pipelines (column suffixes)
+KINDS = ('long', 'cross')
+
+
+def shorten_FS_long_names(df, verbose=False):
+    """
+    Renames FreeSurfer volume columns to short names, e.g. 'Left-Hippocampus_long' -> 'LHHC_long'.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    names = {f'{s}_{kind}': f'{short}_{kind}' for s, short in STRUCTURES.items() for kind in KINDS}
+    names = {k: v for k, v in names.items() if k in df.columns}
+    if verbose:
+        print('Renamed the following column names:\n')
+        for k, v in names.items():
+            print(f'\t{k} ---> {v}')
+        print()
+    return df.rename(columns=names)
+
+
+def compare_eTIV_x_and_eTIV_y(df, verbose=False):
+    """
+    eTIV_x_<kind> and eTIV_y_<kind> (both merged FreeSurfer tables have eTIV) are compared for each pipeline:
+    if all values are equal, eTIV_x_<kind> is renamed to eTIV_<kind> and eTIV_y_<kind> is dropped.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    rename, drop = {}, []
+    for kind in KINDS:
+        x, y = f'eTIV_x_{kind}', f'eTIV_y_{kind}'
+        if x not in df.columns or y not in df.columns:
+            continue
+        equal = np.array_equal(df[x].to_numpy(dtype=float), df[y].to_numpy(dtype=float), equal_nan=True)
+        if verbose:
+            print(f'\n{"#" * (len(kind) + 8)}\n### {kind} ###\n{"#" * (len(kind) + 8)}\n')
+            print(f'Empty values:\n  {x}: #NaN = {df[x].isna().sum()} \n  {y}: #NaN = {df[y].isna().sum()} ')
+            print(f'Compare values in {x} and {y}:\n  All equall: {equal}')
+        if equal:
+            rename[x] = f'eTIV_{kind}'
+            drop.append(y)
+            if verbose:
+                print(f'  Rename {x} ---> eTIV_{kind}\n  Drop {y} from the dataframe')
+        else:
+            mlog.event(log, '%s and %s differ, both are kept.', x, y, level=mlog.WARNING, columns=[x, y])
+    return df.drop(columns=drop).rename(columns=rename)
+
+
+def _etiv(df, kind):
+    for c in [f'eTIV_{kind}', f'eTIV_x_{kind}']:
+        if c in df.columns:
+            return c
+    return None
+
+
+@mprof.profiled
+def normalize_volumes(df, bilateral=BILATERAL, kinds=KINDS, verbose=False):
+    """
+    Bilateral sums and eTIV-normalized volumes of all structures and pipelines in one block operation:
+    <sum>_<kind> = <left>_<kind> + <right>_<kind>, <sum>_n_<kind> = <sum>_<kind> / eTIV_<kind>.
+    Pipelines without volume or eTIV columns are skipped. Columns are added according to the execution mode
+    (see mutils.assign_columns()).
+
+    Parameters:
+    --------------------------
+    bilateral - a dict: a sum name -> (left, right) short names, e.g. {'LRHHC': ('LHHC', 'RHHC')}.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    columns = {}
+    for kind in kinds:
+        etiv = _etiv(df, kind)
+        pairs = {s: (f'{l}_{kind}', f'{r}_{kind}') for s, (l, r) in bilateral.items()
+                 if f'{l}_{kind}' in df.columns and f'{r}_{kind}' in df.columns}
+        if not pairs or etiv is None:
+            continue
+        left = df[[l for l, r in pairs.values()]].to_numpy(dtype=float)
+        right = df[[r for l, r in pairs.values()]].to_numpy(dtype=float)
+        sums = left + right
+        normalized = sums / df[etiv].to_numpy(dtype=float)[:, None]
+        for k, s in enumerate(pairs):
+            columns[f'{s}_{kind}'] = sums[:, k]
+            columns[f'{s}_n_{kind}'] = normalized[:, k]
+    if verbose:
+        for c in columns:
+            print(f'Added a new column: {c}')
+    return mutils.assign_columns(df, columns)
+
+
+def calculate_sum_of_vetricle_volumes(df, verbose=False):
+    """
+    LRLV_<kind> (left + right lateral ventricle) and LRLV_n_<kind> (normalized by eTIV), see normalize_volumes().
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    return normalize_volumes(df, bilateral={'LRLV': BILATERAL['LRLV']}, verbose=verbose)
+
+
+def calculate_sum_of_hippocampus_volumes(df, verbose=False):
+    """
+    LRHHC_<kind> (left + right hippocampus) and LRHHC_n_<kind> (normalized by eTIV), see normalize_volumes().
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    return normalize_volumes(df, bilateral={'LRHHC': BILATERAL['LRHHC']}, verbose=verbose)
+
+
+def _design(df, covariates, levels):
+    """
+    A design matrix: an intercept, numeric covariates and indicators of categorical covariates (all levels but the
+    first). Rows with a missing covariate are NaN.
+    """
+    cols = [np.ones(df.shape[0])]
+    for c in covariates:
+        if c in levels:
+            v = df[c]
+            cols += [np.where(v.isna(), np.nan, (v == level).astype(float)) for level in levels[c][1:]]
+        else:
+            cols.append(df[c].to_numpy(dtype=float))
+    return np.column_stack(cols)
+
+
+def _res_name(column, suffix):
+    for kind in KINDS:
+        if column.endswith(f'_{kind}'):
+            return f'{column[:-len(kind) - 1]}_{suffix}_{kind}'
+    return f'{column}_{suffix}_'
+
+
+@mprof.profiled
+def fit_residualizer(df, columns, covariates=['Age_at_scan_', 'PTGENDER'], mask=None):
+    """
+    Fits linear regressions of volumes (columns) on covariates, for all columns at once (batched normal equations,
+    each column uses its own non-missing rows). Only rows selected by mask are used (e.g. controls: df.DX_bl == 'CN',
+    or the training set), so the parameters can be applied to other rows without leakage.
+
+    Returns:
+    --------------------------
+    params - a dict (json-serializable): covariates, levels of categorical covariates, and for each column:
+             coef (intercept first), mean (of the column), sd (of residuals), n (rows used).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    fit = df if mask is None else df.loc[np.asarray(mask, dtype=bool)]
+    levels = {c: sorted(fit[c].dropna().unique().tolist()) for c in covariates
+              if not pd.api.types.is_numeric_dtype(fit[c])}
+    X = _design(fit, covariates, levels)
+    Y = fit[list(columns)].to_numpy(dtype=float)
+
+    # rows used for each column: all covariates and the column known
+    M = (~np.isnan(Y) & ~np.isnan(X).any(axis=1)[:, None]).astype(float)
+    X0, Y0 = np.nan_to_num(X), np.nan_to_num(Y)
+    XtX = np.einsum('nk,ni,nj->kij', M, X0, X0)
+    Xty = np.einsum('nk,ni,nk->ki', M, X0, Y0)
+    n = M.sum(axis=0)
+    if (n <= X.shape[1]).any():
+        raise ValueError(f'Too few rows to fit: {dict(zip(columns, n.astype(int)))}')
+    B = np.linalg.solve(XtX, Xty[:, :, None])[:, :, 0]
+
+    resid = (Y0 - X0 @ B.T) * M
+    sd = np.sqrt((resid ** 2).sum(axis=0) / (n - X.shape[1]))
+    mean = (Y0 * M).sum(axis=0) / n
+
+    mlog.event(log, 'Residualizer fitted: %d columns, covariates %s, %d rows', len(columns), covariates, fit.shape[0],
+               columns=list(columns), covariates=list(covariates), rows=fit.shape[0])
+    return {'covariates': list(covariates), 'levels': levels,
+            'columns': {c: {'coef': B[k].tolist(), 'mean': float(mean[k]), 'sd': float(sd[k]),
+                                  'n': int(n[k])} for k, c in enumerate(columns)}}
+
+
+@mprof.profiled
+def apply_residualizer(df, params, wscore=False):
+    """
+    Residualized volumes: <volume>_res_<kind> = volume - predicted + mean (covariate effects removed, values stay
+    on the volume scale; mean - of the fitting rows), or W-scores <volume>_w_<kind> = (volume - predicted) / sd if wscore.
+    Columns are added according to the execution mode (see mutils.assign_columns()).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    X = _design(df, params['covariates'], params['levels'])
+    columns = list(params['columns'])
+    B = np.array([params['columns'][c]['coef'] for c in columns])
+    Y = df[columns].to_numpy(dtype=float)
+    resid = Y - X @ B.T
+
+    if wscore:
+        sd = np.array([params['columns'][c]['sd'] for c in columns])
+        new = {_res_name(c, 'w'): resid[:, k] / sd[k] for k, c in enumerate(columns)}
+    else:
+        new = {_res_name(c, 'res'): resid[:, k] + params['columns'][c]['mean'] for k, c in enumerate(columns)}
+    return mutils.assign_columns(df, new)
+
+
+def save_params(params, path):
+    """
+    Saves residualizer parameters (see fit_residualizer()) to a json file.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(params, indent=2))
+    mlog.event(log, 'Residualizer parameters saved to:\n\t\t%s', path, path=path)
+
+
+def load_params(path):
+    """
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    return json.loads(Path(path).read_text())
@@ -4,10 +4,12 @@ Auxiliary GET functions from MCI tables.
 (C) MCI group.
 
 Created: 2020.10.13
-Updated: 2021.04.12
+Updated: 2026.10.19
 """
 
 import pandas as pd
+
+import mci_profile as mprof
    
 def get_patient_lists_with_images(df):
     """
@@ -113,6 +115,7 @@ def get_patient_with_more_equalled_k_visits(df, k=3):
     return df.loc[df.Visits_Nr_ >= k]
 
 
+@mprof.profiled
 def get_patient_with_more_equalled_n_months(df, n=12):
     """
     Get the df with patients those treatment lasts n months or longer.
@@ -133,6 +136,7 @@ def get_patient_with_more_equalled_n_months(df, n=12):
     vis12 = df[df['RID'].isin(pts)]
     return vis12
 
+@mprof.profiled
 def get_patient_nth_examination(df, nth=0):
     """
     Get the nth examination for each patient, where:
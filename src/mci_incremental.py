@@ -0,0 +1,305 @@
+"""
+Auxiliary functions for an INCREMENTAL refresh of the long table.
+
+ADNI exports grow with new visits. Instead of rebuilding the whole long table (the preprocessing notebook 2.01),
+only patients with new, changed or removed (RID, VISCODE) rows in any source table are rebuilt:
+    1. each source row is hashed, the hashes are compared with the hashes of the previous refresh (fingerprints),
+    2. source tables are restricted to the affected patients (RIDs),
+    3. the long table of the affected patients is built (build_long_table()): count_*, filters, count_sMCI_cAD,
+       link_*, FAQ coding, ...
+    4. rows of the affected patients are replaced in the stored long table.
+
+All derived columns of the long table depend only on rows of the same patient, so the patched table is equal
+to a full rebuild (check_consistency()), except 'Idx_' - a row number of the build (new rows get numbers after
+the current maximum).
+
+Usage:
+--------------------------
+long, changes = minc.refresh_long_table(STORE_DIR, DATA_DIR, DATA_DIR_FS, current_FS_result_file_name)
+# after new ADNI files are downloaded to DATA_DIR
+long, changes = minc.refresh_long_table(STORE_DIR, DATA_DIR, DATA_DIR_FS, current_FS_result_file_name, check=True)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import mci_get as mget
+import mci_log as mlog
+import mci_linking as mlink
+import mci_profile as mprof
+import mci_preprocessing as mpre
+
+log = mlog.get_logger('incremental')
+
+
+# source files and their (RID, visit) key columns
+SOURCES = {'ADNIMERGE.csv': ['RID', 'VISCODE'],
+           'NEUROBAT.csv': ['RID', 'VISCODE2'],
+           'ADASSCORES.csv': ['RID', 'VISCODE'],
+           'ADAS_ADNIGO23.csv': ['RID', 'VISCODE2'],
+           'GDSCALE.csv': ['RID', 'VISCODE2'],
+           'FAQ.csv': ['RID', 'VISCODE2']}
+# a FreeSurfer file is keyed by (subject, image), its RID is taken from ADNIMERGE (PTID -> RID)
+FS_KEYS = ['subject', 'tp_imageuid']
+
+# ADNIMERGE columns of the long table (see the preprocessing notebook 2.01)
+LONG_COLS = ['RID', 'PTID', 'PTGENDER', 'AGE', 'PTEDUCAT', 'EXAMDATE', 'Years_bl', 'Month', 'Month_bl',
+             'VISCODE', 'DX', 'DX_bl',
+             'ORIGPROT', 'COLPROT', 'IMAGEUID',
+             'APOE4', 'ADAS13', 'TRABSCOR',
+             'RAVLT_perc_forgetting', 'RAVLT_immediate', 'RAVLT_learning', 'RAVLT_forgetting',
+             'ABETA', 'PTAU', 'TAU',
+             'PTETHCAT', 'PTRACCAT',
+             'MMSE', 'CDRSB', 'LDELTOTAL', 'FAQ']
+
+FP_COLS = ['Source_', 'RID', 'Visit_', 'Hash_']
+
+LONG_FILE = 'long.pkl'
+FP_FILE = 'fingerprints.pkl'
+
+
+def read_sources(DATA_DIR, DATA_DIR_FS=None, current_FS_result_file_name=None):
+    """
+    Reads ADNIMERGE and all source score tables (and a FreeSurfer file, if its name is given).
+
+    Returns:
+    --------------------------
+    a dict: file name -> table.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    DATA_DIR = Path(DATA_DIR)
+    DATA_DIR_FS = Path(DATA_DIR_FS) if DATA_DIR_FS else DATA_DIR
+    sources = {name: mlink._read_source(DATA_DIR, name) for name in SOURCES}
+    if current_FS_result_file_name:
+        sources[current_FS_result_file_name] = mlink._read_source(DATA_DIR_FS, current_FS_result_file_name)
+    return sources
+
+
+@mprof.profiled
+def source_fingerprints(sources):
+    """
+    Hashes each row of the source tables.
+
+    Returns:
+    --------------------------
+    a df with columns: Source_ (file name), RID, Visit_ (VISCODE / VISCODE2, or image id of a FreeSurfer file), Hash_.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    ptid2rid = sources['ADNIMERGE.csv'].drop_duplicates('PTID').set_index('PTID').RID
+
+    fps = []
+    for name, table in sources.items():
+        if name in SOURCES:
+            rid, visit = (table[c] for c in SOURCES[name])
+        else:
+            rid, visit = table[FS_KEYS[0]].map(ptid2rid), table[FS_KEYS[1]]
+        fp = pd.DataFrame({'Source_': name, 'RID': rid.to_numpy(), 'Visit_': visit.astype(str).to_numpy(),
+                           'Hash_': pd.util.hash_pandas_object(table, index=False).to_numpy()})
+        # FreeSurfer rows of subjects not in ADNIMERGE are never linked
+        fps.append(fp.dropna(subset=['RID']))
+    fp = pd.concat(fps, ignore_index=True)
+    fp['RID'] = fp['RID'].astype(np.int64)
+    return fp[FP_COLS]
+
+
+def changed_rows(fp_old, fp_new):
+    """
+    Compares fingerprints of two refreshes (see source_fingerprints()).
+
+    Returns:
+    --------------------------
+    a df with columns: Source_, RID, Visit_, Change_ ('new' / 'changed' / 'removed'), one row for each changed key.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    keys = ['Source_', 'RID', 'Visit_']
+    diff = fp_old.merge(fp_new, how='outer', on=FP_COLS, indicator=True)
+    diff = diff.loc[diff._merge != 'both']
+
+    # a key may have several rows (duplicated visits in a source), a key found in both refreshes is 'changed'
+    side = diff.groupby(keys, observed=True)._merge.agg(lambda m: set(m.astype(str)))
+    change = side.map(lambda s: 'changed' if len(s) > 1 else ('new' if 'right_only' in s else 'removed'))
+    return change.rename('Change_').reset_index()
+
+
+def _restrict_sources(sources, rids):
+    """
+    Source tables restricted to patients in rids.
+    """
+    rids = np.asarray(rids)
+    merge = sources['ADNIMERGE.csv']
+    ptids = merge.loc[merge.RID.isin(rids), 'PTID'].unique()
+
+    sub = {}
+    for name, table in sources.items():
+        if name in SOURCES:
+            sub[name] = table.loc[table[SOURCES[name][0]].isin(rids)]
+        else:
+            sub[name] = table.loc[table[FS_KEYS[0]].isin(ptids)]
+    return sub
+
+
+@mprof.profiled
+def build_long_table(sources, current_FS_result_file_name=None, idx_start=0, k_visits=3, n_months=12, n_mris=3):
+    """
+    Builds the long table from source tables (see read_sources()) as in the preprocessing notebook (2.01):
+    column selection and renaming, count_* columns, filters (visits >= k_visits, participation >= n_months,
+    MR images >= n_mris), count_sMCI_cAD, link_*, score counts, rounded ages, numeric subgroups and FAQ coding.
+
+    Parameters:
+    --------------------------
+    sources - a dict: file name -> table (all sources or sources restricted to some patients),
+    current_FS_result_file_name - a FreeSurfer file name in sources (None: FreeSurfer results are not linked),
+    idx_start - the first 'Idx_' number.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    merge = sources['ADNIMERGE.csv'].sort_values(by=['RID', 'EXAMDATE'])
+    long = merge[LONG_COLS].copy()
+    long = long.rename({'COLPROT': 'Phase',
+                        'VISCODE': 'VISCODE3_',
+                        'TRABSCOR': 'TRABSCOR_adni',
+                        'ADAS13': 'ADAS13_adni'}, axis='columns')
+
+    long = mpre.count_MR_images_for_patient(long, 'long', sh=False)
+    long = mpre.count_visits_for_patient(long, 'long', sh=False)
+    long['Idx_'] = np.arange(idx_start, idx_start + long.shape[0])
+    long['Age_at_scan_'] = long['AGE'].values + long['Years_bl'].values
+    imageuid = long['IMAGEUID']
+    long['Imageuid_'] = ('I' + imageuid.fillna(0).astype(np.int64).astype(str)).where(imageuid.notna(), np.nan)
+    last = long.drop_duplicates('RID', keep='last').set_index('RID').Years_bl
+    long['Participation_length_yr_'] = long.RID.map(last)
+    long['Abeta_'] = long['ABETA'].replace('>1700', 1700)
+    long['Apoe4_'] = long['APOE4'].where(~(long['APOE4'] >= 1), 1)
+    long['Gender_num_'] = long['PTGENDER'].map({'Female': 1, 'Male': 0}).astype(int)
+
+    long = mget.get_patient_with_more_equalled_k_visits(long, k=k_visits)
+    long = mget.get_patient_with_more_equalled_n_months(long, n=n_months)
+    long = long.loc[long.MRIs_Nr_ >= n_mris]
+    long = mpre.count_sMCI_cAD(long)
+
+    for link in [mlink.link_neurobat, mlink.link_adas, mlink.link_gdscale, mlink.link_faq]:
+        long = link(long, sources)
+    if current_FS_result_file_name:
+        long = mlink.link_freesurfer(long, sources, current_FS_result_file_name)
+
+    long = mpre.count_score_nr_for_patient(long, 'TOTAL13_adas', 'TOTAL13_adas_Nr_', df_name='long', sh=False)
+    long = mpre.count_score_nr_for_patient(long, 'ADAS13_adni', 'ADAS13_adni_Nr_', df_name='long', sh=False)
+    long['Age_rounded_'] = np.round(long['Age_at_scan_']).astype(int)
+    long['Age_at_scan_rounded_'] = np.round(long['Age_at_scan_']).astype(int)
+    long['Subgroup_num_'] = long['Subgroup_'].map({'cAD': 1, 'sMCI': 0}).astype(int)
+    long = mpre.faq_pos_neg_classification(long)
+    return long
+
+
+def patch_long_table(long, long_part, rids):
+    """
+    Replaces rows of patients in rids in the long table with rows of long_part (rebuilt patients).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    kept = long.loc[~long.RID.isin(rids)]
+    patched = pd.concat([kept, long_part[long.columns]], ignore_index=True)
+    return patched.sort_values(by=['RID', 'EXAMDATE'], kind='stable', ignore_index=True)
+
+
+def check_consistency(long, long_full, ignore=('Idx_',)):
+    """
+    Compares an incrementally refreshed long table with a full rebuild (rows are compared after sorting
+    by RID, EXAMDATE, VISCODE3_).
+
+    Returns:
+    --------------------------
+    a df with columns: column, mismatches (number of different values); empty if both tables are equal.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    keys = ['RID', 'EXAMDATE', 'VISCODE3_']
+    if long.shape[0] != long_full.shape[0]:
+        return pd.DataFrame({'column': ['<rows>'], 'mismatches': [abs(long.shape[0] - long_full.shape[0])]})
+
+    a = long.sort_values(by=keys, kind='stable', ignore_index=True)
+    b = long_full.sort_values(by=keys, kind='stable', ignore_index=True)
+    rows = [[c, a.shape[0] if c not in a.columns else b.shape[0]] for c in a.columns.symmetric_difference(b.columns)]
+    for c in b.columns.intersection(a.columns, sort=False):
+        if c in ignore:
+            continue
+        va, vb = a[c].astype(object), b[c].astype(object)
+        same = (va == vb) | (va.isna() & vb.isna())
+        if not same.all():
+            rows.append([c, int((~same).sum())])
+    return pd.DataFrame(rows, columns=['column', 'mismatches'])
+
+
+def _save(obj, path):
+    tmp = path.with_name(path.name + '.tmp')
+    pd.to_pickle(obj, tmp)
+    os.replace(tmp, path)
+
+
+@mprof.profiled
+def refresh_long_table(store_dir, DATA_DIR, DATA_DIR_FS=None, current_FS_result_file_name=None, check=False):
+    """
+    Refreshes the long table stored in store_dir with the current source files.
+
+    The first call builds the full long table. Next calls rebuild only patients with new, changed or removed rows
+    in any source table (see changed_rows()) and patch the stored table.
+
+    Parameters:
+    --------------------------
+    store_dir - a folder with the stored long table and source fingerprints,
+    DATA_DIR, DATA_DIR_FS - folders with ADNI csv files and FreeSurfer results (default: DATA_DIR),
+    current_FS_result_file_name - a FreeSurfer file name (None: FreeSurfer results are not linked),
+    check - compare the patched table with a full rebuild, raise ValueError if they are different.
+
+    Returns:
+    --------------------------
+    long - the refreshed long table,
+    changes - a df of changed source rows (see changed_rows()), None for the first build.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    long_path, fp_path = store_dir / LONG_FILE, store_dir / FP_FILE
+
+    sources = read_sources(DATA_DIR, DATA_DIR_FS, current_FS_result_file_name)
+    fp_new = source_fingerprints(sources)
+
+    if not (long_path.exists() and fp_path.exists()):
+        long = build_long_table(sources, current_FS_result_file_name)
+        _save(long, long_path)
+        _save(fp_new, fp_path)
+        mlog.event(log, 'Full build of the long table: %d rows, %d patients.', long.shape[0], long.RID.nunique(),
+                   rows=long.shape[0], patients=long.RID.nunique())
+        return long, None
+
+    long = pd.read_pickle(long_path)
+    changes = changed_rows(pd.read_pickle(fp_path), fp_new)
+    rids = changes.RID.unique()
+    mlog.event(log, 'Changed source rows: %d, affected patients: %d.', changes.shape[0], len(rids),
+               changes=changes.shape[0], patients=len(rids), **changes.Change_.value_counts().to_dict())
+
+    if len(rids):
+        idx_start = int(long.Idx_.max()) + 1 if long.shape[0] else 0
+        long_part = build_long_table(_restrict_sources(sources, rids), current_FS_result_file_name, idx_start)
+        long = patch_long_table(long, long_part, rids)
+
+    if check:
+        mismatches = check_consistency(long, build_long_table(sources, current_FS_result_file_name))
+        if mismatches.shape[0]:
+            raise ValueError(f'The refreshed long table differs from a full rebuild:\n{mismatches.to_string()}')
+        log.info('The refreshed long table is equal to a full rebuild.')
+
+    _save(long, long_path)
+    _save(fp_new, fp_path)
+    mlog.event(log, 'The long table is refreshed: %d rows, %d patients.', long.shape[0], long.RID.nunique(),
+               rows=long.shape[0], patients=long.RID.nunique())
+    return long, changes
@@ -4,7 +4,7 @@ Auxiliary INFO functions about MCI tables.
 (C) MCI group.
 
 Created: 2020.11.13
-Updated: 2021.10.04
+Updated: 2026.10.19
 """
 
 import ipywidgets as widgets
@@ -14,6 +14,7 @@ import random
 import numpy as np
 import pandas as pd
 import mci_get as mget
+import mci_columns as mcol
 
 
 def listdir(path, howmany='all'):
@@ -226,20 +227,12 @@ def included_feature_info(df, pattern='adni-adas-neuro-gds-faq-long-cross-_'):
     - ours.
     
     
-    The last update: Listing of 'faq' features.    
-    C: 2021.03.10 / U: 2021.10.04
+    The last update: column families from the registry (mci_columns).    
+    C: 2021.03.10 / U: 2026.10.19
     """
     
-    adas_lst = sorted([c for c in df.columns if c.endswith('_adas')])
-    neuro_lst = sorted([c for c in df.columns if c.endswith('_neuro')])
-    gds_lst = sorted([c for c in df.columns if c.endswith('_gds')])         
-    faq_lst = sorted([c for c in df.columns if c.endswith('_faq')])     
-    long_lst = sorted([c for c in df.columns if c.endswith('_long')]) 
-    cross_lst = sorted([c for c in df.columns if c.endswith('_cross')]) 
-    ours_lst = sorted([c for c in df.columns if c.endswith('_')])
-    
-    adni_lst = sorted(list(set(list(df.columns)).difference(set(adas_lst), set(neuro_lst), set(gds_lst), set(faq_lst), 
-                                                            set(long_lst), set(cross_lst), set(ours_lst))))
+    fam = mcol.families(df)
+    adni_lst, adas_lst, neuro_lst, gds_lst, faq_lst, long_lst, cross_lst, ours_lst = (list(fam[f]) for f in mcol.FAMILIES)
 
     
     dct = {}
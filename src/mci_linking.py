@@ -11,26 +11,46 @@ Based on:
 (C) MCI group.
 
 Created: 2021.03.02
-Updated: 2021.10.04
+Updated: 2026.10.19
 """
 
 import numpy as np
 import pandas as pd
 from pathlib import Path
+
+import mci_log as mlog
+import mci_utils as mutils
+import mci_profile as mprof
+
+log = mlog.get_logger('linking')
     
 
 #######################################################################################################################################    
 
 
+def _read_source(DATA_DIR, file_name):
+    """
+    Reads a source csv file from DATA_DIR. DATA_DIR may be also a dict: file name -> table (e.g. tables already read 
+    and restricted to some patients, see mci_incremental), then the table is taken from the dict.
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if isinstance(DATA_DIR, dict):
+        return DATA_DIR[file_name]
+    with mprof.profile_stage(f'read_csv:{Path(file_name).stem}'):
+        return pd.read_csv(Path(DATA_DIR) / file_name, low_memory=False)
+#######################################################################################################################################    
+
+
+@mprof.profiled
 def link_neurobat(df_long, DATA_DIR):
     """
     df_long - a main table with longitudinal examinations for all (selected) subjects.
-    DATA_DIR - a global variable, with path to folder with al lcsv files.
+    DATA_DIR - a global variable, with path to folder with al lcsv files (or a dict: file name -> table).
     
-    C: 2021.03.02 / M: 2021.03.15
+    C: 2021.03.02 / M: 2026.10.19
     """
-    neuro = pd.read_csv(DATA_DIR / 'NEUROBAT.csv', low_memory=False, index_col=0)
-    neuro.reset_index(level=0, inplace=True)
+    neuro = _read_source(DATA_DIR, 'NEUROBAT.csv')
     
     cols_neuro = ['RID', 'Phase', 'VISCODE2', 'TRAASCOR', 'TRABSCOR', 'CLOCKSCOR', 'COPYSCOR', 'CATANIMSC',  'ANARTERR', 'EXAMDATE', 'AVTOT6', 'AVDEL30MIN', 'AVDELTOT', 'AVTOTB']
     neuro_red = neuro[cols_neuro]
@@ -85,15 +105,16 @@ def link_neurobat(df_long, DATA_DIR):
 #######################################################################################################################################
 
 
+@mprof.profiled
 def link_adas(df_long, DATA_DIR):
     """
     df_long - a main table with longitudinal examinations for all (selected) subjects.
-    DATA_DIR - a global variable, with path to folder with al lcsv files.
+    DATA_DIR - a global variable, with path to folder with al lcsv files (or a dict: file name -> table).
     
-    C: 2021.03.02 / M: 2021.03.10
+    C: 2021.03.02 / M: 2026.10.19
     """
     
-    adas1_full = pd.read_csv( DATA_DIR / 'ADASSCORES.csv', low_memory=False)
+    adas1_full = _read_source(DATA_DIR, 'ADASSCORES.csv')
     adas1_cols = ['RID', 'VISCODE', 'TOTALMOD','Q1','Q2','Q3','Q4', 'Q5', 'Q6', 'Q7', 'Q8', 'Q9', 'Q10', 'Q11', 'Q12', 'Q14']
     adas1 = adas1_full[adas1_cols]
     
@@ -102,7 +123,7 @@ def link_adas(df_long, DATA_DIR):
                           'Q14':'Q13'}, axis='columns')
     
     
-    adas23go_full = pd.read_csv( DATA_DIR / 'ADAS_ADNIGO23.csv', low_memory=False)
+    adas23go_full = _read_source(DATA_DIR, 'ADAS_ADNIGO23.csv')
     adas23go_cols = ['RID', 'VISCODE2', 'TOTAL13', 'Q1SCORE','Q2SCORE','Q3SCORE','Q4SCORE', 'Q5SCORE',
                      'Q6SCORE', 'Q7SCORE', 'Q8SCORE', 'Q9SCORE', 'Q10SCORE', 'Q11SCORE', 'Q12SCORE', 'Q13SCORE']
     adas23go = adas23go_full[adas23go_cols]
@@ -134,16 +155,16 @@ def link_adas(df_long, DATA_DIR):
     return new_adas
 #######################################################################################################################################
 
+@mprof.profiled
 def link_gdscale(df_long, DATA_DIR):
     """
     df_long - a main table with longitudinal examinations for all (selected) subjects.
-    DATA_DIR - a global variable, with path to folder with al lcsv files.
+    DATA_DIR - a global variable, with path to folder with al lcsv files (or a dict: file name -> table).
     
-    C: 2021.03.15 / M: 2021.03.15
+    C: 2021.03.15 / M: 2026.10.19
     """
     
-    gdscale = pd.read_csv(DATA_DIR / 'GDSCALE.csv', low_memory=False, index_col=0)
-    gdscale.reset_index(level=0, inplace=True)
+    gdscale = _read_source(DATA_DIR, 'GDSCALE.csv')
     
     cols_gdscale = ['RID', 'Phase', 'VISCODE2', 'EXAMDATE', 'GDTOTAL']
     gdscale_red = gdscale[cols_gdscale]
@@ -162,15 +183,17 @@ def link_gdscale(df_long, DATA_DIR):
     return new_gdscale
 #######################################################################################################################################
 
+@mprof.profiled
 def link_faq(df_long, DATA_DIR):
     """
     
+    DATA_DIR - a path to folder with csv files (or a dict: file name -> table).
+    
     C: 2021.09.23 by AV
-    U: 2021.10.04
+    U: 2026.10.19
     """
     
-    faq = pd.read_csv(DATA_DIR / 'FAQ.csv', low_memory=False, index_col=0)
-    faq.reset_index(level=0, inplace=True)
+    faq = _read_source(DATA_DIR, 'FAQ.csv')
     
     cols_faq = ['RID', 'Phase', 'VISCODE2', 'EXAMDATE', 'FAQSOURCE', 'FAQFINAN', 'FAQFORM', 'FAQSHOP',
                 'FAQGAME', 'FAQBEVG', 'FAQMEAL', 'FAQEVENT', 'FAQTV', 'FAQREM', 'FAQTRAVL', 'FAQTOTAL']
@@ -187,32 +210,140 @@ def link_faq(df_long, DATA_DIR):
     return new_faq
 #######################################################################################################################################
 
-def link_freesurfer(df_long, DATA_DIR_FS, current_FS_result_file_name):
+@mprof.profiled
+def link_freesurfer(df_long, DATA_DIR_FS, current_FS_result_file_name=None):
     """
     df_long - a main table with longitudinal examinations for all (selected) subjects.
-    DATA_DIR_FS - a global variable, with path to folder with al csv FreeSurfer files.
+    DATA_DIR_FS - a global variable, with path to folder with al csv FreeSurfer files (or a dict: file name -> table).
+    current_FS_result_file_name - a FreeSurfer file name; if None, all FreeSurfer files in DATA_DIR_FS are
+                                  consolidated (see aggregate_freesurfer()).
     
-    C: 2021.03.29 / M: 2021.04.16
+    C: 2021.03.29 / M: 2026.10.19
     """
+    if current_FS_result_file_name is None:
+        fs_red = aggregate_freesurfer(DATA_DIR_FS)[FS_COLUMNS]
+    else:
+        fs = _read_source(DATA_DIR_FS, current_FS_result_file_name)
 
-    fs_name = DATA_DIR_FS / current_FS_result_file_name
-    fs = pd.read_csv(fs_name)
-
-    # Renamse some column names
-    fs = fs.rename({'subject': 'PTID', 'tp_imageuid': 'Imageuid_', 'cross_complete':'complete_cross', 'long_complete':'complete_long'}, axis='columns')
+        # Renamse some column names
+        fs = fs.rename(FS_RENAME, axis='columns')
 
-    # Select columns from a FreeSurfer table
-    cols_fs = ['Imageuid_', 'PTID',
-               'Left-Lateral-Ventricle_cross', 'Right-Lateral-Ventricle_cross',
-               'Left-Lateral-Ventricle_long', 'Right-Lateral-Ventricle_long', 
-               'Left-Hippocampus_cross', 'Right-Hippocampus_cross',
-                'Left-Hippocampus_long', 'Right-Hippocampus_long',
-               'eTIV_x_cross', 'eTIV_y_cross',
-               'eTIV_x_long',  'eTIV_y_long',
-               'complete_long', 'complete_cross']
-    fs_red = fs[cols_fs]
+        # Select columns from a FreeSurfer table
+        fs_red = fs[FS_COLUMNS]
 
 
     df =  pd.merge(df_long, fs_red, how='left', on=['Imageuid_', 'PTID'],indicator='MERGE_FS_' )
     return df
+
+
+# FreeSurfer column names -> our names
+FS_RENAME = {'subject': 'PTID', 'tp_imageuid': 'Imageuid_', 'cross_complete':'complete_cross', 'long_complete':'complete_long'}
+
+# columns linked from FreeSurfer tables
+FS_COLUMNS = ['Imageuid_', 'PTID',
+              'Left-Lateral-Ventricle_cross', 'Right-Lateral-Ventricle_cross',
+              'Left-Lateral-Ventricle_long', 'Right-Lateral-Ventricle_long', 
+              'Left-Hippocampus_cross', 'Right-Hippocampus_cross',
+              'Left-Hippocampus_long', 'Right-Hippocampus_long',
+              'eTIV_x_cross', 'eTIV_y_cross',
+              'eTIV_x_long',  'eTIV_y_long',
+              'complete_long', 'complete_cross']
+
+# consolidated FreeSurfer tables: a hash of the files (names, sizes, modification times) -> a table
+_FS_CACHE = {}
+
+
+def _flag(s):
+    """
+    A FreeSurfer completion flag (True/False, yes/no, 1/0) as a bool Series.
+    """
+    return s.astype(str).str.strip().str.lower().isin(['true', 'yes', '1', '1.0'])
+
+
+def _read_fs_file(pth, columns):
+    """
+    Reads only the needed columns of a FreeSurfer file (a job of a thread).
+    """
+    fs = pd.read_csv(pth, usecols=lambda c: c in columns, low_memory=False)
+    return fs.assign(FS_file_=pth.name, FS_mtime_=pth.stat().st_mtime)
+
+
+@mprof.profiled
+def aggregate_freesurfer(DATA_DIR_FS, pattern='*.csv', n_jobs=8, cache=True, cache_file=None):
+    """
+    Consolidates all FreeSurfer result files (per run / phase) from DATA_DIR_FS into one table with one row
+    per (PTID, Imageuid_) image:
+        - files matching `pattern` are read in a thread pool, only FS_COLUMNS (FreeSurfer names) are read,
+        - duplicated images are resolved by completion flags (complete_long first, then complete_cross)
+          and then by the newest run (file modification time, then file name).
+    
+    Parameters:
+    ---------------
+    DATA_DIR_FS - a folder with FreeSurfer csv files (or a dict: file name -> table, later tables are newer),
+    cache - reuse the table consolidated before from the same files (names, sizes and modification times),
+    cache_file - a pickle file with the consolidated table (reused between sessions, optional).
+    
+    Returns:
+    ---------------
+    a table with FS_COLUMNS (our names) and FS_file_ (the file each image is taken from).
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    raw = {v: k for k, v in FS_RENAME.items()}
+    columns = {raw.get(c, c) for c in FS_COLUMNS} | set(FS_COLUMNS)
+    
+    if isinstance(DATA_DIR_FS, dict):
+        files, key = None, mutils.hash_data(DATA_DIR_FS, pattern)
+    else:
+        files = sorted(Path(DATA_DIR_FS).glob(pattern))
+        if not files:
+            raise ValueError(f'No FreeSurfer files ({pattern}) in: {DATA_DIR_FS}')
+        key = mutils.hash_data([(f.name, f.stat().st_size, f.stat().st_mtime_ns) for f in files], pattern)
+    
+    if cache and key in _FS_CACHE:
+        return _FS_CACHE[key]
+    if cache_file is not None and Path(cache_file).exists():
+        cached_key, fs = pd.read_pickle(cache_file)
+        if cached_key == key:
+            _FS_CACHE[key] = fs
+            return fs
+    
+    if files is None:
+        names = list(DATA_DIR_FS)
+        tables = [t[[c for c in t.columns if c in columns]].assign(FS_file_=name, FS_mtime_=float(k))
+                  for k, (name, t) in enumerate(DATA_DIR_FS.items())]
+    else:
+        names = [f.name for f in files]
+        with mprof.profile_stage('read_csv:freesurfer'), ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            tables = list(pool.map(lambda f: _read_fs_file(f, columns), files))
+    
+    tables = [t.rename(FS_RENAME, axis='columns') for t in tables]
+    is_fs = [{'PTID', 'Imageuid_'} <= set(t.columns) for t in tables]
+    skipped = [name for name, ok in zip(names, is_fs) if not ok]
+    if skipped:
+        mlog.event(log, 'Not FreeSurfer result files (no subject / tp_imageuid columns), skipped: %s', skipped,
+                   level=mlog.WARNING, skipped=skipped)
+    tables = [t for t, ok in zip(tables, is_fs) if ok]
+    if not tables:
+        raise ValueError(f'No FreeSurfer result files ({pattern}) in: {DATA_DIR_FS}')
+    fs = pd.concat(tables, ignore_index=True).reindex(columns=FS_COLUMNS + ['FS_file_', 'FS_mtime_'])
+    
+    # the best row of each image is the last one after sorting
+    order = pd.DataFrame({'long': _flag(fs.complete_long), 'cross': _flag(fs.complete_cross), 
+                          'mtime': fs.FS_mtime_, 'file': fs.FS_file_})
+    order = order.sort_values(['long', 'cross', 'mtime', 'file'], kind='stable').index
+    n_rows = fs.shape[0]
+    fs = fs.loc[order].drop_duplicates(subset=['PTID', 'Imageuid_'], keep='last')
+    fs = fs.sort_values(['PTID', 'Imageuid_'], kind='stable').drop(columns='FS_mtime_').reset_index(drop=True)
+    
+    mlog.event(log, 'FreeSurfer: %d files, %d rows -> %d images', len(tables), n_rows, fs.shape[0], 
+               files=len(tables), rows=n_rows, images=fs.shape[0])
+    if cache:
+        _FS_CACHE[key] = fs
+    if cache_file is not None:
+        Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle((key, fs), cache_file)
+    return fs
 #######################################################################################################################################
@@ -0,0 +1,147 @@
+"""
+Auxiliary LOGGING functions.
+
+All mci_* modules log to the 'mci' logger (e.g. 'mci.preprocessing') instead of printing.
+By default messages are printed to stdout without any prefix (as print() did before).
+
+    mlog.quiet()                       - only warnings and errors (e.g. in batch runs),
+    mlog.set_level('DEBUG')            - more details (e.g. each new FAQ column),
+    mlog.configure(fmt='json', path=LOG_FILE) - structured JSON lines with extra fields (e.g. column, table, rows),
+
+Messages are formatted lazily: nothing is formatted when a level is switched off.
+
+Progress of long loops (permutation repetitions, CV folds) is reported with a throttled progress():
+
+for k in mlog.progress(range(FOLDS), desc='CV folds'):
+    ...
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import sys
+import json
+import time
+import logging
+from logging import DEBUG, INFO, WARNING, ERROR
+
+
+ROOT = 'mci'
+
+# extra fields of a structured record are kept in this attribute
+_FIELDS = 'fields'
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a JSON line with: time, level, logger, msg and extra fields.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    def format(self, record):
+        rec = {'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'), 'level': record.levelname,
+               'logger': record.name, 'msg': record.getMessage()}
+        rec.update(getattr(record, _FIELDS, {}))
+        return json.dumps(rec, default=str)
+
+
+def configure(level='INFO', fmt='text', path=None, stream=None):
+    """
+    Configures the 'mci' logger.
+
+    Parameters:
+    --------------------------
+    level - 'DEBUG' / 'INFO' / 'WARNING' / 'ERROR',
+    fmt - 'text' (a message only, as print()) or 'json' (JSON lines with extra fields),
+    path - a log file (default: None - log to `stream`),
+    stream - default: sys.stdout.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    logger = logging.getLogger(ROOT)
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+        h.close()
+
+    handler = logging.FileHandler(path) if path else logging.StreamHandler(stream if stream else sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name):
+    """
+    A logger of a module, e.g. get_logger('preprocessing') -> 'mci.preprocessing'.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    return logging.getLogger(f'{ROOT}.{name}')
+
+
+def set_level(level):
+    logging.getLogger(ROOT).setLevel(level)
+
+
+def quiet():
+    """
+    Quiet mode: only warnings and errors are logged.
+    """
+    set_level('WARNING')
+
+
+def event(logger, msg, *args, level=logging.INFO, **fields):
+    """
+    Logs a message with structured fields, e.g.:
+
+    mlog.event(log, 'A new column "%s" is added to "%s" table.', col, name, column=col, table=name)
+
+    The message is formatted (and fields are kept) only if the level is enabled.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, *args, extra={_FIELDS: fields}, stacklevel=2)
+
+
+def progress(iterable, total=None, desc='', logger=None, min_interval=5.0, level=logging.INFO):
+    """
+    Yields items of `iterable` and logs progress (done/total, elapsed and estimated remaining time)
+    not more often than every `min_interval` seconds, and once at the end.
+    If the level is switched off, items are yielded without any overhead.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    logger = logger if logger else get_logger('progress')
+    if not logger.isEnabledFor(level):
+        yield from iterable
+        return
+
+    if total is None:
+        total = len(iterable) if hasattr(iterable, '__len__') else None
+    t0 = last = time.perf_counter()
+    k = logged = 0
+    for k, item in enumerate(iterable, 1):
+        yield item
+        now = time.perf_counter()
+        if now - last >= min_interval:
+            last, logged = now, k
+            _log_progress(logger, level, desc, k, total, now - t0)
+    if logged != k:
+        _log_progress(logger, level, desc, k, total, time.perf_counter() - t0)
+
+
+def _log_progress(logger, level, desc, done, total, elapsed):
+    if total:
+        remaining = elapsed / done * (total - done) if done else float('nan')
+        logger.log(level, '%s: %d/%d (%.0f%%), elapsed %.1f s, remaining %.1f s', desc, done, total, 100 * done / total,
+                   elapsed, remaining, extra={_FIELDS: {'desc': desc, 'done': done, 'total': total, 'elapsed_s': elapsed}})
+    else:
+        logger.log(level, '%s: %d, elapsed %.1f s', desc, done, elapsed,
+                   extra={_FIELDS: {'desc': desc, 'done': done, 'elapsed_s': elapsed}})
+
+
+# default: messages printed to stdout (as print() did)
+if not logging.getLogger(ROOT).handlers:
+    configure()
@@ -0,0 +1,204 @@
+"""
+Auxiliary LONGITUDINAL feature functions.
+
+Subject-level features of repeated measures of the long table (e.g. FAQ, ADAS, NEUROBAT, FreeSurfer columns),
+computed for any set of columns in one grouped pass (no per-RID loops):
+    - slopes (least squares of a column vs. time since baseline, from per-subject sums of x, y, xy, x^2),
+    - baseline (the first observed value), the last observed value and the baseline-to-last delta,
+    - means in visit windows (time since baseline, e.g. [0, 1) and [1, 2) years),
+    - numbers of observed and missing values.
+
+Feature names: <column>_slope_, <column>_bl_, <column>_last_, <column>_delta_, <column>_mean_<start>-<end>_,
+<column>_n_, <column>_missing_ (the '_' suffix of our columns, see mci_columns).
+
+Time-windowed datasets for early prediction (leakage-safe): features come only from visits up to the end of an
+observation window, labels from diagnoses in the prediction horizon after it; subject filters (MCI at baseline and
+in the window, k visits in the window, follow-up to the end of the horizon) are one grouped pass.
+
+Usage:
+--------------------------
+long['Years_since_bl_'] = mlong.time_since_baseline(long)
+features = mlong.subject_features(long, ['FAQ', 'ADAS13_adni', 'LRHHC_n_long'], windows=[(0, 1), (1, 2)])
+bl = bl.join(features, on='RID')
+
+X, y = mlong.window_dataset(long, window=12, horizon=24, columns=['FAQ', 'ADAS13_adni'], static=['AGE', 'PTEDUCAT'])
+datasets = mlong.window_datasets(long, [(0, 24), (12, 24), (12, 36)], columns=['FAQ', 'ADAS13_adni'], n_jobs=-1)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import numpy as np
+import pandas as pd
+
+import mci_log as mlog
+import mci_profile as mprof
+
+log = mlog.get_logger('longitudinal')
+
+
+def _sorted(long, id_col, time_col):
+    """
+    The long table sorted by (id, time); a table that is already sorted is not copied.
+    """
+    keys = long[[id_col, time_col]]
+    if keys.iloc[:, 0].is_monotonic_increasing and (keys.groupby(id_col, sort=False)[time_col].diff().fillna(0) >= 0).all():
+        return long
+    return long.sort_values([id_col, time_col], kind='stable')
+
+
+def time_since_baseline(long, time_col='Years_bl', id_col='RID'):
+    """
+    Time since the first visit of each subject (in units of time_col), aligned with long.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    return long[time_col] - long.groupby(id_col, sort=False)[time_col].transform('min')
+
+
+@mprof.profiled
+def subject_features(long, columns, time_col='Years_bl', id_col='RID', windows=[], min_points=2, precission=None):
+    """
+    Subject-level longitudinal features of columns (see the module description).
+
+    Parameters:
+    --------------------------
+    long - the long table (one row per visit),
+    columns - numeric columns with repeated measures,
+    time_col - a visit time column (e.g. 'Years_bl', 'Month_bl'); slopes are per unit of time_col,
+    windows - a list of (start, end) intervals of time since baseline for window means, e.g. [(0, 1), (1, 2)],
+    min_points - minimal nr of observed values for a slope (otherwise NaN).
+
+    Returns:
+    --------------------------
+    a df indexed by id_col: 'Visits_' (nr of visits) and features of each column.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    long = _sorted(long, id_col, time_col)
+    t = time_since_baseline(long, time_col, id_col).to_numpy(dtype=float)
+
+    # helper columns of all features, aggregated together
+    helpers, agg = {id_col: long[id_col].to_numpy()}, {}
+    for c in columns:
+        y = long[c].to_numpy(dtype=float)
+        valid = ~np.isnan(y) & ~np.isnan(t)
+        x = np.where(valid, t, np.nan)
+        y = np.where(valid, y, np.nan)
+        helpers.update({f'{c}__y': y, f'{c}__x': x, f'{c}__xy': x * y, f'{c}__xx': x * x})
+        agg.update({f'{c}__y': ['sum', 'count', 'first', 'last'], f'{c}__x': 'sum',
+                    f'{c}__xy': 'sum', f'{c}__xx': 'sum'})
+        for a, b in windows:
+            helpers[f'{c}__w{a}-{b}'] = np.where((t >= a) & (t < b), y, np.nan)
+            agg[f'{c}__w{a}-{b}'] = 'mean'
+    frame = pd.DataFrame(helpers)
+
+    # one grouped pass
+    g = frame.groupby(id_col, sort=True)
+    res = g.agg(agg)
+    visits = g.size()
+
+    features = {'Visits_': visits}
+    for c in columns:
+        n = res[(f'{c}__y', 'count')]
+        sx, sy = res[(f'{c}__x', 'sum')], res[(f'{c}__y', 'sum')]
+        sxy, sxx = res[(f'{c}__xy', 'sum')], res[(f'{c}__xx', 'sum')]
+        den = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / den.where((den > 0) & (n >= min_points))
+
+        first, last = res[(f'{c}__y', 'first')], res[(f'{c}__y', 'last')]
+        features.update({f'{c}_slope_': slope, f'{c}_bl_': first, f'{c}_last_': last, f'{c}_delta_': last - first})
+        for a, b in windows:
+            features[f'{c}_mean_{a}-{b}_'] = res[(f'{c}__w{a}-{b}', 'mean')]
+        features.update({f'{c}_n_': n, f'{c}_missing_': visits - n})
+
+    features = pd.DataFrame(features).rename_axis(id_col)
+    mlog.event(log, 'Longitudinal features: %d subjects, %d columns -> %d features', features.shape[0], len(columns),
+               features.shape[1], subjects=features.shape[0], columns=len(columns), features=features.shape[1])
+    return features.round(precission) if precission is not None else features
+
+
+def _window_labels(long, window, horizon, k_visits, id_col, month_col):
+    """
+    Labels and filters of subjects for an observation window and a prediction horizon (months), one grouped pass.
+
+    Returns:
+    --------------------------
+    a Series indexed by id_col: 1 - cAD (the first 'Dementia' diagnosis in (window, window + horizon]),
+    0 - sMCI (only 'MCI' diagnoses up to window + horizon, with a 'MCI' diagnosis at or after it);
+    subjects that do not fulfill the filters are not included.
+    """
+    month = long[month_col].to_numpy(dtype=float)
+    dx = long['DX']
+    end = window + horizon
+    frame = pd.DataFrame({id_col: long[id_col].to_numpy(),
+                          'DX': dx.to_numpy(),
+                          'In_window_': month <= window,
+                          # a diagnosis other than MCI/Dementia (e.g. CN reversion) up to the end of the horizon
+                          'Other_': (dx.notna() & ~dx.isin(['MCI', 'Dementia'])).to_numpy() & (month <= end),
+                          'Ad_month_': np.where(dx == 'Dementia', month, np.nan),
+                          'Mci_month_': np.where(dx == 'MCI', month, np.nan)})
+
+    pat = frame.groupby(id_col, sort=True).agg(first=('DX', 'first'), visits=('In_window_', 'sum'),
+                                               other=('Other_', 'sum'), ad=('Ad_month_', 'min'), mci=('Mci_month_', 'max'))
+    keep = (pat['first'] == 'MCI') & (pat.visits >= k_visits) & (pat.other == 0) & ~(pat.ad <= window)
+    cad = keep & (pat.ad > window) & (pat.ad <= end)
+    smci = keep & ~(pat.ad <= end) & (pat.mci >= end)
+    return cad[cad | smci].astype(int)
+
+
+@mprof.profiled
+def window_dataset(long, window, horizon, columns, static=[], k_visits=1, windows=[], time_col='Years_bl',
+                   month_col='Month_bl', id_col='RID'):
+    """
+    A subject-level training set for early prediction: conversion to AD within `horizon` months after an
+    observation window of `window` months since baseline.
+
+    Only visits with month_col <= window are used for features (no information after the cutoff):
+    longitudinal features of `columns` (see subject_features()) and baseline values of `static` columns.
+
+    Parameters:
+    --------------------------
+    window - the observation window (months since baseline, the cutoff),
+    horizon - the prediction horizon (months after the cutoff),
+    k_visits - minimal nr of visits in the window,
+    windows - window means of subject_features() (in units of time_col).
+
+    Returns:
+    --------------------------
+    X - features (a df indexed by id_col),
+    y - labels (1: cAD, 0: sMCI, see _window_labels()).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    long = _sorted(long, id_col, time_col)
+    y = _window_labels(long, window, horizon, k_visits, id_col, month_col)
+
+    observed = long.loc[(long[month_col] <= window).to_numpy() & long[id_col].isin(y.index).to_numpy()]
+    X = subject_features(observed, columns, time_col=time_col, id_col=id_col, windows=windows)
+    if static:
+        X = observed.groupby(id_col, sort=True)[static].first().join(X)
+    X = X.reindex(y.index)
+
+    mlog.event(log, 'Window %s months, horizon %s months: %d subjects (%d cAD), %d features', window, horizon,
+               y.shape[0], y.sum(), X.shape[1], window=window, horizon=horizon, subjects=y.shape[0], cad=int(y.sum()))
+    return X, y.rename('Subgroup_num_')
+
+
+def window_datasets(long, configs, columns, n_jobs=None, **kw):
+    """
+    Datasets of many (window, horizon) configurations (e.g. for a sensitivity analysis), built in parallel threads
+    from one sorted long table. kw - other parameters of window_dataset().
+
+    Returns:
+    --------------------------
+    a dict: (window, horizon) -> (X, y).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    from joblib import Parallel, delayed
+
+    long = _sorted(long, kw.get('id_col', 'RID'), kw.get('time_col', 'Years_bl'))
+    results = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(window_dataset)(long, window, horizon, columns, **kw) for window, horizon in configs)
+    return dict(zip([tuple(c) for c in configs], results))
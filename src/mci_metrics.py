@@ -0,0 +1,272 @@
+"""
+Auxiliary test-set METRICS functions.
+
+Bootstrap confidence intervals of accuracy, sensitivity, specificity, precision, F1 and AUC computed from stored
+predictions (e.g. y_true_ / y_pred_ columns of prediction tables, see mci_rf_bl):
+    - all bootstrap resamples are drawn at once as an index matrix (resamples x subjects),
+    - confusion counts of all resamples are one np.bincount over the coded matrix (codes as in mci_rf_bl._cm_codes),
+    - AUC of all resamples is a weighted Mann-Whitney statistic (resample weights = subject multiplicities),
+    - stratified bootstrap (e.g. by Subgroup_ or PTGENDER) resamples each stratum separately, keeping its size.
+
+Slices (subgroups) of a prediction table (e.g. by PTGENDER, Age_bin_, FAQ level): confusion counts, rates and
+feature summaries of all slices and confusion matrix cells come from one groupby pass.
+
+Usage:
+--------------------------
+ci_df = mmetrics.bootstrap_ci(y_test, y_test_pred, y_score=proba[:, 1], n_boot=10000, strata=X_test['PTGENDER'])
+
+bl_pred['FAQ_level_'] = pd.cut(bl_pred['FAQ'], [-1, 0, 5, 30], labels=['0', '1-5', '>5'])
+summary, cells = mmetrics.slice_metrics(bl_pred, by=['PTGENDER', 'Age_bin_'], features=['AGE', 'FAQ'],
+                                        shares={'PTGENDER': 'Female'}, ci=0.95)
+for key, (cm, cm_prc) in mmetrics.slice_confusion_matrices(cells).items():
+    mrfbl.plot_confusion_matrix_TEST_IR(cm, cm_prc, FILE_NAME_NUMBER, f'{FILE_NAME_PREFIX}-{key}', title=str(key))
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import numpy as np
+import pandas as pd
+
+import mci_log as mlog
+import mci_rf_bl as mrfbl
+import mci_profile as mprof
+
+log = mlog.get_logger('metrics')
+
+
+METRICS = ['acc', 'sensitivity', 'specificity', 'precision', 'f1', 'auc']
+
+
+def _as_binary(y):
+    """
+    0/1 labels (1 = cAD) of 0/1 arrays or 'sMCI'/'cAD' labels (e.g. y_true_ / y_pred_ columns).
+    """
+    y = np.asarray(y)
+    if y.dtype.kind in 'OUS':
+        return (y == mrfbl.CLASS_CATEGORIES[1]).astype(np.int8)
+    return y.astype(np.int8)
+
+
+def bootstrap_indices(n, n_boot=10000, strata=None, random_state=0):
+    """
+    Bootstrap index matrix (n_boot x n): each row is a resample of subjects 0..n-1 (with replacement).
+    If strata (labels of subjects, e.g. PTGENDER) are given, each stratum is resampled separately, keeping its size.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    rng = np.random.default_rng(random_state)
+    if strata is None:
+        return rng.integers(0, n, size=(n_boot, n))
+
+    codes = pd.factorize(np.asarray(strata))[0]
+    idx = []
+    for s in np.unique(codes):
+        members = np.flatnonzero(codes == s)
+        idx.append(members[rng.integers(0, members.shape[0], size=(n_boot, members.shape[0]))])
+    return np.concatenate(idx, axis=1)
+
+
+def confusion_counts(y_true, y_pred, idx=None):
+    """
+    Confusion counts (TN, FP, FN, TP) of each bootstrap resample (rows of the index matrix idx), one np.bincount
+    over the whole matrix. Without idx, counts of all subjects (one row).
+
+    Returns:
+    --------------------------
+    an int array (resamples x 4): TN, FP, FN, TP (mrfbl.CM_CATEGORIES order).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    codes = mrfbl._cm_codes(_as_binary(y_true), _as_binary(y_pred)).astype(np.int64)
+    if idx is None:
+        return np.bincount(codes, minlength=4)[None, :]
+    n_boot = idx.shape[0]
+    coded = codes[idx] + 4 * np.arange(n_boot)[:, None]
+    return np.bincount(coded.reshape(-1), minlength=4 * n_boot).reshape(n_boot, 4)
+
+
+def rates(counts):
+    """
+    Metrics of confusion counts (resamples x 4, see confusion_counts()): acc, sensitivity (recall), specificity,
+    precision and f1. Undefined values (zero division) are NaN.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    tn, fp, fn, tp = (counts[:, k].astype(float) for k in range(4))
+
+    def _div(a, b):
+        return np.divide(a, b, out=np.full(a.shape, np.nan), where=b > 0)
+    return {'acc': _div(tp + tn, tn + fp + fn + tp),
+            'sensitivity': _div(tp, tp + fn),
+            'specificity': _div(tn, tn + fp),
+            'precision': _div(tp, tp + fp),
+            'f1': _div(2 * tp, 2 * tp + fp + fn)}
+
+
+def weighted_auc(y_true, y_score, weights):
+    """
+    AUC of each row of weights (resamples x subjects, e.g. bootstrap multiplicities) as a weighted Mann-Whitney
+    statistic (ties count 1/2). Scores are sorted once for all resamples.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    y_true = _as_binary(y_true).astype(bool)
+    y_score = np.asarray(y_score, dtype=float)
+    order = np.argsort(y_score, kind='stable')
+    # starts of groups of tied scores
+    s = y_score[order]
+    starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]])
+
+    w = np.asarray(weights, dtype=float)[:, order]
+    pos = np.add.reduceat(w * y_true[order], starts, axis=1)
+    neg = np.add.reduceat(w * ~y_true[order], starts, axis=1)
+    # negatives with lower scores + 1/2 of tied negatives, for each group of positives
+    below = np.cumsum(neg, axis=1) - neg
+    n_pos, n_neg = pos.sum(axis=1), neg.sum(axis=1)
+    return np.divide((pos * (below + 0.5 * neg)).sum(axis=1), n_pos * n_neg,
+                     out=np.full(w.shape[0], np.nan), where=n_pos * n_neg > 0)
+
+
+@mprof.profiled
+def bootstrap_ci(y_true, y_pred, y_score=None, n_boot=10000, ci=0.95, strata=None, random_state=0, chunk_size=2000,
+                 precission=4):
+    """
+    Bootstrap confidence intervals of test-set metrics computed from stored predictions.
+
+    Parameters:
+    --------------------------
+    y_true, y_pred - 0/1 arrays (1 = cAD) or 'sMCI'/'cAD' labels (e.g. y_true_ / y_pred_ columns),
+    y_score - cAD probabilities (for AUC, optional),
+    n_boot - nr of bootstrap resamples,
+    ci - confidence level (percentile intervals),
+    strata - labels of subjects for a stratified bootstrap (e.g. a Subgroup_ or PTGENDER column),
+    chunk_size - nr of resamples processed at once (memory: chunk_size x subjects).
+
+    Returns:
+    --------------------------
+    a df indexed by metric (acc, sensitivity, specificity, precision, f1, auc) with columns:
+    value (all subjects), mean, std, lower, upper (bootstrap).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    y_true, y_pred = _as_binary(y_true), _as_binary(y_pred)
+    n = y_true.shape[0]
+    idx = bootstrap_indices(n, n_boot, strata, random_state)
+
+    boot = {m: [] for m in METRICS}
+    for start in range(0, n_boot, chunk_size):
+        chunk = idx[start:start + chunk_size]
+        for m, v in rates(confusion_counts(y_true, y_pred, chunk)).items():
+            boot[m].append(v)
+        if y_score is not None:
+            rows = np.repeat(np.arange(chunk.shape[0]), n)
+            weights = np.bincount(rows * n + chunk.reshape(-1), minlength=chunk.shape[0] * n).reshape(-1, n)
+            boot['auc'].append(weighted_auc(y_true, y_score, weights))
+
+    value = rates(confusion_counts(y_true, y_pred))
+    if y_score is not None:
+        value['auc'] = weighted_auc(y_true, y_score, np.ones((1, n)))
+
+    alpha = (1 - ci) / 2
+    rows = {}
+    for m in METRICS:
+        if m not in value:
+            continue
+        b = np.concatenate(boot[m])
+        lower, upper = np.nanquantile(b, [alpha, 1 - alpha]) if np.isfinite(b).any() else (np.nan, np.nan)
+        rows[m] = {'value': value[m][0], 'mean': np.nanmean(b) if np.isfinite(b).any() else np.nan,
+                   'std': np.nanstd(b) if np.isfinite(b).any() else np.nan, 'lower': lower, 'upper': upper}
+
+    mlog.event(log, 'Bootstrap CIs: %d resamples of %d subjects (%s)', n_boot, n,
+               'stratified' if strata is not None else 'not stratified', n_boot=n_boot, subjects=n)
+    return pd.DataFrame.from_dict(rows, orient='index').round(precission)
+
+
+@mprof.profiled
+def slice_metrics(pred_df, by, features=[], shares={}, y_true_col='y_true_', y_pred_col='y_pred_', ci=None,
+                  n_boot=1000, random_state=0, precission=4):
+    """
+    Performance of prediction slices: all combinations of values of categorical columns `by`.
+
+    Parameters:
+    --------------------------
+    pred_df - a prediction table with y_true_ / y_pred_ columns (0/1 or sMCI/cAD, e.g. from 
+              mrfbl.link_prediction_results_with_other_subject_features()),
+    by - a list of categorical columns, e.g. ['PTGENDER', 'Age_bin_'],
+    features - numeric columns summarized (means) in each slice and confusion matrix cell,
+    shares - {column: value} - fractions of subjects with the value, e.g. {'PTGENDER': 'Female'} (column 'PTGENDER=Female'),
+    ci - confidence level of bootstrap CIs of slice rates (None: no CIs), see bootstrap_ci().
+
+    Returns:
+    --------------------------
+    summary - one row per slice: n, TN, FP, FN, TP, rates (acc, sensitivity, specificity, precision, f1), 
+              '<rate>_lower' / '<rate>_upper' (if ci), feature means and shares,
+    cells - one row per slice and confusion matrix cell ('CM_pred_': TN/FP/FN/TP): n, prc (% of the slice),
+            feature means and shares.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    by = list(by)
+    y_true, y_pred = _as_binary(pred_df[y_true_col]), _as_binary(pred_df[y_pred_col])
+    frame = pred_df[by + list(features)].assign(CM_code_=mrfbl._cm_codes(y_true, y_pred))
+    for col, value in shares.items():
+        frame[f'{col}={value}'] = (pred_df[col] == value).astype(float)
+    summarized = list(features) + [f'{col}={value}' for col, value in shares.items()]
+
+    # one pass: sizes, sums and non-missing counts of all (slice, cell) pairs
+    agg = frame.groupby(by + ['CM_code_'], observed=True, sort=True).agg(
+        n=('CM_code_', 'size'), **{f'{f}__sum': (f, 'sum') for f in summarized}, **{f'{f}__count': (f, 'count') for f in summarized})
+
+    counts = agg['n'].unstack('CM_code_', fill_value=0).reindex(columns=range(4), fill_value=0)
+    counts.columns = mrfbl.CM_CATEGORIES
+    slice_sums = agg.groupby(level=by, observed=True, sort=True).sum()
+
+    summary = counts.copy()
+    summary.insert(0, 'n', counts.sum(axis=1))
+    for m, v in rates(counts.to_numpy()).items():
+        summary[m] = v
+    for f in summarized:
+        summary[f] = slice_sums[f'{f}__sum'] / slice_sums[f'{f}__count'].where(slice_sums[f'{f}__count'] > 0)
+
+    if ci is not None:
+        # bootstrap of each slice (resamples of its subjects)
+        positions = frame.groupby(by, observed=True, sort=True).indices
+        for m in METRICS[:-1]:
+            summary[f'{m}_lower'], summary[f'{m}_upper'] = np.nan, np.nan
+        for key, pos in positions.items():
+            b = bootstrap_ci(y_true[pos], y_pred[pos], n_boot=n_boot, ci=ci, random_state=random_state, precission=precission)
+            for m in b.index:
+                summary.loc[key, [f'{m}_lower', f'{m}_upper']] = b.loc[m, ['lower', 'upper']].to_numpy()
+
+    cells = agg[['n']].copy()
+    for f in summarized:
+        cells[f] = agg[f'{f}__sum'] / agg[f'{f}__count'].where(agg[f'{f}__count'] > 0)
+    cells.insert(1, 'prc', cells['n'] / summary['n'].reindex(cells.index.droplevel('CM_code_')).to_numpy() * 100)
+    cells = cells.reset_index()
+    cells.insert(len(by), 'CM_pred_', pd.Categorical.from_codes(cells.pop('CM_code_'), categories=mrfbl.CM_CATEGORIES))
+
+    mlog.event(log, 'Slices by %s: %d slices, %d subjects', by, summary.shape[0], frame.shape[0], by=by,
+               slices=summary.shape[0], subjects=frame.shape[0])
+    return summary.reset_index().round(precission), cells.round(precission)
+
+
+def slice_confusion_matrices(cells, by=None):
+    """
+    Confusion matrices of slices from the `cells` table of slice_metrics(), in the format of 
+    mrfbl.plot_confusion_matrix_TEST() / plot_confusion_matrix_TEST_IR(): [[TN, FP], [FN, TP]] counts and % of the slice.
+
+    Returns:
+    --------------------------
+    a dict: slice key (a tuple of `by` values) -> (conf_matrix, conf_matrix_prc).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if by is None:
+        by = list(cells.columns[:list(cells.columns).index('CM_pred_')])
+    matrices = {}
+    for key, g in cells.groupby(by, observed=True, sort=True):
+        key = key if isinstance(key, tuple) else (key,)
+        n = g.set_index('CM_pred_')['n'].reindex(mrfbl.CM_CATEGORIES, fill_value=0).to_numpy().reshape(2, 2)
+        matrices[key] = (n, n / n.sum() * 100 if n.sum() else np.zeros((2, 2)))
+    return matrices
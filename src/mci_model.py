@@ -0,0 +1,219 @@
+"""
+Auxiliary MODEL ARTEFACT functions.
+
+A fitted forest (e.g. from mci_permutation / mci_rf_bl notebooks) is saved as a folder:
+
+    model_dir/forest.joblib   - the fitted sklearn model (uncompressed, its arrays can be memory-mapped when loaded),
+    model_dir/trees/*.npy     - node arrays of all trees concatenated (children, features, thresholds, leaf probabilities),
+    model_dir/meta.json       - features, training split id, CV metadata, metrics, model parameters and package versions.
+
+Node arrays are loaded memory-mapped (np.load(mmap_mode='r')), so loading is near-instant and worker processes
+scoring with predict_proba_arrays() share the tree memory (the OS page cache) instead of each holding a copy.
+
+Usage:
+--------------------------
+mmodel.save_model(rf, MODELS_DIR / 'rf-bl', features=X_train.columns, split_id='bl-test-0.2-rs42',
+                  cv={'folds': 10, 'kfolds_file': str(kfolds_file)}, metrics={'f1': 0.81})
+rf, meta = mmodel.load_model(MODELS_DIR / 'rf-bl', X=X_test)     # raises ValueError if X does not fit the schema
+
+trees = mmodel.load_tree_arrays(MODELS_DIR / 'rf-bl')
+proba = mmodel.predict_proba_arrays(trees, X_test[meta['features']])
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import json
+import time
+import platform
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import mci_log as mlog
+
+log = mlog.get_logger('model')
+
+
+FORMAT_VERSION = 1
+MODEL_FILE = 'forest.joblib'
+META_FILE = 'meta.json'
+TREES_DIR = 'trees'
+TREE_ARRAYS = ['offsets', 'children_left', 'children_right', 'feature', 'threshold', 'proba']
+
+
+def forest_arrays(model):
+    """
+    Node arrays of all trees of a fitted forest, concatenated. Child indices are global (offset by the first node
+    of their tree), leaves have children = -1.
+
+    Returns:
+    --------------------------
+    a dict with: 'offsets' (the first node of each tree, n_trees + 1), 'children_left', 'children_right', 'feature',
+    'threshold', 'proba' (class probabilities of each node, n_nodes x n_classes).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    trees = [e.tree_ for e in model.estimators_]
+    counts = np.array([t.node_count for t in trees])
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _children(name):
+        ch = [getattr(t, name) for t in trees]
+        return np.concatenate([np.where(c >= 0, c + o, -1) for c, o in zip(ch, offsets[:-1])]).astype(np.int32)
+
+    value = np.concatenate([t.value[:, 0, :] for t in trees]).astype(np.float64)
+    proba = value / value.sum(axis=1, keepdims=True)
+    return {'offsets': offsets.astype(np.int64),
+            'children_left': _children('children_left'),
+            'children_right': _children('children_right'),
+            'feature': np.concatenate([t.feature for t in trees]).astype(np.int32),
+            'threshold': np.concatenate([t.threshold for t in trees]).astype(np.float64),
+            'proba': proba}
+
+
+def _versions():
+    import sklearn
+    return {'python': platform.python_version(), 'sklearn': sklearn.__version__, 'numpy': np.__version__,
+            'pandas': pd.__version__}
+
+
+def save_model(model, model_dir, features=None, split_id=None, cv=None, metrics=None, extra=None):
+    """
+    Saves a fitted forest as an artefact folder (see the module description).
+
+    Parameters:
+    --------------------------
+    model - a fitted forest (e.g. RandomForestClassifier),
+    model_dir - an artefact folder (created if needed, existing files are replaced),
+    features - training feature names in the training order (default: model.feature_names_in_),
+    split_id - an id of the training split (e.g. a name of the train/test split or a kfolds file),
+    cv - CV metadata (a dict, e.g. {'folds': 10, 'kfolds_file': ...}),
+    metrics - a dict of metrics (e.g. test f1, acc, recall, prec),
+    extra - any other JSON-serializable info.
+
+    Returns:
+    --------------------------
+    meta - a dict saved to meta.json.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import joblib
+
+    features = list(features) if features is not None else list(getattr(model, 'feature_names_in_', []))
+    if not features:
+        raise ValueError('Feature names are not known, give `features` (the training feature list).')
+    if len(features) != model.n_features_in_:
+        raise ValueError(f'{len(features)} feature names given, the model was fitted on {model.n_features_in_} features.')
+
+    model_dir = Path(model_dir)
+    (model_dir / TREES_DIR).mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    # uncompressed: numpy arrays of the model can be memory-mapped by joblib.load(mmap_mode='r')
+    joblib.dump(model, model_dir / MODEL_FILE)
+    for name, arr in forest_arrays(model).items():
+        np.save(model_dir / TREES_DIR / f'{name}.npy', arr)
+
+    meta = {'format_version': FORMAT_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'model_class': f'{type(model).__module__}.{type(model).__name__}',
+            'params': {k: v for k, v in model.get_params().items() if isinstance(v, (int, float, str, bool, type(None)))},
+            'features': features,
+            'classes': [v.item() if hasattr(v, 'item') else v for v in model.classes_],
+            'n_trees': len(model.estimators_),
+            'split_id': split_id, 'cv': cv if cv else {}, 'metrics': metrics if metrics else {},
+            'extra': extra if extra else {},
+            'versions': _versions()}
+    (model_dir / META_FILE).write_text(json.dumps(meta, indent=2, default=str))
+    mlog.event(log, 'Model saved to:\n\t\t%s (%.2f s)', model_dir, time.perf_counter() - t0, path=model_dir,
+               trees=meta['n_trees'], features=len(features))
+    return meta
+
+
+def read_meta(model_dir):
+    return json.loads((Path(model_dir) / META_FILE).read_text())
+
+
+def check_schema(X, meta):
+    """
+    Checks if the input df fits the training schema: all training features are present and numeric.
+    Extra columns are allowed (they are not used). Raises ValueError.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    features = meta['features']
+    missing = [f for f in features if f not in X.columns]
+    if missing:
+        raise ValueError(f'Features missing in the input table: {missing}')
+    not_numeric = [f for f in features if not pd.api.types.is_numeric_dtype(X[f])]
+    if not_numeric:
+        raise ValueError(f'Not numeric features in the input table: {not_numeric}')
+
+
+def load_model(model_dir, X=None, mmap_mode='r'):
+    """
+    Loads a fitted forest saved with save_model(). Arrays are memory-mapped (mmap_mode='r'), mmap_mode=None reads
+    them to memory. If X is given, its columns are checked against the training schema (see check_schema()).
+
+    Returns:
+    --------------------------
+    model, meta
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import joblib
+
+    model_dir = Path(model_dir)
+    meta = read_meta(model_dir)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f'Unknown model artefact format: {meta.get("format_version")}')
+    if X is not None:
+        check_schema(X, meta)
+    if meta['versions'].get('sklearn') != _versions()['sklearn']:
+        mlog.event(log, 'The model was saved with sklearn %s, loaded with %s.', meta['versions'].get('sklearn'),
+                   _versions()['sklearn'], level=mlog.WARNING)
+    model = joblib.load(model_dir / MODEL_FILE, mmap_mode=mmap_mode)
+    return model, meta
+
+
+def load_tree_arrays(model_dir, mmap_mode='r'):
+    """
+    Loads node arrays of all trees (see forest_arrays()), memory-mapped by default.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    trees_dir = Path(model_dir) / TREES_DIR
+    return {name: np.load(trees_dir / f'{name}.npy', mmap_mode=mmap_mode) for name in TREE_ARRAYS}
+
+
+def predict_proba_arrays(trees, X, chunk_size=10000):
+    """
+    Class probabilities (as RandomForestClassifier.predict_proba) computed from node arrays (see load_tree_arrays()).
+    All trees and samples of a chunk are traversed together, one tree level at a time.
+
+    X - a df or an array with training features in the training order.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    # sklearn trees compare float32 feature values with float64 thresholds
+    X = np.asarray(X, dtype=np.float32)
+    left, right = trees['children_left'], trees['children_right']
+    feature, threshold, proba = trees['feature'], trees['threshold'], trees['proba']
+    roots = np.asarray(trees['offsets'][:-1])
+    n_trees = roots.shape[0]
+
+    out = np.empty((X.shape[0], proba.shape[1]))
+    for start in range(0, X.shape[0], chunk_size):
+        x = X[start:start + chunk_size]
+        # node of each (sample, tree) pair
+        node = np.tile(roots, x.shape[0])
+        sample = np.repeat(np.arange(x.shape[0]), n_trees)
+        active = np.flatnonzero(left[node] >= 0)
+        while active.size:
+            n = node[active]
+            go_left = x[sample[active], feature[n]] <= threshold[n]
+            node[active] = np.where(go_left, left[n], right[n])
+            active = active[left[node[active]] >= 0]
+        out[start:start + x.shape[0]] = proba[node].reshape(x.shape[0], n_trees, -1).mean(axis=1)
+    return out
@@ -0,0 +1,287 @@
+"""
+Auxiliary PDP (partial dependence) and ICE (individual conditional expectation) functions.
+
+For a feature and its grid of values, all subjects are copied once for each grid value into one stacked batch
+(n_subjects x grid_size rows) which is scored with a single predict_proba() call per chunk (instead of predicting
+on a modified copy of X for each grid value):
+    - ICE - the cAD probability of each subject for each grid value,
+    - PDP - the mean of ICE curves over subjects,
+    - 2-D PDP of feature pairs (interactions), e.g. ('FAQ', 'RAVLT_immediate'),
+    - features are computed in parallel (threads, tree predictions release the GIL),
+    - results (grids, ICE, PDP) are saved to a .npz file and reused if the model, data and grids have not changed,
+      e.g. to re-plot the FAQ threshold analysis (FAQ_THRESHOLD = 1.5) without recomputation.
+
+Usage:
+--------------------------
+res = mpdp.partial_dependence(rf, X_test, ['FAQ', 'RAVLT_immediate', ('FAQ', 'RAVLT_immediate')], n_jobs=-1,
+                              cache_file=RESULTS_DIR / 'pdp-rf-bl.npz')
+mpdp.plot_pdp_ice(res, 'FAQ', FILE_NAME_PREFIX, threshold=mpdp.FAQ_THRESHOLD, results_dir=RESULTS_DIR)
+mpdp.threshold_effect(res, 'FAQ', mpdp.FAQ_THRESHOLD)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import pickle
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from pathlib import Path
+
+import mci_log as mlog
+import mci_utils as mutils
+import mci_model as mmodel
+import mci_profile as mprof
+
+log = mlog.get_logger('pdp')
+
+
+# FAQ cut-off of the post-hoc analysis (FAQ >= 1.5 vs FAQ < 1.5)
+FAQ_THRESHOLD = 1.5
+# separator of feature names of a 2-D PDP in results and saved files
+PAIR_SEP = '|'
+
+
+def feature_grid(x, grid_resolution=20, percentiles=(0.05, 0.95)):
+    """
+    Grid of feature values: all unique values if there are at most `grid_resolution` of them (e.g. FAQ scores),
+    otherwise `grid_resolution` equally spaced values between the percentiles.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    x = np.asarray(x, dtype=float)
+    x = x[np.isfinite(x)]
+    uniq = np.unique(x)
+    if uniq.shape[0] <= grid_resolution:
+        return uniq
+    lo, hi = np.quantile(x, percentiles)
+    return np.linspace(lo, hi, grid_resolution)
+
+
+def _cad_proba(model, X):
+    return model.predict_proba(X)[:, list(model.classes_).index(1)]
+
+
+def _stacked_predictions(model, X, columns, grid_points, chunk_size):
+    """
+    Predictions of all subjects for all grid points: rows of X are repeated for each grid point
+    (grid_points - an array (n_points, len(columns))), scored in chunks of at most `chunk_size` rows.
+
+    Returns an array (n_subjects, n_points).
+    """
+    values = X.to_numpy(dtype=float)
+    cols = [X.columns.get_loc(c) for c in columns]
+    n, g = values.shape[0], grid_points.shape[0]
+    out = np.empty((n, g))
+
+    # whole subjects in each chunk
+    step = max(1, chunk_size // g)
+    for start in range(0, n, step):
+        v = values[start:start + step]
+        batch = np.repeat(v, g, axis=0)
+        batch[:, cols] = np.tile(grid_points, (v.shape[0], 1))
+        batch = pd.DataFrame(batch, columns=X.columns) if hasattr(model, 'feature_names_in_') else batch
+        out[start:start + v.shape[0]] = _cad_proba(model, batch).reshape(v.shape[0], g)
+    return out
+
+
+def ice(model, X, feature, grid=None, grid_resolution=20, chunk_size=200000):
+    """
+    ICE curves of a feature: the cAD probability of each subject (rows of X) for each grid value.
+
+    Returns:
+    --------------------------
+    grid - an array (grid_size,),
+    ice - an array (n_subjects, grid_size).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    grid = feature_grid(X[feature], grid_resolution) if grid is None else np.asarray(grid, dtype=float)
+    return grid, _stacked_predictions(model, X, [feature], grid[:, None], chunk_size)
+
+
+def pdp_2d(model, X, features, grids=None, grid_resolution=20, chunk_size=200000):
+    """
+    2-D partial dependence of a feature pair (interaction).
+
+    Returns:
+    --------------------------
+    grid_0, grid_1 - grids of both features,
+    pdp - an array (grid_0 size, grid_1 size) with mean cAD probabilities.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    f0, f1 = features
+    g0, g1 = grids if grids is not None else (feature_grid(X[f0], grid_resolution), feature_grid(X[f1], grid_resolution))
+    g0, g1 = np.asarray(g0, dtype=float), np.asarray(g1, dtype=float)
+    points = np.column_stack([np.repeat(g0, g1.shape[0]), np.tile(g1, g0.shape[0])])
+    pred = _stacked_predictions(model, X, [f0, f1], points, chunk_size)
+    return g0, g1, pred.mean(axis=0).reshape(g0.shape[0], g1.shape[0])
+
+
+def _name(feature):
+    return PAIR_SEP.join(feature) if isinstance(feature, (tuple, list)) else feature
+
+
+def _compute(model, X, feature, grid_resolution, chunk_size):
+    if isinstance(feature, (tuple, list)):
+        g0, g1, pdp = pdp_2d(model, X, feature, grid_resolution=grid_resolution, chunk_size=chunk_size)
+        return {'grid_0': g0, 'grid_1': g1, 'pdp': pdp}
+    grid, ice_ = ice(model, X, feature, grid_resolution=grid_resolution, chunk_size=chunk_size)
+    return {'grid': grid, 'ice': ice_, 'pdp': ice_.mean(axis=0)}
+
+
+def save_pdp(results, path, key=''):
+    """
+    Saves PDP/ICE results (see partial_dependence()) to a .npz file.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    arrays = {f'{name}::{k}': v for name, res in results.items() for k, v in res.items()}
+    np.savez_compressed(path, __key__=np.array(key), **arrays)
+
+
+def load_pdp(path):
+    """
+    Loads PDP/ICE results saved with save_pdp().
+
+    Returns:
+    --------------------------
+    results - a dict: feature name (or 'f0|f1' of a pair) -> a dict of arrays,
+    key - a hash of the model, data and grids of the results.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    results = {}
+    with np.load(path) as f:
+        key = str(f['__key__'])
+        for k in f.files:
+            if k == '__key__':
+                continue
+            name, arr = k.rsplit('::', 1)
+            results.setdefault(name, {})[arr] = f[k]
+    return results, key
+
+
+def _model_key(model):
+    return mmodel.forest_arrays(model) if hasattr(model, 'estimators_') else pickle.dumps(model)
+
+
+@mprof.profiled
+def partial_dependence(model, X, features, grid_resolution=20, n_jobs=None, chunk_size=200000, cache_file=None):
+    """
+    PDP and ICE of features (and 2-D PDP of feature pairs) of the cAD probability.
+
+    Parameters:
+    --------------------------
+    model - a fitted classifier with 0/1 classes (1 = cAD),
+    X - a df with training features (e.g. the test set),
+    features - a list of feature names and/or feature pairs (tuples), e.g. ['FAQ', ('FAQ', 'RAVLT_immediate')],
+    grid_resolution - max number of grid values of a feature (see feature_grid()),
+    n_jobs - number of features computed in parallel (joblib convention, threads),
+    chunk_size - max number of rows predicted at once,
+    cache_file - a .npz file; results are loaded from it if they were computed for the same model, data,
+                 features and grid, otherwise they are computed and saved.
+
+    Returns:
+    --------------------------
+    a dict: feature name -> {'grid', 'ice', 'pdp'}; for a pair 'f0|f1' -> {'grid_0', 'grid_1', 'pdp'}.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    from joblib import Parallel, delayed
+
+    key = mutils.hash_data(_model_key(model), X, [_name(f) for f in features], grid_resolution)
+    if cache_file is not None and Path(cache_file).exists():
+        results, saved_key = load_pdp(cache_file)
+        if saved_key == key:
+            mlog.event(log, 'PDP/ICE loaded from:\n\t\t%s', cache_file, path=cache_file)
+            return results
+
+    parts = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(_compute)(model, X, f, grid_resolution, chunk_size) for f in features)
+    results = {_name(f): r for f, r in zip(features, parts)}
+
+    if cache_file is not None:
+        save_pdp(results, cache_file, key)
+        mlog.event(log, 'PDP/ICE saved to:\n\t\t%s', cache_file, path=cache_file)
+    return results
+
+
+def threshold_effect(results, feature='FAQ', threshold=FAQ_THRESHOLD):
+    """
+    Effect of a feature threshold (e.g. FAQ >= 1.5 vs FAQ < 1.5) on the cAD probability, from ICE curves:
+    mean PDP below/above the threshold, their difference, and the fraction of subjects whose mean probability
+    above the threshold is higher than below it.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    res = results[feature]
+    grid, ice_ = res['grid'], res['ice']
+    below, above = grid < threshold, grid >= threshold
+    if not below.any() or not above.any():
+        raise ValueError(f'The {feature} grid has no values on one side of the threshold {threshold}')
+
+    subj_below, subj_above = ice_[:, below].mean(axis=1), ice_[:, above].mean(axis=1)
+    return pd.Series({'threshold': threshold,
+                      'pdp_below': subj_below.mean(), 'pdp_above': subj_above.mean(),
+                      'difference': subj_above.mean() - subj_below.mean(),
+                      'subjects_increased': (subj_above > subj_below).mean()}, name=feature)
+
+
+def plot_pdp_ice(results, feature, file_name_prefix='', threshold=None, n_ice=100, save=True, results_dir=Path().cwd(),
+                 figsize=(14,8), random_state=0):
+    """
+    PDP (bold line) with ICE curves of (at most `n_ice` randomly selected) subjects. Optionally a vertical line at
+    the threshold (e.g. FAQ_THRESHOLD).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    res = results[feature]
+    grid, ice_ = res['grid'], res['ice']
+    if ice_.shape[0] > n_ice:
+        ice_ = ice_[np.random.default_rng(random_state).choice(ice_.shape[0], n_ice, replace=False)]
+
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.plot(grid, ice_.T, color='steelblue', alpha=0.2, linewidth=1)
+    ax.plot(grid, res['pdp'], color='maroon', linewidth=4, label='PDP')
+    if threshold is not None:
+        ax.axvline(threshold, color='black', linestyle='--', linewidth=2, label=f'{feature} = {threshold}')
+    ax.set_xlabel(feature, fontsize=18)
+    ax.set_ylabel('cAD probability', fontsize=18)
+    ax.tick_params(labelsize=14)
+    ax.grid(True)
+    ax.legend(fontsize=14)
+    ax.set_title(f'PDP and ICE: {feature}', fontsize=22, fontweight='bold')
+
+    if save:
+        file_name_prefix_path = Path(results_dir) / f'{file_name_prefix}-pdp-ice-{feature}.png'
+        plt.savefig(file_name_prefix_path, bbox_inches='tight')
+        log.info('PDP/ICE saved to:\n\t\t%s\n', file_name_prefix_path)
+
+    plt.show()
+
+
+def plot_pdp_2d(results, features, file_name_prefix='', save=True, results_dir=Path().cwd(), figsize=(12,9)):
+    """
+    2-D PDP of a feature pair as a filled contour plot.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    name = _name(features)
+    res = results[name]
+    f0, f1 = name.split(PAIR_SEP)
+
+    fig, ax = plt.subplots(figsize=figsize)
+    cs = ax.contourf(res['grid_0'], res['grid_1'], res['pdp'].T, levels=20, cmap='coolwarm')
+    fig.colorbar(cs, ax=ax).set_label('cAD probability', fontsize=14)
+    ax.set_xlabel(f0, fontsize=18)
+    ax.set_ylabel(f1, fontsize=18)
+    ax.set_title(f'2-D PDP: {f0} and {f1}', fontsize=22, fontweight='bold')
+
+    if save:
+        file_name_prefix_path = Path(results_dir) / f'{file_name_prefix}-pdp-{f0}-{f1}.png'
+        plt.savefig(file_name_prefix_path, bbox_inches='tight')
+        log.info('2-D PDP saved to:\n\t\t%s\n', file_name_prefix_path)
+
+    plt.show()
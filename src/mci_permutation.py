@@ -3,7 +3,7 @@ Auxiliary feature permutation functions.
 
 (C) MCI group.
 
-Created: 2021.06.23 / Updated: 2021.09.14
+Created: 2021.06.23 / Updated: 2026.10.19
 """
 import numpy as np
 import pandas as pd
@@ -15,6 +15,12 @@ from pathlib import Path
 from sklearn import metrics
 from sklearn.base import clone
 
+import mci_log as mlog
+import mci_utils as mutils
+import mci_profile as mprof
+
+log = mlog.get_logger('permutation')
+
 
 def _get_group_names(features_dct):
     """
@@ -93,9 +99,9 @@ def _get_feature_group_info(column_list, groups, verbose):
     # check feature names (spelling mistakes)
     no  = [n for n in feat_list if n not in column_list]
     if no:
-        print(f'\nWrong names ({len(no)}/{len(feat_list)}):\n\t{no} ')
-        print('\n*** Fix it NOW!!!\n\t\tha ha ha ;D\n\n')
-        print(f'Valid feature names:\n{column_list.to_list()}')
+        log.warning('\nWrong names (%d/%d):\n\t%s ', len(no), len(feat_list), no)
+        log.warning('\n*** Fix it NOW!!!\n\t\tha ha ha ;D\n\n')
+        log.warning('Valid feature names:\n%s', column_list.to_list())
         return
 
     # divide by groupS and 'single' features
@@ -114,21 +120,140 @@ def _get_feature_group_info(column_list, groups, verbose):
         else:
             all_feature_names[f]=f       
     # info (optonal)
-    if  verbose:    
+    if  verbose and log.isEnabledFor(mlog.INFO):    
         # print info
-        print(f'All features:\n\t{column_list.to_list()}')    
-        print('\nFeature groups:')
+        log.info('All features:\n\t%s', column_list.to_list())
+        log.info('\nFeature groups:')
         for g in groups:
-            print(f'\t{g}')
-        print(f'\nSingle features:\n\t{sorted(list(singles))}')
-        print('\n\n')
+            log.info('\t%s', g)
+        log.info('\nSingle features:\n\t%s', sorted(list(singles)))
+        log.info('\n\n')
     
     return all_features, all_feature_names
 
 
 
+def _4_scores_batch(y_true, y_preds):
+    """
+    Vectorized _get_4_scores(): f1, acc, recall and precision of each row of y_preds (repetitions x subjects).
+    Undefined scores (zero division) are 0, as in sklearn.
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_preds = np.asarray(y_preds).astype(bool)
+    tp = (y_preds & y_true).sum(axis=1)
+    fp = (y_preds & ~y_true).sum(axis=1)
+    fn = (~y_preds & y_true).sum(axis=1)
+    acc = (y_preds == y_true).mean(axis=1)
+    
+    def _div(a, b):
+        return np.divide(a, b, out=np.zeros(a.shape), where=b > 0)
+    return _div(2 * tp, 2 * tp + fp + fn), acc, _div(tp, tp + fn), _div(tp, tp + fp)
+
+
+# strata of conditional permutations: hash of (X, features, parameters) -> strata codes
+_STRATA_CACHE = {}
+
+
+def conditional_strata(X, cols, partners=None, n_bins=4, corr_threshold=0.5, method='quantile', random_state=0):
+    """
+    Strata of subjects for a conditional permutation of feature(s) `cols`: subjects with similar values 
+    of correlated partner features are in the same stratum.
+    
+    Partners - features (not in cols) with absolute Pearson correlation >= corr_threshold with any of cols (or a given list).
+    Strata: 
+        'quantile' - combinations of quantile bins (n_bins) of partner features,
+        'kmeans' - n_bins clusters of standardized partner features (nearest centroid).
+    Without partners all subjects are in one stratum (a marginal permutation).
+    
+    Strata are cached per dataset (X values), features and parameters.
+    
+    Returns:
+    --------------------
+    an int array (n_subjects,) with stratum codes.
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    cols = cols if isinstance(cols, list) else [cols]
+    if partners is None:
+        corr = X.corr().abs()
+        partners = [c for c in X.columns if c not in cols and (corr.loc[cols, c] >= corr_threshold).any()]
+    
+    key = mutils.hash_data(X, cols, partners, n_bins, method, random_state)
+    if key in _STRATA_CACHE:
+        return _STRATA_CACHE[key]
+    
+    if not partners:
+        strata = np.zeros(X.shape[0], dtype=np.int64)
+    elif method == 'quantile':
+        codes = np.column_stack([pd.qcut(X[p].rank(method='first'), n_bins, labels=False) for p in partners])
+        strata = np.unique(codes, axis=0, return_inverse=True)[1].reshape(-1)
+    elif method == 'kmeans':
+        from sklearn.cluster import KMeans
+        Z = X[partners].to_numpy(dtype=float)
+        Z = (Z - Z.mean(axis=0)) / np.where(Z.std(axis=0) > 0, Z.std(axis=0), 1)
+        strata = KMeans(n_clusters=n_bins, n_init=10, random_state=random_state).fit_predict(Z).astype(np.int64)
+    else:
+        raise ValueError(f"Wrong strata method: {method} (use: 'quantile' / 'kmeans')")
+    
+    _STRATA_CACHE[key] = strata
+    mlog.event(log, 'Strata of %s: partners %s, %d strata', cols, partners, len(np.unique(strata)), level=mlog.DEBUG,
+               features=cols, partners=partners, strata=len(np.unique(strata)))
+    return strata
+
+
+def _permutations(strata, rep, rng):
+    """
+    `rep` random permutations of subjects (rep x n_subjects row indices); subjects are permuted within their strata.
+    """
+    n = strata.shape[0]
+    by_stratum = np.argsort(strata, kind='stable')
+    perms = np.empty((rep, n), dtype=np.int64)
+    for r in range(rep):
+        # positions sorted by stratum, randomly ordered inside each stratum
+        perms[r, by_stratum] = np.lexsort((rng.random(n), strata))
+    return perms
+
+
+def _legacy_permutations(n, rep, random_state):
+    """
+    `rep` permutations of subjects (rep x n_subjects row indices) drawn as before 2026.10.19: each repetition
+    permutes the already permuted column(s) again with np.random.RandomState(random_state).permutation(), so results
+    of a fixed random_state are reproduced exactly.
+    """
+    perms = np.empty((rep, n), dtype=np.int64)
+    current = np.arange(n)
+    for r in range(rep):
+        current = current[np.random.RandomState(random_state).permutation(n)]
+        perms[r] = current
+    return perms
+
+
+def _permuted_feature_scores(rf, X, y, cols, perms, chunk_size=200000):
+    """
+    4 scores (arrays, one value per repetition) after permuting rows of column(s) `cols` with each permutation 
+    of `perms` (rep x n_subjects). All repetitions are stacked into one batch predicted in chunks.
+    """
+    values = X.to_numpy()
+    idx = [X.columns.get_loc(c) for c in cols]
+    rep, n = perms.shape
+    y_preds = np.empty((rep, n), dtype=np.int8)
+    
+    step = max(1, chunk_size // n)
+    for start in range(0, rep, step):
+        p = perms[start:start + step]
+        batch = np.tile(values, (p.shape[0], 1))
+        batch[:, idx] = values[p.reshape(-1)][:, idx]
+        batch = pd.DataFrame(batch, columns=X.columns) if hasattr(rf, 'feature_names_in_') else batch
+        with mprof.profile_stage('rf.predict', batch):
+            y_preds[start:start + p.shape[0]] = rf.predict(batch).reshape(p.shape[0], n)
+    return _4_scores_batch(y, y_preds)
+
+
+@mprof.profiled
 def shuffle_features_with_groups(rf, X, y, groups=[], precission=2, verbose=True, random_state=None,
-                                 repetitions=100, sortBy=None, ascending=True):
+                                 repetitions=100, sortBy=None, ascending=True, mode='marginal', n_jobs=None, strata_kw={}):
     """
     Feature permutation. Function permutes featureas from a X set, some of them can be joined and permuted in groups.
     
@@ -140,64 +265,64 @@ def shuffle_features_with_groups(rf, X, y, groups=[], precission=2, verbose=True
     repetions - nr of repetitions to average the restult. If repetitions > 0 then random state is automatically set to None. This will print random feature permutation (random values).
     sortBy - a feature name to sort values by : 'f1'/'acc'/'recall'/'prec'
     ascending - wheter sortBy in ascending or descending order (True/False).
+    mode - 'marginal' (permutation of all subjects) or 'conditional' (permutation within strata of correlated 
+           partner features, see conditional_strata()). Marginal permutations are drawn with
+           np.random.RandomState(random_state) as in earlier versions (results of a fixed random_state are
+           reproduced); conditional permutations use np.random.default_rng(random_state),
+    n_jobs - number of features (groups) permuted in parallel (joblib convention, threads),
+    strata_kw - parameters of conditional_strata() e.g. {'n_bins': 4, 'corr_threshold': 0.5, 'method': 'quantile'}.
     
+    All repetitions of a feature (group) are predicted in one stacked batch.
     
-    C: 2021.05.01 / U: 2021.06.24
+    C: 2021.05.01 / U: 2026.10.19
     """
+    from joblib import Parallel, delayed
+    
+    if mode not in ('marginal', 'conditional'):
+        raise ValueError(f"Wrong permutation mode: {mode} (use: 'marginal' / 'conditional')")
     column_list = X.columns
-    X = X.copy()
-    y = y.copy()
     
     if repetitions > 0:
         rep = repetitions # shorter name
         random_state = None # random seed (each run different)
-        print(f'Repetition(s) = {rep+1}\nAveraging mode!\nrandom_state = {random_state}\n')
+        mlog.event(log, 'Repetition(s) = %d\nAveraging mode!\nrandom_state = %s\n', rep+1, random_state, repetitions=rep+1, random_state=random_state)
     else:
         rep = 1
-        print(f'Repetition(s) = {rep+1}\nSingle permutation mode\nrandom_state = {random_state}\n')
+        mlog.event(log, 'Repetition(s) = %d\nSingle permutation mode\nrandom_state = %s\n', rep+1, random_state, repetitions=rep+1, random_state=random_state)
     
     ### INFO PART ##############################################
     all_features, all_feature_names = _get_feature_group_info(column_list, groups, verbose)
-    #print(all_features)
-    #print(all_feature_names)
     ### END OF INFO PART ##############################################    
     
     # prediction
-    y_pred = rf.predict(X)  
+    with mprof.profile_stage('rf.predict', X):
+        y_pred = rf.predict(X)
     
     # baseline scores
     f1_baseline, acc_baseline, recall_baseline, prec_baseline = _get_4_scores(y, y_pred)
     
-    # list for score drops
-    f1_list, acc_list, recall_list, prec_list = [],[],[],[]        
+    # permutations of each feature (group), drawn before the parallel part
+    rng = np.random.default_rng(random_state)
+    perms = []
+    for cols in all_features:
+        cols = cols if isinstance(cols, list) else [cols]
+        if mode == 'conditional':
+            perms.append(_permutations(conditional_strata(X, cols, **strata_kw), rep, rng))
+        else:
+            perms.append(_legacy_permutations(X.shape[0], rep, random_state))
     
     # feature(s) loop
-    for k, cols in enumerate(all_features):        
-        # permutation of the selected column(s)
-        save = X[cols].copy()
-        #X[cols] = np.random.permutation(X[cols])
-        
-        f1_a, acc_a, recall_a, prec_a = np.zeros(rep), np.zeros(rep), np.zeros(rep), np.zeros(rep)
-        # repetition loop
-        for r in range(rep):
-            X[cols] = np.random.RandomState(random_state).permutation(X[cols])
-
-            y_pred_f = rf.predict(X)               
-            # arrays for selectd feature permutation scores
-            f1_f, acc_f, recall_f, prec_f = _get_4_scores(y, y_pred_f)        
-            # difference between baseline and feature scores        
-            f1_a[r] = f1_baseline - f1_f
-            acc_a[r] = acc_baseline - acc_f
-            recall_a[r] = recall_baseline - recall_f
-            prec_a[r] = prec_baseline - prec_f
-        
-        f1_list.append(f1_a.mean())
-        acc_list.append(acc_a.mean())
-        recall_list.append(recall_a.mean())
-        prec_list.append(prec_a.mean())
-        # restore the initial column value
-        X[cols] = save 
-        
+    jobs = [(cols if isinstance(cols, list) else [cols], p) for cols, p in zip(all_features, perms)]
+    if n_jobs:
+        scores = Parallel(n_jobs=n_jobs, prefer='threads')(delayed(_permuted_feature_scores)(rf, X, y, cols, p) for cols, p in jobs)
+    else:
+        scores = [_permuted_feature_scores(rf, X, y, cols, p) for cols, p in mlog.progress(jobs, desc='Permuted features', logger=log)]
+    
+    # difference between baseline and feature scores (averaged over repetitions)
+    f1_list = [f1_baseline - s[0].mean() for s in scores]
+    acc_list = [acc_baseline - s[1].mean() for s in scores]
+    recall_list = [recall_baseline - s[2].mean() for s in scores]
+    prec_list = [prec_baseline - s[3].mean() for s in scores]
         
     df = pd.DataFrame.from_dict({'f1':f1_list, 'acc':acc_list, 'recall':recall_list, 'prec':prec_list})
     df.index = all_feature_names.keys()       
@@ -244,20 +369,18 @@ def plot_permuted_features(df, file_name_prefix, type, save=True, results_dir=Pa
         file_name_prefix_ext = f'{file_name_prefix}-{type}-features.png'
         file_name_prefix_path = results_dir / file_name_prefix_ext
         plt.savefig(file_name_prefix_path)
-        print(f'Shuffle [group] feature(s) saved to:\n\t\t{file_name_prefix_path}\n')
+        log.info('Shuffle [group] feature(s) saved to:\n\t\t%s\n', file_name_prefix_path)
 
     plt.show()
     
     
+@mprof.profiled
 def dropcol_importances(rf, X_train, y_train, X_test, y_test, random_state=42, groups=[], verbose=True, precission=2):
     """
-    C: 2021.06.23 / U: 2021.06.23
+    C: 2021.06.23 / U: 2026.10.19
     """
+    # inputs are only read (dropped columns give new tables), no copies are needed
     column_list = X_train.columns
-    X_train = X_train.copy()
-    y_train = y_train.copy()
-    X_test = X_test.copy()
-    y_test = y_test.copy()
     
     ### INFO PART ##############################################
     all_features, all_feature_names = _get_feature_group_info(column_list, groups, verbose)  
@@ -272,15 +395,17 @@ def dropcol_importances(rf, X_train, y_train, X_test, y_test, random_state=42, g
     
     rf_ = clone(rf)
     rf_.random_state = random_state
-    rf_.fit(X_train, y_train)
-    y_test_pred = rf_.predict(X_test)
+    with mprof.profile_stage('rf.fit', X_train):
+        rf_.fit(X_train, y_train)
+    with mprof.profile_stage('rf.predict', X_test):
+        y_test_pred = rf_.predict(X_test)
     # baseline scores
     f1_baseline, acc_baseline, recall_baseline, prec_baseline = _get_4_scores(y_test, y_test_pred)
     # list for score drops
     f1_list, acc_list, recall_list, prec_list = [], [], [] ,[]  
     
     
-    for k, cols in enumerate(all_features):
+    for k, cols in enumerate(mlog.progress(all_features, desc='Dropped features', logger=log)):
         X_train_drop = X_train.drop(cols, axis=1)
         X_test_drop = X_test.drop(cols, axis=1)
         
@@ -294,9 +419,11 @@ def dropcol_importances(rf, X_train, y_train, X_test, y_test, random_state=42, g
         
         rf_ = clone(rf)
         rf_.random_state = random_state
-        rf_.fit(X_train_drop, y_train)
+        with mprof.profile_stage('rf.fit', X_train_drop):
+            rf_.fit(X_train_drop, y_train)
         
-        y_test_drop_pred = rf_.predict(X_test_drop)
+        with mprof.profile_stage('rf.predict', X_test_drop):
+            y_test_drop_pred = rf_.predict(X_test_drop)
         
         # selectd feature permutation scores
         f1_f, acc_f, recall_f, prec_f = _get_4_scores(y_test, y_test_drop_pred)  
@@ -312,3 +439,117 @@ def dropcol_importances(rf, X_train, y_train, X_test, y_test, random_state=42, g
     df.index = all_feature_names.keys()    
     
     return df.round(precission), all_feature_names
+
+
+def _oob_votes(trees, X, perms_of, n_classes, random_states, n_samples_bootstrap, seeds):
+    """
+    OOB class probability sums of a chunk of trees (a job of a worker): the baseline (n_subjects x classes) and 
+    after permuting each feature (group) within OOB subjects of each tree (features x repetitions x subjects x classes).
+    
+    perms_of - a list of column index lists (one per feature / group).
+    """
+    from sklearn.ensemble._forest import _generate_unsampled_indices
+    
+    n, rep = X.shape[0], seeds.shape[1]
+    base = np.zeros((n, n_classes))
+    permuted = np.zeros((len(perms_of), rep, n, n_classes))
+    counts = np.zeros(n)
+    
+    for tree, tree_rs, tree_seeds in zip(trees, random_states, seeds):
+        oob = _generate_unsampled_indices(tree_rs, n, n_samples_bootstrap)
+        if oob.size == 0:
+            continue
+        x = X[oob]
+        base[oob] += tree.predict_proba(x, check_input=False)
+        counts[oob] += 1
+        
+        rng = np.random.default_rng(tree_seeds)
+        # permutations of OOB rows, shared by all features of the tree (rep x n_oob)
+        perms = rng.random((rep, oob.size)).argsort(axis=1)
+        for k, idx in enumerate(perms_of):
+            batch = np.tile(x, (rep, 1))
+            batch[:, idx] = x[perms.reshape(-1)][:, idx]
+            proba = tree.predict_proba(batch, check_input=False).reshape(rep, oob.size, n_classes)
+            permuted[k][:, oob] += proba
+    return base, permuted, counts
+
+
+@mprof.profiled
+def oob_permutation_importances(rf, X_train, y_train, groups=[], repetitions=10, random_state=None, n_jobs=None,
+                                verbose=True, precission=2, sortBy=None, ascending=True):
+    """
+    Out-of-bag (OOB) feature permutation. Each tree predicts only its OOB training subjects (not used to build it), 
+    with feature(s) permuted among them; OOB votes of all trees give the forest OOB predictions. 
+    Importances are computed from the training data alone, no test set (and no full forest predict) is needed.
+    
+    Parameters:
+    --------------------
+    rf - a fitted forest with bootstrap=True (e.g. RandomForestClassifier),
+    X_train, y_train - the training data of rf (the same rows and order as in rf.fit()),
+    groups - a nested list with grouped feature names (as in shuffle_features_with_groups()),
+    repetitions - nr of permutations of each feature (group) in each tree,
+    random_state - int number or None (each run gives different result),
+    n_jobs - number of parallel jobs over trees (joblib convention, threads).
+    
+    Returns:
+    --------------------
+    df - drops of OOB f1, acc, recall and prec (as in shuffle_features_with_groups()), 
+    all_feature_names.
+    
+    Usage:
+    --------------------
+    df, all_feature_names = mperm.oob_permutation_importances(rf, X_train, y_train, groups=[['LRHHC_n_long', 'LRLV_n_long']], n_jobs=-1)
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    from joblib import Parallel, delayed, effective_n_jobs
+    from sklearn.ensemble._forest import _get_n_samples_bootstrap
+    
+    if not getattr(rf, 'bootstrap', False):
+        raise ValueError('OOB importances need a forest fitted with bootstrap=True.')
+    
+    all_features, all_feature_names = _get_feature_group_info(X_train.columns, groups, verbose)
+    perms_of = [[X_train.columns.get_loc(c) for c in (cols if isinstance(cols, list) else [cols])] for cols in all_features]
+    
+    # trees compare float32 feature values
+    X = np.ascontiguousarray(X_train, dtype=np.float32)
+    n, n_classes = X.shape[0], len(rf.classes_)
+    n_samples_bootstrap = _get_n_samples_bootstrap(n, rf.max_samples)
+    rep = max(1, repetitions)
+    
+    trees = rf.estimators_
+    random_states = [e.random_state for e in trees]
+    seeds = np.random.SeedSequence(random_state).generate_state(len(trees) * rep).reshape(len(trees), rep)
+    
+    n_workers = min(len(trees), effective_n_jobs(n_jobs))
+    chunks = [slice(k, None, n_workers) for k in range(n_workers)]
+    with mprof.profile_stage('oob.trees', X_train):
+        parts = Parallel(n_jobs=n_jobs, prefer='threads')(
+            delayed(_oob_votes)(trees[c], X, perms_of, n_classes, random_states[c], n_samples_bootstrap, seeds[c])
+            for c in chunks)
+    base = sum(p[0] for p in parts)
+    permuted = sum(p[1] for p in parts)
+    counts = sum(p[2] for p in parts)
+    
+    # subjects OOB in at least one tree
+    oob = counts > 0
+    if not oob.all():
+        mlog.event(log, '%d subject(s) were not OOB in any tree (skipped), use more trees.', (~oob).sum(), 
+                   level=mlog.WARNING, skipped=int((~oob).sum()))
+    y = np.asarray(y_train)[oob]
+    classes = np.asarray(rf.classes_)
+    
+    f1_baseline, acc_baseline, recall_baseline, prec_baseline = _get_4_scores(y, classes[base[oob].argmax(axis=1)])
+    scores = [_4_scores_batch(y == 1, classes[p[:, oob].argmax(axis=2)] == 1) for p in permuted]
+    mlog.event(log, 'OOB baseline: f1 %.3f, acc %.3f (%d subjects)', f1_baseline, acc_baseline, oob.sum(),
+               level=mlog.DEBUG, f1=f1_baseline, acc=acc_baseline, subjects=int(oob.sum()))
+    
+    df = pd.DataFrame.from_dict({'f1': [f1_baseline - s[0].mean() for s in scores],
+                                 'acc': [acc_baseline - s[1].mean() for s in scores],
+                                 'recall': [recall_baseline - s[2].mean() for s in scores],
+                                 'prec': [prec_baseline - s[3].mean() for s in scores]})
+    df.index = all_feature_names.keys()
+    
+    if sortBy:
+        df = df.sort_values(sortBy, ascending=ascending)
+    return df.round(precission), all_feature_names
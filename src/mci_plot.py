@@ -4,7 +4,7 @@ Auxiliary PLOT functions for MCI tables.
 (C) MCI group.
 
 Created: 2020.10.15
-Updated: 2021.03.04
+Updated: 2026.10.19
 """
 import numpy as np
 import pandas as pd
@@ -12,6 +12,10 @@ import seaborn as sns
 from pathlib import Path
 import matplotlib.pyplot as plt
 
+import mci_log as mlog
+
+log = mlog.get_logger('plot')
+
 def plot_violin_box_feature_vs_subgroup(df, feature_name='AGE', **kw):
     """
     Plots violin and box plot figures of feature vs. Subgroup
@@ -114,13 +118,13 @@ def plot_violin_box_feature_vs_subgroup(df, feature_name='AGE', **kw):
         p = Path('./figs')        
         if not p.exists():
             p.mkdir(parents=True, exist_ok=True)
-            print(f'Created "figs" folder!!!!')
+            log.info('Created "figs" folder!!!!')
         
         pth = p / figSaveName
         if pth.exists():
-            print(f'Overwrite the file: {pth}')
+            log.info('Overwrite the file: %s', pth)
         plt.savefig(pth)
-        print(f'Figure saved to:\t{pth}')
+        log.info('Figure saved to:\t%s', pth)
         
         
 
@@ -152,64 +156,134 @@ def plot_2_tables_box_feature_vs_subgroup(df1, df2, title=['first', 'last'],feat
         a.grid(True)
     
        
-def _plot_many_lines(ax, df, feature, color):
+def _plot_many_lines(ax, df, feature, color, max_subjects=None, random_state=0):
     """
     Plots a selected feature for each subject with specified color. Usually df is either sMCI or cAD df.
     Plots function in their real floating-point positions.
     
+    All subjects are drawn as a single line artist: the table is sorted once by RID and age, and 
+    subject trajectories are separated by NaN breaks.
+    
+    max_subjects - if given and there are more subjects, a random sample of max_subjects subjects is plotted (for very large cohorts),
+    random_state - random state of the subject sample.
+    
     Function set:1     
-    C: 2020.11.19 / U:2020.11.19
+    C: 2020.11.19 / U:2026.10.19
     """
-    for rid in df.RID.unique():
-        # get a patient
-        pat = df[df.RID==rid]
-        # get a features
-        y = pat[feature].values
-
-        # age axis
-        t = pat.AGE.values[0] + pat.Years_bl.values
-        # mask of not NaN values        
-        y_double = y.astype(np.double)
-        y_mask = np.isfinite(y_double)
-
-        p = ax.plot(t[y_mask], y[y_mask], 'o-', c=color, markersize=4)
-        #color = p[0].get_color()
-    
-    #p[0].set_label(label)
-    #plt.legend(fontsize=22)
+    rid = df.RID.to_numpy()
+    # age axis: age at the first subject examination + years from baseline
+    t = df.groupby('RID', sort=False).AGE.transform('first').to_numpy() + df.Years_bl.to_numpy()
+    y = df[feature].to_numpy().astype(np.double)
+    
+    # mask of not NaN values
+    y_mask = np.isfinite(y)
+    if max_subjects is not None:
+        rids = pd.unique(rid)
+        if len(rids) > max_subjects:
+            rids = np.random.RandomState(random_state).choice(rids, max_subjects, replace=False)
+            y_mask &= np.isin(rid, rids)
+    rid, t, y = rid[y_mask], t[y_mask], y[y_mask]
+    
+    # sort once by subject and age
+    order = np.lexsort((t, rid))
+    rid, t, y = rid[order], t[order], y[order]
+    
+    # NaN breaks between subjects
+    breaks = np.flatnonzero(rid[1:] != rid[:-1]) + 1
+    t = np.insert(t, breaks, np.nan)
+    y = np.insert(y, breaks, np.nan)
+    
+    p = ax.plot(t, y, 'o-', c=color, markersize=4)
     return p
 
     
-def _plot_mean_over_time(ax, df1, feature, color):
+def mean_over_time(df, feature, bin_width=1, by=None, smooth=None, window=3, frac=0.3, ci=0.95):
     """
-    Plots a selected feature mean over time.
+    Estimates a feature mean over time (age) in age bins.
     
-    A mean plot is calculated in rounded time points pecified by round()
-    function with a given precision. Thus most of ploted points are rounded
-    in e.g int age values (e.g. 79) instead of their real floating-point positions.
+    Age (AGE + Years_bl) is rounded to bins of `bin_width` years. In each bin a mean feature value of each subject 
+    is calculated first, then mean, std, count (number of subjects) and a confidence band over subjects.
+    Only subjects present in a bin are grouped (no dense RID x age table is built).
     
-    Returns mean value over all timepoints.
+    Parameters:
+    -------------
+    df - a long table (with RID, AGE, Years_bl columns),
+    feature - a feature name,
+    bin_width - age bin width in years (default: 1, i.e. rounded age),
+    by - a column name (or a list of names) to split subjects into subgroups, e.g. 'Subgroup_' or ['Subgroup_', 'PTGENDER'],
+    smooth - None / 'rolling' / 'loess' - adds a 'mean_smooth' column:
+                'rolling' - centered rolling mean over `window` bins,
+                'loess' - LOWESS with `frac` span (requires statsmodels),
+    ci - confidence level of the band (normal approximation: mean +/- z*std/sqrt(count)).
+    
+    Returns:
+    -------------
+    a tidy df with columns: [by], Age_bin_, mean, std, count, ci_low, ci_high, [mean_smooth].
     
-    Function set: 2
-    C: 2020.11.23 / Updated 2020.11.23
+    Usage:
+    -------------
+    est = mean_over_time(long, 'FAQ', bin_width=2, by='Subgroup_', smooth='rolling')
+    
+    C: 2026.10.19 / U: 2026.10.19
     """
+    from statistics import NormalDist
+    
+    by = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    
+    tmp = df[['RID'] + by].assign(Age_bin_=np.round((df['AGE'] + df['Years_bl']) / bin_width) * bin_width,
+                                  value_=df[feature].astype(np.double))
+    # subject means in each bin, then statistics over subjects
+    subj = tmp.groupby(by + ['Age_bin_', 'RID'], observed=True, sort=True)['value_'].mean()
+    est = subj.groupby(level=by + ['Age_bin_'], observed=True).agg(['mean', 'std', 'count']).reset_index()
+    est = est.loc[est['count'] > 0].reset_index(drop=True)
     
-    df = df1.copy()
+    z = NormalDist().inv_cdf(0.5 + ci / 2)
+    half = z * est['std'].fillna(0) / np.sqrt(est['count'])
+    est['ci_low'] = est['mean'] - half
+    est['ci_high'] = est['mean'] + half
     
-    df['AGE2'] = df['AGE'] + df['Years_bl']
-    df['AGE2'] = df.AGE2.round(0)
+    if smooth == 'rolling':
+        def _rolling(v):
+            return v.rolling(window, center=True, min_periods=1).mean()
+        
+        est['mean_smooth'] = est.groupby(by, observed=True)['mean'].transform(_rolling) if by else _rolling(est['mean'])
+    elif smooth == 'loess':
+        from statsmodels.nonparametric.smoothers_lowess import lowess
+        
+        def _lowess(g):
+            return pd.Series(lowess(g['mean'], g['Age_bin_'], frac=frac, return_sorted=False), index=g.index)
+        
+        parts = [_lowess(g) for _, g in est.groupby(by, observed=True)] if by else [_lowess(est)]
+        est['mean_smooth'] = pd.concat(parts)
+    elif smooth is not None:
+        raise ValueError(f'Unknown smoothing: {smooth}')
+    
+    return est
 
-    piv = df.pivot_table(index='RID', columns='AGE2', values=feature)
 
-    val = piv.values
-    val_d = val.astype(np.double)
-#    val_mask = np.isfinite(val_d)
-    t = piv.columns.values
-        
-    v_mean = np.nanmean(val_d, axis=0)
-    v_mean_mask = np.isfinite(v_mean)
-    ax.plot(t[v_mean_mask], v_mean[v_mean_mask], linewidth=10, c=color)
-    return v_mean.mean()
+def _plot_mean_over_time(ax, df1, feature, color, bin_width=1, band=False, smooth=None):
+    """
+    Plots a selected feature mean over time.
+    
+    A mean plot is calculated in rounded time points (age bins of `bin_width` years, see: mean_over_time()). 
+    Thus most of ploted points are rounded in e.g int age values (e.g. 79) instead of their real floating-point positions.
+    
+    band - plot a confidence band,
+    smooth - None / 'rolling' / 'loess' - plot a smoothed mean.
+    
+    Returns mean value over all timepoints.
+    
+    Function set: 2
+    C: 2020.11.23 / Updated 2026.10.19
+    """
+    est = mean_over_time(df1, feature, bin_width=bin_width, smooth=smooth)
+    t = est['Age_bin_'].to_numpy()
+    v = est['mean_smooth' if smooth else 'mean'].to_numpy()
+    
+    ax.plot(t, v, linewidth=10, c=color)
+    if band:
+        ax.fill_between(t, est['ci_low'], est['ci_high'], color=color, alpha=0.2)
+    return est['mean'].mean()
 
         
         
@@ -242,8 +316,13 @@ def time_plot(df1, feature, **kw):
     
     grid_on - turn on/off a grid (a boolean value, default: True) 
     
+    max_subjects - max. number of subject lines to plot in each subgroup (an inteager, default: None - all subjects)
+    bin_width - age bin width of mean lines in years (a float, default: 1)
+    band - weather or not to plot confidence bands of mean lines (a boolean value, default: False)
+    smooth - smoothing of mean lines: None / 'rolling' / 'loess' (default: None)
+    
     Function set: 2
-    C: 2020.11.20 / Updated 2020.12.01
+    C: 2020.11.20 / Updated 2026.10.19
     """
     
     feature_name = feature # left for previous version compati
@@ -266,8 +345,14 @@ def time_plot(df1, feature, **kw):
     
     grid_on = kw.get('grid_on', True)
     
+    max_subjects = kw.get('max_subjects', None)
+    bin_width = kw.get('bin_width', 1)
+    band = kw.get('band', False)
+    smooth = kw.get('smooth', None)
+    
     
-    df = df1.copy()
+    # df1 is only read (row selections below are new tables)
+    df = df1
     smci = df.loc[df.Subgroup_ == 'sMCI']
     cad = df.loc[df.Subgroup_ == 'cAD']
         
@@ -280,9 +365,9 @@ def time_plot(df1, feature, **kw):
 #         f, ax = plt.subplots(figsize=(25,10), dpi=100)
 
     f, ax = plt.subplots(figsize=figsize, dpi=100)
-    p1 = _plot_many_lines(ax, smci, feature_name, 'red')     
+    p1 = _plot_many_lines(ax, smci, feature_name, 'red', max_subjects)     
     if mean:
-        mn1 =_plot_mean_over_time(ax, smci, feature_name, 'maroon' )
+        mn1 =_plot_mean_over_time(ax, smci, feature_name, 'maroon', bin_width, band, smooth)
         p1[0].set_label(f'sMCI (mv={mn1:.1f})')
         title = f'{feature_name} and subgroup means over time'
     elif regress:
@@ -294,9 +379,9 @@ def time_plot(df1, feature, **kw):
         p1[0].set_label(f'sMCI')
         #label = f'{feature_name}'
     
-    p2 = _plot_many_lines(ax, cad, feature_name, 'blue')    
+    p2 = _plot_many_lines(ax, cad, feature_name, 'blue', max_subjects)    
     if mean:
-        mn2 = _plot_mean_over_time(ax, cad, feature_name, 'navy' )
+        mn2 = _plot_mean_over_time(ax, cad, feature_name, 'navy', bin_width, band, smooth)
         p2[0].set_label(f'cAD (mv={mn2:.1f})')
     elif regress:
         sns.regplot(x="AGE", y=feature_name, data=cad, scatter=False,
@@ -4,12 +4,19 @@ Auxiliary PREPROCESSING functions on MCI tables.
 (C) MCI group.
 
 Created: 2020.11.13
-Updated: 2021.03.08
+Updated: 2026.10.19
 """
 import numpy as np
-import mci_get as mget
+import pandas as pd
+import mci_log as mlog
+import mci_utils as mutils
+import mci_columns as mcol
+import mci_profile as mprof
 
+log = mlog.get_logger('preprocessing')
 
+
+@mprof.profiled
 def count_score_nr_for_patient(df, score_name, score_nr_name,  df_name='A TABLE', sh=True):
     """
     Counts number of avaliable score for each patient, and assaign this value to a new df column .
@@ -20,20 +27,18 @@ def count_score_nr_for_patient(df, score_name, score_nr_name,  df_name='A TABLE'
     display(mci_all_columns.loc[mci_all_columns.RID == k, 'IMAGEUID'])
     print(mci_all_columns.loc[mci_all_columns.RID == k, 'IMAGEUID'].count())
     
-    Created: 2021.03.08 / Updated: 2021.03.08
+    Created: 2021.03.08 / Updated: 2026.10.19
     """        
-    for r in df.RID.unique(): 
-        #pat_df = mget.get_value_from_column(df, 'RID', r)
-        pat_df = df.loc[df.RID == r]
-        df.loc[df.RID == r, score_nr_name] = pat_df[score_name].count()    
-    # convertion from float to integer
-    df[score_nr_name] = df[score_nr_name].astype(int)
+    # number of non-null scores of each patient, in the execution mode (see mci_utils.set_execution_mode)
+    cnt = df.groupby('RID', sort=False)[score_name].transform('count').astype(int)
+    df = mutils.assign_columns(df, {score_nr_name: cnt})
     if sh:
-        print(f'A new column "{score_nr_name}" is added to "{df_name}" table.')
+        mlog.event(log, 'A new column "%s" is added to "%s" table.', score_nr_name, df_name, column=score_nr_name, table=df_name)
     return df
 
 
 
+@mprof.profiled
 def count_MR_images_for_patient(df, name='A TABLE', sh=True):
     """
     Counts number of avaliable MR images for each patient, and assaign this value to a new df column 'MRIs'.
@@ -44,96 +49,85 @@ def count_MR_images_for_patient(df, name='A TABLE', sh=True):
     display(mci_all_columns.loc[mci_all_columns.RID == k, 'IMAGEUID'])
     print(mci_all_columns.loc[mci_all_columns.RID == k, 'IMAGEUID'].count())
     
-    Created: 2020.11.13 / Updated: 2021.03.08
+    Created: 2020.11.13 / Updated: 2026.10.19
     """        
-    for r in df.RID.unique(): 
-        pat_df = mget.get_value_from_column(df, 'RID', r)
-        df.loc[df.RID == r, 'MRIs_Nr_'] = pat_df.IMAGEUID.count()
-    # convertion from float to integer
-    df['MRIs_Nr_'] = df.MRIs_Nr_.astype(int)
+    cnt = df.groupby('RID', sort=False)['IMAGEUID'].transform('count').astype(int)
+    df = mutils.assign_columns(df, {'MRIs_Nr_': cnt})
     if sh:
-        print(f'A new column "MRIs_Nr_" is added to "{name}" table.')
+        mlog.event(log, 'A new column "%s" is added to "%s" table.', 'MRIs_Nr_', name, column='MRIs_Nr_', table=name)
     return df
 
 
+@mprof.profiled
 def count_visits_for_patient(df, name='A TABLE', sh=True):
     """
     Counts number of visitst for each patient, assigns this value to a new df column 'Visits'
     
-    Created: 2020.11.13 / Upadated: 2021.03.08
+    Created: 2020.11.13 / Upadated: 2026.10.19
     """
 
-    for r in df.RID.unique():
-        pat_df = mget.get_value_from_column(df, 'RID', r)
-        df.loc[df.RID == r, 'Visits_Nr_'] = pat_df.shape[0]
-    # convertion from float to integer
-    df['Visits_Nr_'] = df.Visits_Nr_.astype(int)
+    cnt = df.groupby('RID', sort=False)['RID'].transform('size').astype(int)
+    df = mutils.assign_columns(df, {'Visits_Nr_': cnt})
     if sh:
-        print(f'A new column "Visits_Nr_" is added to "{name}" table.')
+        mlog.event(log, 'A new column "%s" is added to "%s" table.', 'Visits_Nr_', name, column='Visits_Nr_', table=name)
     return df
 
 
+@mprof.profiled
 def count_sMCI_cAD(df):
     """
     Retrurnd a new table that contains ONLY sMCI and cAD patients. 
     
-    Created 2020.11.14 / Updated 2020.11.14
+    sMCI - all known diagnoses (DX) of a patient are 'MCI',
+    cAD - the first known diagnosis is 'MCI', followed by at least one 'Dementia' (and no other diagnoses).
+    
+    Created 2020.11.14 / Updated 2026.10.19
     """
     df = df.sort_values(by=['RID', 'EXAMDATE'])
 
+    # one pass over all patients: number of known, 'MCI' and 'Dementia' diagnoses, and the first known diagnosis
     df_nan = df.dropna(subset = ["DX"])
-    for r in df_nan.RID.unique():
-        pat = df_nan.loc[df_nan.RID == r]
-        #pat1 = df.loc[df.RID == r]        
-
-        # get sMCI (all MCI)
-        mci = np.all(pat.DX == 'MCI')
-        if mci:
-            df.loc[df.RID == r, 'Subgroup_'] = 'sMCI'
+    pat = df_nan.assign(Mci_=df_nan.DX == 'MCI', Ad_=df_nan.DX == 'Dementia').groupby('RID', sort=False).agg(
+        n=('DX', 'size'), mci=('Mci_', 'sum'), ad=('Ad_', 'sum'), first=('DX', 'first'))
+    
+    smci = pat.mci == pat.n
+    cad = (pat['first'] == 'MCI') & ~smci & (pat.mci + pat.ad == pat.n)
+    subgroup = pd.Series(np.select([smci, cad], ['sMCI', 'cAD'], default=''), index=pat.index)
+    df['Subgroup_'] = df.RID.map(subgroup.loc[subgroup != ''])
 
-        # cAD - get first MCI and have at least one hit of Dementia
-        v = pat.DX.values
-        first = v[0]
-        mci = pat.DX == 'MCI'   
+    return df.loc[df['Subgroup_'].isin(['sMCI', 'cAD'])]
 
-        if first == 'MCI' and not np.all(mci):
-            ad = pat.DX == 'Dementia'
-            if np.all(mci | ad):
-                df.loc[df.RID == r, 'Subgroup_'] = 'cAD'
 
-    return df.loc[df['Subgroup_'].isin(['sMCI', 'cAD'])]
+# ADNI columns at the beginning of a reordered table
+FRONT_COLUMNS = ('RID', 'PTID','PTGENDER', 'PTEDUCAT', 'EXAMDATE', 'AGE', 'Years_bl', 'Month', 'Month_bl', 'DX', 'DX_bl',
+                 'ORIGPROT', 'Phase', 'IMAGEUID')
 
 
+@mprof.profiled
 def reorder_columns(df_long, verbose=False):
     """
     Reoreder columnn; group columns from the same type (table).
+    Column families are taken from the registry (mci_columns), 'faq' columns are kept with 'adni' columns.
     
-    C: 2021.03.30 / U: 2021.03.30
+    C: 2021.03.30 / U: 2026.10.19
     """
     cols1 = df_long.columns.to_list()
     cols11 = cols1.copy()
     len1 = len(cols1)
     
-    adas_lst = sorted([c for c in df_long.columns if c.endswith('_adas')])
-    neuro_lst = sorted([c for c in df_long.columns if c.endswith('_neuro')])
-    gds_lst = sorted([c for c in df_long.columns if c.endswith('_gds')])     
-    long_lst = sorted([c for c in df_long.columns if c.endswith('_long')]) 
-    cross_lst = sorted([c for c in df_long.columns if c.endswith('_cross')]) 
-    ours_lst = sorted([c for c in df_long.columns if c.endswith('_')])
+    fam = mcol.families(df_long)
 
-    adni_lst = sorted(list(set(list(df_long.columns)).difference(set(adas_lst), set(neuro_lst), set(gds_lst), 
-                                                            set(long_lst), set(cross_lst), set(ours_lst))))
     # ADNI columns
-    # select some columns to the beginning of a new list
-    adni_lst_new = []
-    for f in ['RID', 'PTID','PTGENDER', 'PTEDUCAT', 'EXAMDATE', 'AGE', 'Years_bl', 'Month', 'Month_bl', 'DX', 'DX_bl',
-             'ORIGPROT', 'Phase', 'IMAGEUID']:
-        adni_lst_new.append(adni_lst.pop(adni_lst.index(f)))
-    # add not selected columns after sorting them
-    adni_lst_new = adni_lst_new + sorted(adni_lst)
+    # selected columns at the beginning, followed by the remaining (sorted) ones
+    adni = set(fam['adni']).union(fam['faq'])
+    missing = [f for f in FRONT_COLUMNS if f not in adni]
+    if missing:
+        raise ValueError(f'Columns not found in the table: {missing}')
+    front = set(FRONT_COLUMNS)
+    adni_lst_new = list(FRONT_COLUMNS) + sorted(c for c in adni if c not in front)
 
     # new column order list
-    new_column_order = adni_lst_new + adas_lst + neuro_lst + gds_lst + long_lst + cross_lst + ours_lst
+    new_column_order = adni_lst_new + [c for f in ['adas', 'neuro', 'gds', 'long', 'cross', 'ours'] for c in fam[f]]
     df_new = df_long.reindex(columns=new_column_order)
     
     
@@ -146,8 +140,8 @@ def reorder_columns(df_long, verbose=False):
                 cols2.remove(c)
                 cols11.remove(c)
         if len(cols2) == len(cols11):
-            print(f'Columns in and out are the same!')                
-        print(f'Columns in {len1}, out {len2}')
+            log.info('Columns in and out are the same!')
+        mlog.event(log, 'Columns in %d, out %d', len1, len2, cols_in=len1, cols_out=len2)
         
     return df_new
 
@@ -160,11 +154,12 @@ def coding_(x):
     return x
 
 
+@mprof.profiled
 def faq_pos_neg_classification(df_long):
     """
     Classification of FAQ values to POSITIVE or NEGATIVE states. 
     
-    C: 2021.09.26 / U:2021.10.21
+    C: 2021.09.26 / U: 2026.10.19
     """
     faq_cols = [c for c in df_long.columns if '_faq' in c]
     faq_cols.remove('EXAMDATE_faq')
@@ -175,33 +170,24 @@ def faq_pos_neg_classification(df_long):
     faq_cols.remove('RID_faq')
     faq_cols.remove('VISCODE2_faq')
     
-    # the table with selected '_faq' columns
-    faq1 = df_long[faq_cols].copy()    
+    # coded FAQ values (see coding_()), the input table is not copied
+    faq1 = df_long[faq_cols].to_numpy(dtype=float)
+    cod = np.select([faq1 <= 1, faq1 <= 3, faq1 == 4, faq1 >= 5], [0, 1, 2, 3], default=faq1)
+    cod = np.where(np.isnan(cod), -1, cod).astype(int)  # as .fillna(-1).astype(int)
     
-    # fill in the main table (df_long) with coded FAQ values 
-    for col in faq_cols:
-        new_col = col + '_cod_'
-        
-        df_long[new_col] = faq1[col].apply(coding_)
-        df_long[new_col] = df_long[new_col].fillna(-1).astype(int)
-        print(f'A new column "{new_col}" is added to "long" table.')
-        
-    # select columns with newly coded features '_faq_cod_'
-    cod_cols = [c for c in df_long.columns if '_faq_cod_' in c]
+    new_cols = {col + '_cod_': cod[:, k] for k, col in enumerate(faq_cols)}
+    for new_col in new_cols:
+        mlog.event(log, 'A new column "%s" is added to "long" table.', new_col, level=mlog.DEBUG, column=new_col, table='long')
+    mlog.event(log, '%d new "_faq_cod_" columns are added to "long" table.', len(faq_cols), columns=len(faq_cols), table='long')
     
-    # the table with selected and coded '_faq_cod_' columns
-    faq2 = df_long[cod_cols].copy() 
-
-    cnt = faq2[faq2 >= 3].count(axis=1)
-        
-    #faq2['Faq_cnts_'] = cnt
+    # number of coded values >= 3 in a row ('-1' - missing values are not counted)
+    cnt = (cod >= 3).sum(axis=1)
+    new_cols['Faq_cnts_'] = cnt
     # positive -> 'P', negatiove -> 'N'
-    #faq2['Faq_dsc_'] = np.where(cnt >=3 , 'P', 'N')
+    new_cols['Faq_dsc_'] = np.where(cnt >= 3, 'P', 'N')
     
-    df_long['Faq_cnts_'] = cnt
-    print('A new column "Faq_cnts_" is added to "long" table.')    
-    # positive -> 'P', negatiove -> 'N'
-    df_long['Faq_dsc_'] = np.where(cnt >=3 , 'P', 'N')
-    print('A new column "Faq_dsc_" is added to "long" table.')
+    df_long = mutils.assign_columns(df_long, new_cols)
+    mlog.event(log, 'A new column "%s" is added to "long" table.', 'Faq_cnts_', column='Faq_cnts_', table='long')
+    mlog.event(log, 'A new column "%s" is added to "long" table.', 'Faq_dsc_', column='Faq_dsc_', table='long')
     
     return df_long
\ No newline at end of file
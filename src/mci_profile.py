@@ -0,0 +1,238 @@
+"""
+Auxiliary PROFILING functions.
+
+Records for each profiled call (a pipeline stage):
+    - wall time and CPU time,
+    - peak RSS of the process (and its change during the call),
+    - peak traced memory (tracemalloc) during the call (optional, it slows down the code),
+    - rows and columns of the input and output tables,
+and appends them as JSON lines to a file.
+
+Profiling is switched on by environment variables (before importing mci_* modules):
+    MCI_PROFILE=1                   - profile to 'mci_profile.jsonl' in the current folder,
+    MCI_PROFILE=/path/profile.jsonl - profile to a given file,
+    MCI_PROFILE_MEMORY=1            - trace memory allocations with tracemalloc,
+or in a notebook with: mprof.enable('profile.jsonl', memory=True) / mprof.disable().
+
+When profiling is off, a profiled function costs one extra function call and a flag check.
+
+Usage:
+--------------------------
+@mprof.profiled
+def link_neurobat(df_long, DATA_DIR):
+    with mprof.profile_stage('read_csv:NEUROBAT'):
+        neuro = pd.read_csv(...)
+
+prof = mprof.read_profile('profile.jsonl')
+prof.groupby('stage').wall_s.sum()
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import os
+import json
+import time
+import functools
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+_ENABLED = False
+_MEMORY = False
+_PATH = None
+_LOCK = threading.Lock()
+# tracemalloc peaks of open stages (the tracemalloc peak is reset in each nested stage)
+_PEAKS = []
+
+
+def enable(path='mci_profile.jsonl', memory=False):
+    """
+    Switches profiling on. Records are appended to `path` (JSON lines).
+    memory - trace memory allocations (tracemalloc) of each stage.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    global _ENABLED, _MEMORY, _PATH
+    _PATH = str(path)
+    _MEMORY = memory
+    _ENABLED = True
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    """
+    Switches profiling off.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    global _ENABLED
+    _ENABLED = False
+    if _MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def _rss_peak_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 1024 ** 2 if os.uname().sysname == 'Darwin' else rss / 1024
+
+
+def _shape(obj):
+    """
+    Rows and columns of the first table (DataFrame/Series/array) in obj (a table, list, tuple or dict).
+    """
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        for o in obj:
+            shape = _shape(o)
+            if shape != (None, None):
+                return shape
+        return None, None
+    shape = getattr(obj, 'shape', None)
+    if isinstance(shape, tuple) and len(shape) in (1, 2) and not isinstance(obj, (str, bytes)):
+        return int(shape[0]), int(shape[1]) if len(shape) == 2 else 1
+    return None, None
+
+
+def _write(record):
+    line = json.dumps(record, default=str)
+    with _LOCK:
+        with open(_PATH, 'a') as f:
+            f.write(line + '\n')
+
+
+class profile_stage:
+    """
+    A context manager to profile a block of code as a stage.
+
+    with profile_stage('rf.predict', X) as rec:
+        y_pred = rf.predict(X)
+        rec['out'] = y_pred
+
+    The `rec` dict may be updated with extra fields (an 'out' key is replaced by output rows/columns).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    __slots__ = ('name', 'inputs', 'rec', '_on', '_t0', '_c0', '_rss0', '_mem0')
+
+    def __init__(self, name, inputs=None):
+        self.name = name
+        self.inputs = inputs
+        self.rec = {}
+
+    def __enter__(self):
+        self._on = _ENABLED
+        if not self._on:
+            return self.rec
+        if _MEMORY and tracemalloc.is_tracing():
+            cur, peak = tracemalloc.get_traced_memory()
+            # the peak is reset below, keep the outer stage peak so far
+            if _PEAKS:
+                _PEAKS[-1] = max(_PEAKS[-1], peak)
+            _PEAKS.append(0)
+            tracemalloc.reset_peak()
+            self._mem0 = cur
+        self._rss0 = _rss_peak_mb()
+        self._c0 = time.process_time()
+        self._t0 = time.perf_counter()
+        return self.rec
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._on:
+            return False
+        wall = time.perf_counter() - self._t0
+        cpu = time.process_time() - self._c0
+        rss = _rss_peak_mb()
+
+        rec = {'stage': self.name, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(),
+               'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+               'rss_peak_mb': rss, 'rss_peak_delta_mb': None if rss is None else round(rss - self._rss0, 3)}
+
+        if _MEMORY and tracemalloc.is_tracing() and _PEAKS:
+            peak = max(tracemalloc.get_traced_memory()[1], _PEAKS.pop())
+            rec['mem_peak_delta_mb'] = round((peak - self._mem0) / 1024 ** 2, 3)
+            if _PEAKS:
+                _PEAKS[-1] = max(_PEAKS[-1], peak)
+
+        rec['in_rows'], rec['in_cols'] = _shape(self.inputs)
+        extra = dict(self.rec)
+        rec['out_rows'], rec['out_cols'] = _shape(extra.pop('out', None))
+        rec.update(extra)
+        if exc_type is not None:
+            rec['error'] = exc_type.__name__
+        _write(rec)
+        return False
+
+
+def profiled(func=None, *, stage=None):
+    """
+    A decorator to profile a function as a stage (default name: module.function).
+
+    @profiled
+    def count_visits_for_patient(df, name='A TABLE', sh=True): ...
+
+    @profiled(stage='preprocessing.faq')
+    def faq_pos_neg_classification(df_long): ...
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if func is None:
+        return functools.partial(profiled, stage=stage)
+
+    name = stage if stage else f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kw):
+        if not _ENABLED:
+            return func(*args, **kw)
+        with profile_stage(name, (args, kw)) as rec:
+            result = func(*args, **kw)
+            rec['out'] = result
+        return result
+
+    return wrapper
+
+
+def read_profile(path='mci_profile.jsonl'):
+    """
+    Reads profile records into a df.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import pandas as pd
+    return pd.read_json(path, lines=True)
+
+
+def summarize_profile(path='mci_profile.jsonl'):
+    """
+    Total/mean wall and CPU time, number of calls and max memory of each stage, sorted by total wall time.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    prof = read_profile(path)
+    agg = {'wall_s': ['count', 'sum', 'mean'], 'cpu_s': ['sum'], 'rss_peak_mb': ['max']}
+    if 'mem_peak_delta_mb' in prof.columns:
+        agg['mem_peak_delta_mb'] = ['max']
+    summary = prof.groupby('stage').agg(agg)
+    summary.columns = ['_'.join(c) for c in summary.columns]
+    return summary.sort_values('wall_s_sum', ascending=False)
+
+
+# switch on by environment variables
+if os.environ.get('MCI_PROFILE', '') not in ('', '0'):
+    _path = os.environ['MCI_PROFILE']
+    enable('mci_profile.jsonl' if _path == '1' else _path, memory=os.environ.get('MCI_PROFILE_MEMORY', '') not in ('', '0'))
@@ -0,0 +1,115 @@
+"""
+Auxiliary figure RENDERING functions.
+
+Runs plot functions (e.g. mci_rf_bl.plot_*, mci_permutation.plot_permuted_features, mci_plot.*) as batch jobs:
+    - off-screen (Agg backend) in a process pool,
+    - each job closes all its figures after saving,
+    - a job is skipped if its input data and plot parameters have not changed since the last rendering,
+    - render time is reported for each figure.
+
+Usage:
+--------------------------
+jobs = [{'func': mperm.plot_permuted_features,
+         'args': (df,),
+         'kw': {'file_name_prefix': FILE_NAME_PREFIX, 'type': 'shuffle', 'save': False},
+         'save_path': RESULTS_DIR / f'{FILE_NAME_PREFIX}-shuffle-features.png'},
+        ...]
+timings = mrender.render_figures(jobs, max_workers=4)
+
+Plot functions that save figures by themselves should be called with save=False, the figure is saved by the renderer.
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import time
+import warnings
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import mci_utils as mutils
+
+
+def _init_worker():
+    """
+    Sets the off-screen (Agg) backend in a worker process.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _hash_path(save_path):
+    return save_path.with_name(save_path.name + '.hash')
+
+
+def render_job(func, args=(), kw={}, save_path='figure.png', name=None, force=False, savefig_kw={}):
+    """
+    Renders a single figure: calls func(*args, **kw), saves the current figure to `save_path` and closes all figures.
+
+    A hash of the input data and plot parameters is saved next to the figure (`save_path`.hash).
+    If the hash is unchanged (and the figure exists) rendering is skipped (unless force=True).
+
+    Returns:
+    --------------------------
+    a dict with: name, path, skipped, seconds.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import matplotlib.pyplot as plt
+
+    save_path = Path(save_path)
+    name = name if name else save_path.stem
+    key = mutils.hash_data(func, args, kw, savefig_kw)
+    hash_path = _hash_path(save_path)
+
+    if not force and save_path.exists() and hash_path.exists() and hash_path.read_text() == key:
+        return {'name': name, 'path': str(save_path), 'skipped': True, 'seconds': 0.0}
+
+    t0 = time.perf_counter()
+    plt.close('all')
+    try:
+        with warnings.catch_warnings():
+            # plt.show() called by plot functions under a non-interactive backend
+            warnings.filterwarnings('ignore', message='.*non-interactive.*')
+            func(*args, **kw)
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+            plt.gcf().savefig(save_path, **savefig_kw)
+    finally:
+        plt.close('all')
+    seconds = time.perf_counter() - t0
+
+    hash_path.write_text(key)
+    return {'name': name, 'path': str(save_path), 'skipped': False, 'seconds': seconds}
+
+
+def render_figures(jobs, max_workers=None, force=False):
+    """
+    Renders figures in a process pool with the off-screen (Agg) backend.
+
+    Parameters:
+    --------------------------
+    jobs - a list of dicts with keys: 'func', 'save_path' and optional: 'args', 'kw', 'name', 'savefig_kw'.
+           'func' must be a module level function (e.g. mci_plot.time_plot),
+    max_workers - number of worker processes (None: number of CPUs). If 0, jobs are rendered in the current process
+                  (with the current backend),
+    force - render all figures, even if their input data have not changed.
+
+    Returns:
+    --------------------------
+    a df with render time of each figure (columns: name, path, skipped, seconds).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    jobs = [dict(j, force=force) for j in jobs]
+
+    if max_workers == 0:
+        results = [render_job(**j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as ex:
+            futures = [ex.submit(render_job, **j) for j in jobs]
+            results = [f.result() for f in futures]
+
+    return pd.DataFrame(results, columns=['name', 'path', 'skipped', 'seconds'])
@@ -3,16 +3,93 @@ Auxiliary Random Forests functions.
 
 (C) MCI group.
 
-Created: 2021.05.18 / Updated: 2021.06.23
+Created: 2021.05.18 / Updated: 2026.10.19
 """
 
 import numpy as np
+import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 
 from pathlib import Path
 
+import mci_log as mlog
+import mci_profile as mprof
 
+log = mlog.get_logger('rf_bl')
+
+
+# confusion matrix cell coded as 2*y_true + y_pred (0:TN, 1:FP, 2:FN, 3:TP)
+CM_CATEGORIES = ['TN', 'FP', 'FN', 'TP']
+CLASS_CATEGORIES = ['sMCI', 'cAD']
+
+
+def _cm_codes(y_true, y_pred):
+    """
+    Integer code of a confusion matrix cell for each subject: 2*y_true + y_pred (0:TN, 1:FP, 2:FN, 3:TP).
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    y_true = np.asarray(y_true, dtype=np.int8)
+    y_pred = np.asarray(y_pred, dtype=np.int8)
+    return 2 * y_true + y_pred
+
+
+def confusion_matrix_annotation(y_true, y_pred, index=None):
+    """
+    Annotate predictions with confusion matrix coefficients (TP/TN/FP/FN) without copying the X set.
+    
+    Returns a small frame (aligned with X by `index`) with categorical columns 'y_true_', 'y_pred_' (sMCI/cAD) and 'CM_pred_' (TP/TN/FP/FN).
+    The annotation can be joined to X when needed: X.join(annotation).
+    
+    Parameters:
+    -------------
+    y_true, y_pred - 0/1 arrays (1 = cAD),
+    index - index of the X set (default: y_true index if y_true is a Series).
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if index is None:
+        index = getattr(y_true, 'index', None)
+    codes = _cm_codes(y_true, y_pred)
+    
+    return pd.DataFrame({'y_true_': pd.Categorical.from_codes(codes // 2, categories=CLASS_CATEGORIES),
+                         'y_pred_': pd.Categorical.from_codes(codes % 2, categories=CLASS_CATEGORIES),
+                         'CM_pred_': pd.Categorical.from_codes(codes, categories=CM_CATEGORIES)}, index=index)
+
+
+def confusion_matrix_annotation_folds(y_true_lst, y_pred_lst, index_lst=None, fold_names=None, fold_col='Fold_'):
+    """
+    Batched version of confusion_matrix_annotation(). Annotates predictions of all folds (e.g. CV50) in one call.
+    
+    Parameters:
+    -------------
+    y_true_lst, y_pred_lst - lists with 0/1 arrays, one per fold,
+    index_lst - list with X indices of each fold (e.g. validation indices), 
+    fold_names - fold names stored in the `fold_col` column (default: 0,1,2,...).
+    
+    Returns:
+    -------------
+    One long annotation frame with a `fold_col` column.
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if index_lst is None:
+        index_lst = [getattr(y, 'index', np.arange(len(y))) for y in y_true_lst]
+    if fold_names is None:
+        fold_names = range(len(y_true_lst))
+        
+    lengths = [len(y) for y in y_true_lst]
+    y_true = np.concatenate([np.asarray(y) for y in y_true_lst])
+    y_pred = np.concatenate([np.asarray(y) for y in y_pred_lst])
+    index = np.concatenate([np.asarray(i) for i in index_lst])
+    
+    annotation = confusion_matrix_annotation(y_true, y_pred, index=index)
+    annotation[fold_col] = np.repeat(np.asarray(list(fold_names)), lengths)
+    return annotation
+
+
+@mprof.profiled
 def confusion_matrix_coefficients_TPTNFPFN(X, y_true, y_pred):
     """
     Calculate usion matrix coefficients.
@@ -21,24 +98,20 @@ def confusion_matrix_coefficients_TPTNFPFN(X, y_true, y_pred):
     -------------
     X - test or validation (in e.g. CV10) set
     
-    C: 2021.05.18./ U: 2021.05.18
+    To annotate predictions without copying X see: confusion_matrix_annotation().
+    
+    C: 2021.05.18./ U: 2026.10.19
     """
-
+    annotation = confusion_matrix_annotation(y_true, y_pred, index=X.index)
     X_extended = X.copy()
-    X_extended['y_true_'] = np.where(y_true == 1, 'cAD', 'sMCI')
-    X_extended['y_pred_'] = np.where(y_pred == 1, 'cAD', 'sMCI')
-    
-    # https://www.statology.org/compare-two-columns-in-pandas/
-    conditions = [(X_extended['y_true_'] == 'cAD') &  (X_extended['y_pred_'] == 'cAD'),
-                 (X_extended['y_true_'] == 'sMCI') &  (X_extended['y_pred_'] == 'sMCI'),
-                 (X_extended['y_true_'] == 'sMCI') &  (X_extended['y_pred_'] == 'cAD'),
-                 (X_extended['y_true_'] == 'cAD') &  (X_extended['y_pred_'] == 'sMCI')]
-    choices = ['TP', 'TN', 'FP', 'FN']
-    X_extended['CM_pred_'] = np.select(conditions, choices, default='Error')
+    X_extended['y_true_'] = annotation['y_true_'].astype(object).to_numpy()
+    X_extended['y_pred_'] = annotation['y_pred_'].astype(object).to_numpy()
+    X_extended['CM_pred_'] = annotation['CM_pred_'].astype(object).to_numpy()
     
     return X_extended
     
     
+@mprof.profiled
 def link_prediction_results_with_other_subject_features(bl_table, predictions_df, cols2, filename='', save=True, results_dir=Path().cwd()):
     """
     Links prediction results with all other subject features.
@@ -58,15 +131,14 @@ def link_prediction_results_with_other_subject_features(bl_table, predictions_df
     cols = ['y_true_', 'y_pred_', 'CM_pred_'] + cols2
     # merge both tables by index
     bl_pred = bl_pred.merge(predictions_df[cols], how='left', left_index=True, right_index=True, indicator=f'MERGE_predictions_')
-    print(f'\nSubjects in the predictions table: {bl_pred.shape[0]}\n')
+    mlog.event(log, '\nSubjects in the predictions table: %d\n', bl_pred.shape[0], subjects=bl_pred.shape[0])
     
     if save:     
         bl_predictions_name = results_dir / filename
         bl_pred.sort_values(by=['RID'], inplace=True) 
         bl_pred.to_csv(bl_predictions_name, index=True)
         
-        print(f'Predictions have been saved to a file:')
-        print(f'\t\t{bl_predictions_name}')
+        mlog.event(log, 'Predictions have been saved to a file:\n\t\t%s', bl_predictions_name, path=bl_predictions_name)
         
     return bl_pred
  
@@ -99,7 +171,7 @@ def plot_mean_feature_importnce_cv(df, file_name_prefix, folds, figsize=(20,10),
         file_name_prefix_ext = f'{file_name_prefix}-CV{folds}-feat-importance-{orientation}.png'
         file_name_prefix_path = results_dir / file_name_prefix_ext
         plt.savefig(file_name_prefix_path)
-        print(f'Mean featue importacne plot saved to:\n\t\t{file_name_prefix_path}\n')
+        log.info('Mean featue importacne plot saved to:\n\t\t%s\n', file_name_prefix_path)
         
 
     plt.grid()
@@ -132,7 +204,7 @@ def plot_single_feature_importnce(df, file_name_prefix, figsize=(20,10), orienta
         file_name_prefix_ext = f'{file_name_prefix}-TEST-feat-importance-{orientation}.png'
         file_name_prefix_path = results_dir / file_name_prefix_ext
         plt.savefig(file_name_prefix_path)
-        print(f'Mean featue importacne plot saved to:\n\t\t{file_name_prefix_path}\n')
+        log.info('Mean featue importacne plot saved to:\n\t\t%s\n', file_name_prefix_path)
     
     plt.grid()
     plt.show()
@@ -158,7 +230,7 @@ def plot_confusion_matrix_CV(conf_mat_mean, conf_mat_mean_prc, folds, file_name_
 
     file_name_prefix_ext = f'{file_name_prefix}-conf-matrix-CV{folds}.png'
     file_name_prefix_path = result_dir / file_name_prefix_ext
-    print(f'Confusion matrix saved to:\n\n\t\t{file_name_prefix_path}\n')
+    log.info('Confusion matrix saved to:\n\n\t\t%s\n', file_name_prefix_path)
     
     if save:
         plt.savefig(file_name_prefix_path)
@@ -0,0 +1,379 @@
+"""
+Auxiliary model SCORING service.
+
+Scores new subjects with a trained sMCI/cAD forest:
+    - the model is loaded once,
+    - input features are validated against the training schema (feature names, numeric values, no missing values),
+    - concurrent requests are collected into micro-batches, each micro-batch is scored with one predict_proba() call,
+    - predictions are annotated as in mci_rf_bl (y_pred_, and y_true_ / CM_pred_ if true subgroups are given)
+      and optionally linked with other subject features of the bl table (by RID),
+    - latency and throughput metrics are collected.
+
+The service runs locally (offline) over HTTP:
+    POST /predict  - {"records": [{"RID": 12, "AGE": 71.2, ...}, ...]} or a single record -> {"predictions": [...]}
+    GET  /schema   - features expected by the model
+    GET  /metrics  - requests, records, batches, latency percentiles, throughput
+    GET  /health
+
+Usage:
+--------------------------
+python mci_serve.py --model rf.joblib --port 8000
+python mci_serve.py --model MODELS_DIR/rf-bl --port 8000     # a model artefact folder (mci_model)
+python mci_serve.py --model rf.joblib --score new_cohort.csv --out predictions.csv    # batch scoring, no server
+
+scorer = mserve.Scorer(rf, features)
+pred = scorer.score(X_new)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import json
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import mci_log as mlog
+import mci_model as mmodel
+import mci_rf_bl as mrfbl
+
+log = mlog.get_logger('serve')
+
+
+# record columns passed to predictions (not used as features)
+ID_COLS = ['RID', 'PTID', 'VISCODE3_', 'EXAMDATE']
+# a column with true subgroups (0/1 or 'sMCI'/'cAD'), optional
+Y_TRUE_COL = 'Subgroup_num_'
+# valid true subgroups -> 0/1 (1 = cAD)
+Y_TRUE_LABELS = {0: 0, 1: 1, 'sMCI': 0, 'cAD': 1}
+
+
+def load_model(path):
+    """
+    Loads a fitted model: a model artefact folder (see mci_model.save_model()) or a joblib/pickle file.
+
+    Returns:
+    --------------------------
+    model, features (from the artefact, or model.feature_names_in_ if the model was fitted on a df, otherwise None).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if Path(path).is_dir():
+        model, meta = mmodel.load_model(path)
+        return model, meta['features']
+
+    import joblib
+    model = joblib.load(path)
+    features = getattr(model, 'feature_names_in_', None)
+    return model, None if features is None else list(features)
+
+
+def validate_features(df, features, y_true_col=Y_TRUE_COL):
+    """
+    Checks the input df against the training schema: all features are present, numeric and not missing;
+    true subgroups (y_true_col, if present) are 0/1 or 'sMCI'/'cAD' (missing values are allowed).
+    Raises ValueError with all problems found.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    errors = []
+    missing = [f for f in features if f not in df.columns]
+    if missing:
+        errors.append(f'missing features: {missing}')
+    present = [f for f in features if f in df.columns]
+    not_numeric = [f for f in present if not pd.api.types.is_numeric_dtype(df[f]) or pd.api.types.is_bool_dtype(df[f])]
+    if not_numeric:
+        errors.append(f'not numeric features: {not_numeric}')
+    nans = [f for f in present if f not in not_numeric and df[f].isna().any()]
+    if nans:
+        errors.append(f'missing values in features: {nans}')
+    if y_true_col in df.columns:
+        y_true = df[y_true_col].dropna()
+        wrong = y_true[y_true.map(Y_TRUE_LABELS).isna()]
+        if wrong.size:
+            errors.append(f'wrong values in {y_true_col}: {sorted(set(map(str, wrong)))} (use: 0/1 or sMCI/cAD)')
+    if errors:
+        raise ValueError('; '.join(errors))
+
+
+def _y_true(values):
+    """
+    True subgroups as 0/1 (1 = cAD), accepts 0/1 or 'sMCI'/'cAD' (see validate_features()).
+    """
+    return pd.Series(values).map(Y_TRUE_LABELS).to_numpy()
+
+
+def annotate_predictions(records, proba, threshold=0.5, bl_table=None, bl_cols=None):
+    """
+    Annotates predictions as in mci_rf_bl: ID columns of records, proba_cAD_, y_pred_ ('sMCI'/'cAD'),
+    and y_true_ / CM_pred_ if records have true subgroups (Y_TRUE_COL, with no missing values).
+    If bl_table is given (indexed by any, with a RID column), predictions are linked with its `bl_cols` by RID.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    y_pred = (proba > threshold).astype(np.int8)
+    pred = records[[c for c in ID_COLS if c in records.columns]].copy()
+    pred['proba_cAD_'] = proba
+
+    if Y_TRUE_COL in records.columns and records[Y_TRUE_COL].notna().all():
+        annotation = mrfbl.confusion_matrix_annotation(_y_true(records[Y_TRUE_COL]), y_pred, index=records.index)
+        pred = pred.join(annotation)
+    else:
+        pred['y_pred_'] = pd.Categorical.from_codes(y_pred, categories=mrfbl.CLASS_CATEGORIES)
+
+    if bl_table is not None and 'RID' in pred.columns:
+        bl_cols = bl_cols if bl_cols else [c for c in bl_table.columns if c not in pred.columns]
+        bl = bl_table.drop_duplicates('RID').set_index('RID')[[c for c in bl_cols if c != 'RID']]
+        pred = pred.join(bl, on='RID')
+    return pred
+
+
+class Scorer:
+    """
+    Scores records with a fitted model. Concurrent calls of submit() are collected into micro-batches
+    (up to `max_batch` records, waiting at most `max_wait_ms` for more requests) scored with one predict_proba() call.
+
+    scorer = Scorer(rf, features)
+    pred = scorer.score(X)            # a df, synchronously (e.g. batch scoring)
+    future = scorer.submit(X)         # micro-batched, future.result() -> a df
+    scorer.close()
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    def __init__(self, model, features=None, threshold=0.5, max_batch=1024, max_wait_ms=5, bl_table=None, bl_cols=None):
+        features = features if features is not None else getattr(model, 'feature_names_in_', None)
+        if features is None:
+            raise ValueError('Feature names are not known, give `features` (the training feature list).')
+        self.model = model
+        self.features = list(features)
+        self.threshold = threshold
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.bl_table = bl_table
+        self.bl_cols = bl_cols
+        self._cad = list(model.classes_).index(1)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latency = deque(maxlen=10000)
+        self._batch_sizes = deque(maxlen=10000)
+        self._counts = {'requests': 0, 'records': 0, 'batches': 0, 'errors': 0}
+        self._t0 = time.time()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='mci-scorer', daemon=True)
+        self._worker.start()
+
+    def _predict(self, records):
+        # a df if the model was fitted on a df (feature names are checked by sklearn)
+        X = records[self.features]
+        X = X if hasattr(self.model, 'feature_names_in_') else X.to_numpy(dtype=float)
+        return self.model.predict_proba(X)[:, self._cad]
+
+    def score(self, records):
+        """
+        Validates and scores records (a df) synchronously.
+        """
+        validate_features(records, self.features)
+        proba = self._predict(records)
+        return annotate_predictions(records, proba, self.threshold, self.bl_table, self.bl_cols)
+
+    def submit(self, records):
+        """
+        Validates records (a df) and queues them for micro-batched scoring. Returns a Future with annotated predictions.
+        """
+        validate_features(records, self.features)
+        future = Future()
+        self._queue.put((records, future, time.perf_counter()))
+        return future
+
+    def _next_batch(self):
+        """
+        Waits for the first request, then collects more requests for max_wait seconds (up to max_batch records).
+        """
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch, n = [item], item[0].shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            n += item[0].shape[0]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                records = pd.concat([b[0] for b in batch], ignore_index=True)
+                proba = self._predict(records)
+            except Exception as exc:
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                with self._lock:
+                    self._counts['errors'] += len(batch)
+                continue
+
+            # a failed annotation fails its own request only, the worker keeps running
+            start, errors = 0, 0
+            now = time.perf_counter()
+            for rec, future, t0 in batch:
+                stop = start + rec.shape[0]
+                try:
+                    future.set_result(annotate_predictions(rec, proba[start:stop], self.threshold, self.bl_table,
+                                                           self.bl_cols))
+                except Exception as exc:
+                    future.set_exception(exc)
+                    errors += 1
+                start = stop
+                self._latency.append(now - t0)
+            with self._lock:
+                self._counts['errors'] += errors
+                self._counts['requests'] += len(batch) - errors
+                self._counts['records'] += records.shape[0]
+                self._counts['batches'] += 1
+                self._batch_sizes.append(records.shape[0])
+
+    def metrics(self):
+        """
+        A dict with: requests, records, batches, errors, mean batch size, latency percentiles (ms) of recent
+        requests, throughput (records/s since start) and uptime (s).
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            latency = np.array(self._latency) * 1000
+            sizes = np.array(self._batch_sizes)
+        uptime = time.time() - self._t0
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99]) if latency.size else (None, None, None)
+        return dict(counts, mean_batch=float(sizes.mean()) if sizes.size else None,
+                    latency_ms_p50=p50, latency_ms_p95=p95, latency_ms_p99=p99,
+                    throughput_rps=counts['records'] / uptime if uptime else None, uptime_s=uptime)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    HTTP requests of the scoring service (self.server.scorer is a Scorer).
+    """
+    def _send(self, code, obj):
+        body = obj if isinstance(obj, bytes) else json.dumps(obj, default=str).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        scorer = self.server.scorer
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/schema':
+            self._send(200, {'features': scorer.features, 'id_columns': ID_COLS, 'y_true_column': Y_TRUE_COL,
+                             'threshold': scorer.threshold})
+        elif self.path == '/metrics':
+            self._send(200, scorer.metrics())
+        else:
+            self._send(404, {'error': f'unknown path: {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send(404, {'error': f'unknown path: {self.path}'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            records = body.get('records', body) if isinstance(body, dict) else body
+            records = pd.DataFrame(records if isinstance(records, list) else [records])
+            pred = self.server.scorer.submit(records).result(timeout=self.server.timeout_s)
+        except ValueError as exc:
+            self._send(400, {'error': str(exc)})
+            return
+        except Exception as exc:
+            mlog.event(log, 'Scoring error: %s', exc, level=mlog.ERROR, error=type(exc).__name__)
+            self._send(500, {'error': str(exc)})
+            return
+        self._send(200, b'{"predictions": ' + pred.to_json(orient='records').encode() + b'}')
+
+    def log_message(self, format, *args):
+        mlog.event(log, format, *args, level=mlog.DEBUG)
+
+
+def make_server(scorer, host='127.0.0.1', port=8000, timeout_s=30):
+    """
+    Creates a threaded HTTP server of the scoring service (see the module description); server.serve_forever() runs it.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.scorer = scorer
+    server.timeout_s = timeout_s
+    return server
+
+
+def serve(model_path, host='127.0.0.1', port=8000, features=None, bl_table=None, bl_cols=None, **kw):
+    """
+    Loads a model and runs the scoring service until interrupted. kw - Scorer parameters (threshold, max_batch, max_wait_ms).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    model, model_features = load_model(model_path)
+    scorer = Scorer(model, features if features else model_features, bl_table=bl_table, bl_cols=bl_cols, **kw)
+    server = make_server(scorer, host, port)
+    mlog.event(log, 'Scoring service: http://%s:%d (%d features)', host, server.server_port, len(scorer.features),
+               host=host, port=server.server_port, features=len(scorer.features))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scorer.close()
+        mlog.event(log, 'Scoring service stopped: %s', scorer.metrics(), **scorer.metrics())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='sMCI/cAD scoring service.')
+    parser.add_argument('--model', required=True, help='a model artefact folder (mci_model) or a fitted model file (joblib)')
+    parser.add_argument('--features', nargs='*', default=None, help='training features (default: from the model)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--bl', default=None, help='a bl table csv to link predictions with (by RID)')
+    parser.add_argument('--score', default=None, help='a csv file to score in batch (no server)')
+    parser.add_argument('--out', default='predictions.csv', help='batch predictions file')
+    a = parser.parse_args()
+
+    bl_table = pd.read_csv(a.bl, index_col=0) if a.bl else None
+    if a.score:
+        model, model_features = load_model(a.model)
+        scorer = Scorer(model, a.features if a.features else model_features, threshold=a.threshold, bl_table=bl_table)
+        scorer.score(pd.read_csv(a.score)).to_csv(a.out, index=False)
+        scorer.close()
+        mlog.event(log, 'Predictions saved to:\n\t\t%s', a.out, path=a.out)
+    else:
+        serve(a.model, a.host, a.port, a.features, bl_table, threshold=a.threshold)
@@ -0,0 +1,290 @@
+"""
+Auxiliary SHAP (SHapley Additive exPlanations) functions for Random Forests.
+
+Exact (path-dependent) TreeSHAP values of the cAD probability of a fitted sklearn forest (Lundberg et al. 2018,
+Algorithm 2), without the external shap package:
+    - a tree is traversed once for all subjects: the path structure (features, zero fractions) is shared,
+      only one fractions and path weights are per-subject arrays,
+    - trees are computed in parallel (joblib),
+    - results are cached by (model hash, data hash), in memory and optionally in a folder,
+    - grouped features follow the `groups` convention of mci_permutation (a nested list of feature names);
+      a group value is the sum of SHAP values of its features.
+
+Additivity: expected_value + SHAP values of a subject (summed over features) = predicted cAD probability.
+
+Usage:
+--------------------------
+shap_df, expected_value = mshap.tree_shap(rf, X_test, groups=[['LRHHC_n_long', 'LRLV_n_long']], n_jobs=-1)
+mshap.shap_importance(shap_df)
+mshap.plot_shap_summary(shap_df, X_test, FILE_NAME_PREFIX, save=True, results_dir=RESULTS_DIR)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from pathlib import Path
+
+import mci_log as mlog
+import mci_utils as mutils
+import mci_model as mmodel
+import mci_profile as mprof
+import mci_permutation as mperm
+
+log = mlog.get_logger('shap')
+
+
+# in-memory cache: (model hash, data hash) -> (SHAP values, expected value)
+_CACHE = {}
+_CACHE_SIZE = 16
+
+
+def _tree_arrays(tree, cad):
+    """
+    Node arrays of a fitted sklearn tree: children, split features and thresholds, covers (weighted number
+    of training samples) and the cAD probability of each node.
+    """
+    value = tree.value[:, 0, :]
+    return {'left': tree.children_left, 'right': tree.children_right, 'feature': tree.feature,
+            'threshold': tree.threshold, 'cover': tree.weighted_n_node_samples,
+            'value': value[:, cad] / value.sum(axis=1)}
+
+
+def _extend(feat, zero, one, pw, p_zero, p_one, p_feat):
+    """
+    EXTEND of a path by a split (p_zero - a shared zero fraction, p_one - one fractions of subjects).
+    Path weights of all path elements are updated at once.
+    """
+    l = len(feat)
+    feat = feat + [p_feat]
+    zero = np.append(zero, p_zero)
+    one = np.vstack([one, p_one[None, :]])
+    if l == 0:
+        return feat, zero, one, np.ones((1, p_one.shape[0]))
+
+    w = np.vstack([pw, np.zeros((1, pw.shape[1]))])
+    i = np.arange(l + 1)[:, None]
+    new = p_zero * w * (l - i) / (l + 1)
+    new[1:] += p_one * w[:-1] * i[1:] / (l + 1)
+    return feat, zero, one, new
+
+
+def _unwind(feat, zero, one, pw, k):
+    """
+    UNWIND of the path element k (a feature split again deeper in the tree).
+    """
+    l = len(feat) - 1
+    o, z = one[k], zero[k]
+    nz = o != 0
+    safe_o = np.where(nz, o, 1.0)
+
+    w = pw[:-1].copy()
+    nxt = pw[l].copy()
+    for i in range(l - 1, -1, -1):
+        tmp = w[i].copy()
+        w_one = nxt * (l + 1) / ((i + 1) * safe_o)
+        w_zero = tmp * (l + 1) / (z * (l - i))
+        w[i] = np.where(nz, w_one, w_zero)
+        nxt = np.where(nz, tmp - w[i] * z * (l - i) / (l + 1), nxt)
+
+    keep = [j for j in range(l + 1) if j != k]
+    return [feat[j] for j in keep], zero[keep], one[keep], w
+
+
+def _unwound_sums(zero, one, pw):
+    """
+    Sums of path weights after unwinding each path element 1..D (UNWOUNDSUM), for all elements and subjects at once.
+
+    Returns an array (D, n_subjects).
+    """
+    D = pw.shape[0] - 1
+    o = one[1:]
+    z = zero[1:, None]
+    nz = o != 0
+    safe_o = np.where(nz, o, 1.0)
+
+    total_one = np.zeros_like(o)
+    nxt = np.broadcast_to(pw[D], o.shape)
+    for i in range(D - 1, -1, -1):
+        tmp = nxt / ((i + 1) * safe_o)
+        total_one += tmp
+        nxt = pw[i] - tmp * z * (D - i)
+
+    total_zero = (pw[:D] / (D - np.arange(D))[:, None]).sum(axis=0)[None, :] / z
+    return np.where(nz, total_one, total_zero) * (D + 1)
+
+
+def _tree_shap(t, X):
+    """
+    TreeSHAP values of one tree for all subjects (rows of X, float32 values as float64).
+
+    Returns:
+    --------------------------
+    phi - an array (n_subjects, n_features).
+    """
+    n = X.shape[0]
+    phi = np.zeros((n, X.shape[1]))
+    left, right, feature, threshold, cover, value = (t[k] for k in ['left', 'right', 'feature', 'threshold', 'cover', 'value'])
+
+    def recurse(node, path, p_zero, p_one, p_feat):
+        feat, zero, one, pw = _extend(*path, p_zero, p_one, p_feat)
+
+        if left[node] < 0:
+            if len(feat) > 1:
+                w = _unwound_sums(zero, one, pw)
+                contrib = w * (one[1:] - zero[1:, None]) * value[node]
+                # a feature is on the path at most once
+                phi[:, feat[1:]] += contrib.T
+            return
+
+        split = feature[node]
+        in_zero, in_one = 1.0, np.ones(n)
+        if split in feat:
+            k = feat.index(split)
+            in_zero, in_one = zero[k], one[k]
+            feat, zero, one, pw = _unwind(feat, zero, one, pw, k)
+
+        go_left = X[:, split] <= threshold[node]
+        path = (feat, zero, one, pw)
+        recurse(left[node], path, in_zero * cover[left[node]] / cover[node], in_one * go_left, split)
+        recurse(right[node], path, in_zero * cover[right[node]] / cover[node], in_one * ~go_left, split)
+
+    recurse(0, ([], np.zeros(0), np.zeros((0, n)), np.zeros((0, n))), 1.0, np.ones(n), -1)
+    return phi
+
+
+def _trees_shap(trees, X):
+    """
+    The sum of TreeSHAP values of a chunk of trees (a job of a worker).
+    """
+    return sum(_tree_shap(t, X) for t in trees)
+
+
+def _grouped(shap_df, groups):
+    """
+    SHAP values of feature groups (sums of SHAP values of group features) and single features.
+    """
+    info = mperm._get_feature_group_info(shap_df.columns, groups, verbose=False)
+    if info is None:
+        raise ValueError(f'Wrong feature names in groups: {groups}')
+    all_features, all_feature_names = info
+    return pd.DataFrame({name: shap_df[f].sum(axis=1) if isinstance(f, list) else shap_df[f]
+                         for name, f in all_feature_names.items()}, index=shap_df.index)
+
+
+@mprof.profiled
+def tree_shap(model, X, groups=[], n_jobs=None, cache=True, cache_dir=None, check_additivity=True):
+    """
+    Exact TreeSHAP values of the cAD probability (class 1) of a fitted forest (e.g. RandomForestClassifier).
+
+    Parameters:
+    --------------------------
+    model - a fitted sklearn forest (a classifier with 0/1 classes),
+    X - a df with training features (in the training order),
+    groups - a nested list with grouped feature names (as in mci_permutation), e.g. [['LRHHC_n_long', 'LRLV_n_long']],
+    n_jobs - number of parallel jobs over trees (joblib convention, None: 1, -1: all CPUs),
+    cache - reuse values computed before for the same model and data (in memory, and in `cache_dir` if given),
+    check_additivity - check if expected value + SHAP values = predicted probabilities.
+
+    Returns:
+    --------------------------
+    shap_df - SHAP values (a df indexed as X, columns: features or group names 'Group_0', ...),
+    expected_value - the mean cAD probability of the forest over the training data (the SHAP base value).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    from joblib import Parallel, delayed
+
+    key = mutils.hash_data(mmodel.forest_arrays(model), X)
+    cache_path = Path(cache_dir) / f'shap-{key}.npz' if cache_dir else None
+
+    if cache and key in _CACHE:
+        phi, expected_value = _CACHE[key]
+    elif cache and cache_path is not None and cache_path.exists():
+        with np.load(cache_path) as f:
+            phi, expected_value = f['phi'], float(f['expected_value'])
+    else:
+        cad = list(model.classes_).index(1)
+        trees = [_tree_arrays(e.tree_, cad) for e in model.estimators_]
+        # sklearn trees compare float32 feature values with float64 thresholds
+        Xf = np.asarray(X, dtype=np.float32).astype(np.float64)
+
+        n_workers = max(1, len(trees) if n_jobs == -1 else (n_jobs or 1))
+        chunks = [trees[k::n_workers] for k in range(n_workers) if trees[k::n_workers]]
+        with mprof.profile_stage('shap.trees', X):
+            parts = Parallel(n_jobs=n_jobs)(delayed(_trees_shap)(c, Xf) for c in chunks)
+        phi = sum(parts) / len(trees)
+        expected_value = float(np.mean([t['value'][0] for t in trees]))
+
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(cache_path, phi=phi, expected_value=expected_value)
+
+    if cache:
+        if len(_CACHE) >= _CACHE_SIZE:
+            _CACHE.pop(next(iter(_CACHE)))
+        _CACHE[key] = (phi, expected_value)
+
+    if check_additivity:
+        proba = model.predict_proba(X)[:, list(model.classes_).index(1)]
+        err = np.abs(expected_value + phi.sum(axis=1) - proba).max() if len(proba) else 0.0
+        if err > 1e-6:
+            raise ValueError(f'SHAP values do not add up to predicted probabilities (max error: {err:.2e})')
+        mlog.event(log, 'SHAP additivity check, max error: %.2e', err, level=mlog.DEBUG, max_error=err)
+
+    shap_df = pd.DataFrame(phi, index=X.index, columns=X.columns)
+    if groups:
+        shap_df = _grouped(shap_df, groups)
+    return shap_df, expected_value
+
+
+def shap_importance(shap_df, precission=4):
+    """
+    Mean absolute SHAP value of each feature (group), sorted in descending order.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    return shap_df.abs().mean().sort_values(ascending=False).rename('mean_abs_shap').round(precission)
+
+
+def plot_shap_summary(shap_df, X, file_name_prefix='', save=True, results_dir=Path().cwd(), figsize=(16,10), title_suffix=''):
+    """
+    SHAP summary plot: a dot for each subject and feature (SHAP value on the x axis), colored by the feature value
+    (blue - low, red - high). Features are sorted by mean absolute SHAP value. Groups (columns not in X) are gray.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    order = shap_importance(shap_df).index[::-1]
+    rng = np.random.default_rng(0)
+
+    fig, ax = plt.subplots(figsize=figsize)
+    for k, f in enumerate(order):
+        v = shap_df[f].to_numpy()
+        y = k + rng.uniform(-0.3, 0.3, v.shape[0])
+        if f in X.columns:
+            x = X[f].to_numpy(dtype=float)
+            lo, hi = np.nanpercentile(x, [5, 95]) if np.isfinite(x).any() else (0, 1)
+            c = np.clip((x - lo) / (hi - lo if hi > lo else 1), 0, 1)
+            sc = ax.scatter(v, y, c=c, cmap='coolwarm', s=12, alpha=0.8, vmin=0, vmax=1)
+        else:
+            ax.scatter(v, y, color='gray', s=12, alpha=0.8)
+
+    ax.axvline(0, color='black', linewidth=1)
+    ax.set_yticks(range(len(order)))
+    ax.set_yticklabels(order, fontsize=14)
+    ax.set_xlabel('SHAP value (impact on the cAD probability)', fontsize=16)
+    ax.grid(True, axis='x')
+    if 'sc' in locals():
+        cbar = fig.colorbar(sc, ax=ax, ticks=[0, 1])
+        cbar.ax.set_yticklabels(['low', 'high'])
+        cbar.set_label('Feature value', fontsize=14)
+    ax.set_title(f'SHAP summary. {title_suffix}', fontsize=20, fontweight='bold')
+
+    if save:
+        file_name_prefix_path = Path(results_dir) / f'{file_name_prefix}-shap-summary.png'
+        plt.savefig(file_name_prefix_path, bbox_inches='tight')
+        log.info('SHAP summary saved to:\n\t\t%s\n', file_name_prefix_path)
+
+    plt.show()
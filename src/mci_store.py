@@ -0,0 +1,152 @@
+"""
+Auxiliary prediction STORE functions.
+
+An append-only store for prediction results (e.g. from CV folds). Each (run, fold) is saved as a separate Parquet file
+in a partitioned folder:
+
+    store_dir/Run_=<run_id>/Fold_=<fold>/predictions.parquet
+
+Predictions are linked with the bl table (all other subject features) only when they are read.
+Requires pyarrow.
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import pandas as pd
+from pathlib import Path
+
+
+PREDICTION_COLS = ['RID', 'y_true_', 'y_pred_', 'CM_pred_']
+
+# partition keys are read as strings (hive partitioning would infer e.g. Fold_=0 as int32)
+PARTITION_COLS = ['Run_', 'Fold_']
+
+
+def _fold_path(store_dir, run_id, fold):
+    return Path(store_dir) / f'Run_={run_id}' / f'Fold_={fold}' / 'predictions.parquet'
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in PARTITION_COLS]), flavor='hive')
+
+
+def _fold_order(values):
+    """
+    A sort key of Fold_ values: numeric folds in numeric order ('2' before '10'), other names after them.
+    """
+    if values.name != 'Fold_':
+        return values
+    return pd.to_numeric(values, errors='coerce')
+
+
+def store_fold_predictions(store_dir, predictions_df, run_id, fold=0, cols2=[], bl_table=None):
+    """
+    Appends predictions of a single fold to the store. Storing the same (run_id, fold) again replaces that fold only.
+
+    Parameters:
+    ---------------
+    store_dir - a folder with the store,
+    predictions_df - a table with prediction results (i.e. confusion_matrix_annotation() or X_extended with y_true_, y_pred_, CM_pred_),
+    run_id - an experiment (run) name e.g. '3.02_RF-bl-permutation',
+    fold - a fold number/name e.g. in CV process,
+    cols2 - an extra columns to store from `predictions_df`,
+    bl_table - optional, the bl table to take RID from (if there is no RID column in predictions_df).
+
+    Returns:
+    ---------------
+    a path to the saved file.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    cols = [c for c in PREDICTION_COLS + cols2 if c in predictions_df.columns]
+    pred = predictions_df[cols]
+
+    if 'RID' not in pred.columns and bl_table is not None:
+        pred = pred.assign(RID=bl_table.loc[pred.index, 'RID'].to_numpy())
+
+    # keep index to link with the bl table, categories are stored as strings
+    pred = pred.rename_axis('Index_').reset_index()
+    for c in ['y_true_', 'y_pred_', 'CM_pred_']:
+        if c in pred.columns:
+            pred[c] = pred[c].astype(str)
+    if 'RID' in pred.columns:
+        pred = pred.sort_values(by=['RID'])
+
+    pth = _fold_path(store_dir, run_id, fold)
+    pth.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pth.with_suffix('.tmp')
+    pred.to_parquet(tmp, index=False)
+    tmp.replace(pth)
+    return pth
+
+
+def read_stored_predictions(store_dir, run_id=None, fold=None, filters=None, columns=None):
+    """
+    Reads predictions from the store. Only the selected runs/folds (partitions) and rows that fulfill `filters` are loaded.
+
+    Parameters:
+    ---------------
+    run_id, fold - a single value or a list of values (None: all),
+    filters - pyarrow filters, e.g. [('CM_pred_', '==', 'FN'), ('y_true_', '==', 'cAD')],
+    columns - columns to read (None: all).
+
+    Returns:
+    ---------------
+    a table with predictions indexed as the bl table (Index_), with 'Run_' and 'Fold_' columns (as strings),
+    sorted by run and fold (numeric folds in numeric order).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    filters = list(filters) if filters else []
+    for name, value in [('Run_', run_id), ('Fold_', fold)]:
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            filters.append((name, 'in', [str(v) for v in value]))
+        else:
+            filters.append((name, '==', str(value)))
+
+    if columns is not None:
+        columns = list(dict.fromkeys(['Index_', 'Run_', 'Fold_'] + list(columns)))
+
+    pred = pd.read_parquet(store_dir, columns=columns, filters=filters or None, partitioning=_partitioning())
+    for c in PARTITION_COLS:
+        if c in pred.columns:
+            pred[c] = pred[c].astype(str)
+    pred = pred.sort_values(by=[c for c in PARTITION_COLS if c in pred.columns], key=_fold_order, kind='stable')
+    return pred.set_index('Index_')
+
+
+def get_misclassified_predictions(store_dir, subgroup='cAD', run_id=None, fold=None):
+    """
+    Gets all misclassified subjects of a subgroup across folds, e.g. subgroup='cAD' returns all FN predictions, 'sMCI' all FP predictions.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    cm = {'cAD': 'FN', 'sMCI': 'FP'}[subgroup]
+    return read_stored_predictions(store_dir, run_id=run_id, fold=fold, filters=[('CM_pred_', '==', cm)])
+
+
+def link_stored_predictions(bl_table, store_dir, run_id=None, fold=None, filters=None, bl_columns=None):
+    """
+    Links stored prediction results with all other subject features (see: mci_rf_bl.link_prediction_results_with_other_subject_features()).
+    A subject is present once for each (run, fold) it was predicted in.
+
+    Parameters:
+    ---------------
+    bl_table - the bl table with all feature subjects to read from,
+    bl_columns - columns to select from the bl table (None: all).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    pred = read_stored_predictions(store_dir, run_id=run_id, fold=fold, filters=filters)
+    bl = bl_table if bl_columns is None else bl_table[bl_columns]
+
+    bl_pred = bl.loc[pred.index]
+    new_cols = {c: pred[c].to_numpy() for c in pred.columns if c not in bl_pred.columns}
+    bl_pred = bl_pred.assign(**new_cols)
+    return bl_pred.sort_values(by=PARTITION_COLS + (['RID'] if 'RID' in bl_pred.columns else []), key=_fold_order,
+                               kind='stable')
@@ -0,0 +1,251 @@
+"""
+Auxiliary FEATURE SUBSET search functions.
+
+Model variants (e.g. with / without FAQ, "without gender") are evaluated on stored CV splits
+(see mutils.load_train_val_cv_splits_from_file()) instead of rerunning a notebook per variant:
+    - an explicit dict of subsets, all drop-column subsets of features and groups (as in mperm.dropcol_importances()),
+      or a greedy forward selection / backward elimination,
+    - (subset, fold) fits run in parallel (joblib),
+    - fold results are cached by (data, subset, split, fold, hyperparameters), in memory and optionally in a folder,
+      so overlapping experiments (e.g. steps of forward selection, dropcol subsets) reuse fits,
+    - a comparison table with mean/std scores, differences to a reference subset and timings.
+
+Usage:
+--------------------------
+splits = mutils.load_train_val_cv_splits_from_file(kfolds_file, CV=10)
+subsets = msub.dropcol_subsets(FEATURES, groups=[['LRHHC_n_long', 'LRLV_n_long']])
+table = msub.evaluate_subsets(clf, X_train, y_train, subsets, splits, split_id='kfolds-CV10', n_jobs=-1,
+                              cache_dir=RESULTS_DIR / 'subset-cache', reference='all')
+history = msub.forward_selection(clf, X_train, y_train, splits, split_id='kfolds-CV10', n_jobs=-1)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import json
+import time
+import pandas as pd
+from pathlib import Path
+
+from sklearn.base import clone
+
+import mci_log as mlog
+import mci_utils as mutils
+import mci_profile as mprof
+import mci_permutation as mperm
+
+log = mlog.get_logger('subsets')
+
+
+SCORES = ['f1', 'acc', 'recall', 'prec']
+
+# fold results: key -> a dict with scores and timings
+_CACHE = {}
+
+
+def _fold_key(data_key, subset, split_id, fold, params):
+    # the column order is a part of the key (it changes results of a seeded forest)
+    return mutils.hash_data(data_key, list(subset), split_id, fold, params)
+
+
+def _params(model):
+    """
+    The model class and all its hyperparameters (dicts such as class_weight included, nested estimators recursively),
+    hashed with the fold key by mutils.hash_data().
+    """
+    params = {k: _params(v) if hasattr(v, 'get_params') and not isinstance(v, type) else v
+              for k, v in model.get_params(deep=False).items()}
+    return {'class': f'{type(model).__module__}.{type(model).__qualname__}', 'params': params}
+
+
+def _read_cached(key, cache_dir):
+    if key in _CACHE:
+        return _CACHE[key]
+    if cache_dir is not None:
+        pth = Path(cache_dir) / f'fold-{key}.json'
+        if pth.exists():
+            _CACHE[key] = json.loads(pth.read_text())
+            return _CACHE[key]
+    return None
+
+
+def _write_cached(key, result, cache_dir):
+    _CACHE[key] = result
+    if cache_dir is not None:
+        pth = Path(cache_dir) / f'fold-{key}.json'
+        pth.parent.mkdir(parents=True, exist_ok=True)
+        tmp = pth.with_suffix('.tmp')
+        tmp.write_text(json.dumps(result))
+        tmp.replace(pth)
+
+
+def _fit_fold(model, X, y, subset, train_idx, val_idx):
+    """
+    Fits a clone of the model on train rows of the subset features and scores it on validation rows.
+    """
+    m = clone(model)
+    t0 = time.perf_counter()
+    m.fit(X.iloc[train_idx][subset], y.iloc[train_idx])
+    t1 = time.perf_counter()
+    y_pred = m.predict(X.iloc[val_idx][subset])
+    t2 = time.perf_counter()
+    f1, acc, recall, prec = mperm._get_4_scores(y.iloc[val_idx], y_pred)
+    return {'f1': f1, 'acc': acc, 'recall': recall, 'prec': prec, 'fit_s': t1 - t0, 'predict_s': t2 - t1}
+
+
+def dropcol_subsets(features, groups=[], verbose=False):
+    """
+    Subsets of a drop-column experiment: all features ('all') and all features without each feature or group
+    (named as in mperm.dropcol_importances(): a feature name or 'Group_k').
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    features = list(features)
+    info = mperm._get_feature_group_info(features, groups, verbose)
+    if info is None:
+        raise ValueError(f'Wrong feature names in groups: {groups}')
+    all_features, all_feature_names = info
+
+    subsets = {'all': features}
+    for name, cols in all_feature_names.items():
+        cols = cols if isinstance(cols, list) else [cols]
+        subsets[name] = [f for f in features if f not in cols]
+    return subsets
+
+
+@mprof.profiled
+def evaluate_subsets(model, X, y, subsets, splits, split_id=None, n_jobs=None, cache_dir=None, reference=None,
+                     precission=3):
+    """
+    Evaluates feature subsets on CV splits; fits not found in the cache are run in parallel.
+
+    Parameters:
+    --------------------------
+    model - an unfitted (or fitted, it is cloned) sklearn classifier with the hyperparameters to use,
+    X, y - the data the splits refer to (e.g. X_train, y_train),
+    subsets - a dict: name -> a list of features (or a list of lists, named 'Subset_0', ...),
+    splits - a list of (train, val) positional indices (mutils.load_train_val_cv_splits_from_file()),
+    split_id - a name of the splits (e.g. 'kfolds-CV10', default: a hash of the indices),
+    n_jobs - number of parallel fits (joblib convention),
+    cache_dir - a folder with cached fold results (optional, results are always cached in memory),
+    reference - a subset name, e.g. 'all': columns '<score>_diff' = reference score - subset score (as in dropcol).
+
+    Returns:
+    --------------------------
+    a comparison df (one row per subset): n_features, '<score>_mean' / '<score>_std' (over folds), differences to the
+    reference, fit_s (fit time summed over folds, cached times included), cached (nr of folds read from the cache).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    from joblib import Parallel, delayed
+
+    if not isinstance(subsets, dict):
+        subsets = {f'Subset_{k}': list(s) for k, s in enumerate(subsets)}
+    missing = sorted({f for s in subsets.values() for f in s if f not in X.columns})
+    if missing:
+        raise ValueError(f'Features not in X: {missing}')
+    if reference is not None and reference not in subsets:
+        raise ValueError(f'Reference subset not in subsets: {reference}')
+
+    split_id = split_id if split_id is not None else mutils.hash_data([list(s) for s in splits])
+    data_key = mutils.hash_data(X, y)
+    params = _params(model)
+
+    results, todo = {}, []
+    for name, subset in subsets.items():
+        for fold in range(len(splits)):
+            key = _fold_key(data_key, subset, split_id, fold, params)
+            cached = _read_cached(key, cache_dir)
+            if cached is not None:
+                results[(name, fold)] = dict(cached, cached=True)
+            else:
+                todo.append((name, fold, key))
+
+    # a subset shared by several names is fitted once
+    unique = {}
+    for name, fold, key in todo:
+        unique.setdefault(key, (list(subsets[name]), fold))
+    t0 = time.perf_counter()
+    with mprof.profile_stage('subsets.fit', X):
+        fitted = Parallel(n_jobs=n_jobs)(delayed(_fit_fold)(model, X, y, subset, *splits[fold])
+                                         for subset, fold in unique.values())
+    for key, result in zip(unique, fitted):
+        _write_cached(key, result, cache_dir)
+    for name, fold, key in todo:
+        results[(name, fold)] = dict(_CACHE[key], cached=False)
+    mlog.event(log, 'Subsets: %d, folds: %d, fitted: %d, cached: %d (%.1f s)', len(subsets), len(splits), len(unique),
+               len(results) - len(todo), time.perf_counter() - t0, subsets=len(subsets), folds=len(splits),
+               fitted=len(unique), cached=len(results) - len(todo))
+
+    folds = pd.DataFrame([dict(r, Subset_=name, Fold_=fold) for (name, fold), r in results.items()])
+    g = folds.groupby('Subset_', sort=False)
+    table = pd.DataFrame({'n_features': pd.Series({name: len(s) for name, s in subsets.items()})})
+    for s in SCORES:
+        table[f'{s}_mean'] = g[s].mean()
+        table[f'{s}_std'] = g[s].std()
+    if reference is not None:
+        for s in SCORES:
+            table[f'{s}_diff'] = table.loc[reference, f'{s}_mean'] - table[f'{s}_mean']
+    table['fit_s'] = g['fit_s'].sum()
+    table['cached'] = g['cached'].sum().astype(int)
+    return table.rename_axis('Subset_').round(precission)
+
+
+def _greedy(model, X, y, splits, candidates, start, step, scoring, max_steps, split_id, n_jobs, cache_dir):
+    """
+    Greedy forward (step=+1) or backward (step=-1) search; each step evaluates all one-feature changes of the
+    current subset and keeps the best one.
+    """
+    current = list(start)
+    history = []
+    for k in range(max_steps):
+        moves = [c for c in candidates if c not in current] if step > 0 else list(current)
+        if not moves or (step < 0 and len(current) == 1):
+            break
+        subsets = {m: current + [m] if step > 0 else [f for f in current if f != m] for m in moves}
+        table = evaluate_subsets(model, X, y, subsets, splits, split_id=split_id, n_jobs=n_jobs, cache_dir=cache_dir)
+        best = table[f'{scoring}_mean'].idxmax()
+        current = subsets[best]
+        history.append({'Step_': k + 1, 'Feature_': best, 'Action_': 'add' if step > 0 else 'remove',
+                        'n_features': len(current), **table.loc[best, [f'{s}_mean' for s in SCORES]].to_dict(),
+                        'Features_': list(current)})
+        mlog.event(log, 'Step %d: %s %s (%s: %.3f)', k + 1, history[-1]['Action_'], best, scoring,
+                   table.loc[best, f'{scoring}_mean'], step=k + 1, feature=best, score=table.loc[best, f'{scoring}_mean'])
+    return pd.DataFrame(history)
+
+
+@mprof.profiled
+def forward_selection(model, X, y, splits, candidates=None, start=[], scoring='f1', max_features=None, split_id=None,
+                      n_jobs=None, cache_dir=None):
+    """
+    Greedy forward selection: starting from `start` features, the candidate that gives the best mean CV `scoring`
+    ('f1'/'acc'/'recall'/'prec') is added at each step (up to max_features).
+
+    Returns:
+    --------------------------
+    history - one row per step: the added feature, n_features, mean scores, the selected subset.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    candidates = list(candidates) if candidates is not None else list(X.columns)
+    max_features = max_features if max_features is not None else len(candidates)
+    return _greedy(model, X, y, splits, candidates, start, +1, scoring, max_features - len(start), split_id, n_jobs,
+                   cache_dir)
+
+
+@mprof.profiled
+def backward_elimination(model, X, y, splits, start=None, scoring='f1', min_features=1, split_id=None, n_jobs=None,
+                         cache_dir=None):
+    """
+    Greedy backward elimination: starting from `start` (default: all columns of X), the feature whose removal gives
+    the best mean CV `scoring` is removed at each step (down to min_features).
+
+    Returns:
+    --------------------------
+    history - one row per step: the removed feature, n_features, mean scores, the remaining subset.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    start = list(start) if start is not None else list(X.columns)
+    return _greedy(model, X, y, splits, start, start, -1, scoring, len(start) - min_features, split_id, n_jobs,
+                   cache_dir)
@@ -0,0 +1,230 @@
+"""
+Auxiliary SURVIVAL (time to conversion) functions.
+
+Instead of the binary sMCI / cAD label (mpre.count_sMCI_cAD()), the time to conversion is modelled:
+    - event times and censoring of all subjects from the DX trajectory in one grouped pass,
+    - a Cox proportional hazards model (numpy, Newton-Raphson, Breslow ties and baseline hazard, optional L2 penalty),
+    - Harrell's concordance index,
+    - parallel CV on stored splits (mutils.load_train_val_cv_splits_from_file()).
+
+Usage:
+--------------------------
+ev = msurv.event_times(long)                                 # Time_ (months), Event_ (1: conversion, 0: censored)
+bl_ev = bl.set_index('RID').join(ev, how='inner')
+model = msurv.fit_cox(bl_ev[FEATURES], bl_ev.Time_, bl_ev.Event_, alpha=0.1)
+proba_24 = msurv.predict_conversion_proba(model, X_test, horizon=24)
+cv_df = msurv.cross_validate_cox(bl_ev[FEATURES], bl_ev.Time_, bl_ev.Event_, splits, horizons=[12, 24, 36], n_jobs=-1)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import numpy as np
+import pandas as pd
+
+import mci_log as mlog
+import mci_profile as mprof
+
+log = mlog.get_logger('survival')
+
+
+@mprof.profiled
+def event_times(long, id_col='RID', month_col='Month_bl'):
+    """
+    Event times of subjects with 'MCI' as the first known diagnosis (as in mpre.count_sMCI_cAD()):
+        - converters (cAD): Time_ = month of the first 'Dementia' diagnosis, Event_ = 1,
+        - non converters (sMCI): Time_ = month of the last known 'MCI' diagnosis, Event_ = 0 (censored).
+    Subjects with other diagnoses (e.g. CN) before the event or censoring are skipped.
+
+    Returns:
+    --------------------------
+    a df indexed by id_col with: Time_ (months since baseline), Event_ (1/0), Subgroup_ ('cAD'/'sMCI').
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    dx = long['DX']
+    month = long[month_col].to_numpy(dtype=float)
+    frame = pd.DataFrame({id_col: long[id_col].to_numpy(), 'DX': dx.to_numpy(), 'Month_': month,
+                          'Ad_month_': np.where(dx == 'Dementia', month, np.nan),
+                          'Mci_month_': np.where(dx == 'MCI', month, np.nan),
+                          'Other_month_': np.where(dx.notna() & ~dx.isin(['MCI', 'Dementia']), month, np.nan)})
+    frame = frame.sort_values([id_col, 'Month_'], kind='stable')
+
+    pat = frame.groupby(id_col, sort=True).agg(first=('DX', 'first'), ad=('Ad_month_', 'min'),
+                                               mci=('Mci_month_', 'max'), other=('Other_month_', 'min'))
+    event = pat.ad.notna()
+    time = pat.ad.where(event, pat.mci)
+    keep = (pat['first'] == 'MCI') & ~(pat.other <= time) & time.notna()
+
+    ev = pd.DataFrame({'Time_': time, 'Event_': event.astype(int),
+                       'Subgroup_': np.where(event, 'cAD', 'sMCI')})[keep]
+    mlog.event(log, 'Event times: %d subjects, %d conversions', ev.shape[0], ev.Event_.sum(), subjects=ev.shape[0],
+               events=int(ev.Event_.sum()))
+    return ev
+
+
+def _cox_derivatives(Z, beta, alpha, order, ends, ev_sorted):
+    """
+    The penalized partial log-likelihood (Breslow ties), its gradient and Hessian. Risk set sums of subjects sorted
+    by descending time are cumulative sums; tied times share the risk set (the sum up to the last subject of the tie).
+    """
+    eta = Z @ beta
+    c = eta.max()
+    w = np.exp(eta - c)[order]
+    Zs = Z[order]
+    s0 = np.cumsum(w)[ends][ev_sorted]
+    s1 = np.cumsum(w[:, None] * Zs, axis=0)[ends][ev_sorted]
+    s2 = np.cumsum(w[:, None, None] * Zs[:, :, None] * Zs[:, None, :], axis=0)[ends][ev_sorted]
+
+    m = s1 / s0[:, None]
+    loglik = (eta[order][ev_sorted] - c - np.log(s0)).sum() - 0.5 * alpha * beta @ beta
+    grad = (Zs[ev_sorted] - m).sum(axis=0) - alpha * beta
+    hess = (s2 / s0[:, None, None] - m[:, :, None] * m[:, None, :]).sum(axis=0) + alpha * np.eye(Z.shape[1])
+    return loglik, grad, hess
+
+
+def fit_cox(X, time, event, alpha=0.0, max_iter=50, tol=1e-9):
+    """
+    Fits a Cox proportional hazards model (Breslow ties) by Newton-Raphson with step halving. Features are
+    standardized; alpha is the L2 penalty of standardized coefficients (alpha > 0 helps with collinear features).
+
+    Returns:
+    --------------------------
+    model - a dict with: features, mean, scale, coef (of standardized features), event_times, cum_hazard
+            (the Breslow baseline cumulative hazard at event_times), n_iter, loglik.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    features = list(X.columns) if hasattr(X, 'columns') else list(range(np.shape(X)[1]))
+    X = np.asarray(X, dtype=float)
+    time, event = np.asarray(time, dtype=float), np.asarray(event, dtype=bool)
+    if np.isnan(X).any():
+        raise ValueError('Missing values in X (impute them first).')
+
+    mean, scale = X.mean(axis=0), X.std(axis=0)
+    scale = np.where(scale > 0, scale, 1.0)
+    Z = (X - mean) / scale
+
+    order = np.argsort(-time, kind='stable')
+    t_sorted = time[order]
+    new_tie = np.r_[True, t_sorted[1:] != t_sorted[:-1]]
+    ends = np.flatnonzero(np.r_[new_tie[1:], True])[np.cumsum(new_tie) - 1]
+    ev_sorted = event[order]
+
+    beta = np.zeros(Z.shape[1])
+    loglik, grad, hess = _cox_derivatives(Z, beta, alpha, order, ends, ev_sorted)
+    for it in range(1, max_iter + 1):
+        step = np.linalg.solve(hess, grad)
+        new = _cox_derivatives(Z, beta + step, alpha, order, ends, ev_sorted)
+        for _ in range(30):
+            if new[0] >= loglik:
+                break
+            step = step / 2
+            new = _cox_derivatives(Z, beta + step, alpha, order, ends, ev_sorted)
+        converged = abs(new[0] - loglik) < tol
+        beta = beta + step
+        loglik, grad, hess = new
+        if converged:
+            break
+
+    # Breslow baseline cumulative hazard (at the mean of features)
+    w = np.exp(Z @ beta)[order]
+    s0 = np.cumsum(w)[ends][ev_sorted]
+    cum_hazard = pd.Series(1.0 / s0).groupby(t_sorted[ev_sorted]).sum().sort_index().cumsum()
+
+    mlog.event(log, 'Cox model: %d subjects, %d events, %d iterations, log-likelihood %.3f', X.shape[0], event.sum(),
+               it, loglik, level=mlog.DEBUG, subjects=X.shape[0], events=int(event.sum()), n_iter=it)
+    return {'features': features, 'mean': mean, 'scale': scale, 'coef': beta, 'alpha': alpha,
+            'event_times': cum_hazard.index.to_numpy(), 'cum_hazard': cum_hazard.to_numpy(), 'n_iter': it,
+            'loglik': loglik}
+
+
+def predict_risk(model, X):
+    """
+    Linear predictors (log relative hazards) of subjects; higher values - earlier conversion.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    X = X[model['features']] if hasattr(X, 'columns') else X
+    return ((np.asarray(X, dtype=float) - model['mean']) / model['scale']) @ model['coef']
+
+
+def predict_survival(model, X, times):
+    """
+    Probabilities of no conversion up to each time (months): S(t) = exp(-H0(t) * exp(risk)).
+
+    Returns:
+    --------------------------
+    an array (subjects x times).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    times = np.atleast_1d(np.asarray(times, dtype=float))
+    k = np.searchsorted(model['event_times'], times, side='right')
+    h0 = np.r_[0.0, model['cum_hazard']][k]
+    return np.exp(-np.exp(predict_risk(model, X))[:, None] * h0[None, :])
+
+
+def predict_conversion_proba(model, X, horizon):
+    """
+    Probabilities of conversion to AD within `horizon` months: 1 - S(horizon).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    return 1 - predict_survival(model, X, [horizon])[:, 0]
+
+
+def concordance_index(time, event, risk, chunk_size=2000):
+    """
+    Harrell's concordance index: the fraction of comparable pairs (the subject with the shorter time has an event)
+    in which the subject with the shorter time has a higher risk (ties of risk count 1/2). Vectorized in chunks.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    time, event, risk = (np.asarray(a, dtype=float) for a in (time, event, risk))
+    concordant, comparable = 0.0, 0
+    for start in range(0, time.shape[0], chunk_size):
+        i = np.flatnonzero(event[start:start + chunk_size]) + start
+        shorter = time[i][:, None] < time[None, :]
+        higher = risk[i][:, None] - risk[None, :]
+        comparable += shorter.sum()
+        concordant += ((higher > 0) & shorter).sum() + 0.5 * ((higher == 0) & shorter).sum()
+    return concordant / comparable if comparable else np.nan
+
+
+def _cv_fold(X, time, event, train, val, alpha, horizons):
+    model = fit_cox(X.iloc[train], time.iloc[train], event.iloc[train], alpha=alpha)
+    risk = predict_risk(model, X.iloc[val])
+    res = {'c_index': concordance_index(time.iloc[val], event.iloc[val], risk), 'n_iter': model['n_iter']}
+    t, e = time.iloc[val].to_numpy(), event.iloc[val].to_numpy().astype(bool)
+    for h in horizons:
+        # subjects with a known status at the horizon: converted before it, or followed up to it
+        known = (e & (t <= h)) | (t >= h)
+        proba = predict_conversion_proba(model, X.iloc[val], h)
+        res[f'Converted_{h}_'] = (e & (t <= h))[known].mean() if known.any() else np.nan
+        res[f'Predicted_{h}_'] = proba[known].mean() if known.any() else np.nan
+    return res
+
+
+@mprof.profiled
+def cross_validate_cox(X, time, event, splits, alpha=0.0, horizons=[], n_jobs=None):
+    """
+    CV of the Cox model on stored splits (a list of (train, val) positional indices), folds fitted in parallel.
+
+    Returns:
+    --------------------------
+    a df (one row per fold): c_index (validation), n_iter and for each horizon: the observed fraction of conversions
+    (Converted_<h>_) and the mean predicted conversion probability (Predicted_<h>_) of subjects with a known status.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    from joblib import Parallel, delayed
+
+    time, event = pd.Series(np.asarray(time, dtype=float)), pd.Series(np.asarray(event, dtype=int))
+    X = X.reset_index(drop=True) if hasattr(X, 'columns') else pd.DataFrame(X)
+    folds = Parallel(n_jobs=n_jobs)(delayed(_cv_fold)(X, time, event, train, val, alpha, horizons)
+                                    for train, val in splits)
+    df = pd.DataFrame(folds).rename_axis('Fold_')
+    mlog.event(log, 'Cox CV: %d folds, c-index %.3f +/- %.3f', df.shape[0], df.c_index.mean(), df.c_index.std(),
+               folds=df.shape[0], c_index=df.c_index.mean())
+    return df
@@ -0,0 +1,263 @@
+"""
+Auxiliary SYNTHETIC data functions.
+
+Generates ADNI-like tables (no real ADNI data) with the key structure used in the mci_* modules:
+    - ADNIMERGE-like long table (RID, PTID, VISCODE, EXAMDATE, IMAGEUID, DX trajectories),
+    - source csv files read by mci_linking.link_*: NEUROBAT, ADASSCORES, ADAS_ADNIGO23, GDSCALE, FAQ and a FreeSurfer results file,
+      with duplicated (RID, VISCODE2) rows, negative sentinel values (-1, -4) and 'sc' screening visit codes.
+
+Tables scale from ~1k to ~1M rows (rows of the long table).
+
+Usage:
+--------------------------
+merge = msyn.make_adnimerge(n_rows=10000, random_state=42)
+long = msyn.make_long(merge)
+msyn.write_source_tables(long, DATA_DIR, DATA_DIR_FS)
+long = mlink.link_neurobat(long, DATA_DIR)
+
+(C) MCI group.
+
+Created: 2026.10.19 / Updated: 2026.10.19
+"""
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+FS_FILE_NAME = 'synthetic-all-stats.csv'
+
+PHASES = np.array(['ADNI1', 'ADNIGO', 'ADNI2', 'ADNI3'])
+
+
+def _visit_codes(k):
+    """
+    VISCODE for visit numbers (0 - 'bl', 1 - 'm06', 2 - 'm12', ...).
+    """
+    months = 6 * k
+    codes = np.char.add('m', np.char.zfill(months.astype(str), 2))
+    return np.where(k == 0, 'bl', codes)
+
+
+def _sentinels(values, rng, fraction, sentinel=-1):
+    values = values.astype(float)
+    values[rng.random(values.shape[0]) < fraction] = sentinel
+    return values
+
+
+def make_adnimerge(n_rows=10000, mean_visits=6, random_state=None):
+    """
+    Creates an ADNIMERGE-like table with `n_rows` rows (examinations).
+
+    Subjects have 1 - 3*mean_visits visits every 6 months. Their diagnosis trajectories are:
+        - stable MCI (~45%),
+        - MCI converting to Dementia (~35%),
+        - CN or starting from Dementia (~20%).
+    About 5% of DX values are missing, about 70% of visits have an MR image (IMAGEUID).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    rng = np.random.default_rng(random_state)
+
+    # number of visits of each subject, enough subjects to fill n_rows
+    n_subjects = max(1, int(np.ceil(n_rows / mean_visits * 1.2)))
+    visits = np.clip(rng.geometric(1 / mean_visits, n_subjects), 1, 3 * mean_visits)
+    last = np.searchsorted(np.cumsum(visits), n_rows)
+    visits = visits[:last + 1]
+    visits[-1] -= visits.sum() - n_rows
+    n_subjects = visits.shape[0]
+
+    # subject features
+    rid = np.arange(2, n_subjects + 2)
+    site = rng.integers(2, 942, n_subjects)
+    ptid = np.char.add(np.char.add(np.char.zfill(site.astype(str), 3), '_S_'), np.char.zfill(rid.astype(str), 4))
+    gender = np.where(rng.random(n_subjects) < 0.45, 'Female', 'Male')
+    age = np.round(rng.normal(73, 7, n_subjects).clip(55, 91), 1)
+    educ = rng.integers(8, 21, n_subjects)
+    apoe4 = rng.choice([0., 1., 2., np.nan], n_subjects, p=[0.5, 0.35, 0.12, 0.03])
+    origprot = rng.choice(PHASES, n_subjects, p=[0.35, 0.1, 0.4, 0.15])
+    start = pd.to_datetime('2005-09-01') + pd.to_timedelta(rng.integers(0, 15 * 365, n_subjects), unit='D')
+
+    kind = rng.choice(['sMCI', 'cAD', 'CN', 'AD'], n_subjects, p=[0.45, 0.35, 0.12, 0.08])
+    conv_visit = rng.integers(1, np.maximum(visits, 2))
+
+    # one row for each visit
+    subj = np.repeat(np.arange(n_subjects), visits)
+    k = np.arange(n_rows) - np.repeat(np.cumsum(visits) - visits, visits)
+
+    month = 6 * k
+    years_bl = np.round(month / 12 + rng.normal(0, 0.03, n_rows).clip(-0.05, 0.05) * (k > 0), 4)
+    examdate = (start[subj] + pd.to_timedelta(np.round(years_bl * 365.25), unit='D')).strftime('%Y-%m-%d')
+
+    kind_r = kind[subj]
+    dx = np.where(kind_r == 'CN', 'CN', 'MCI').astype(object)
+    dx[kind_r == 'AD'] = 'Dementia'
+    dx[(kind_r == 'cAD') & (k >= conv_visit[subj])] = 'Dementia'
+    dx_bl = np.select([kind[subj] == 'CN', kind[subj] == 'AD'], ['CN', 'AD'], default='LMCI')
+    dx[rng.random(n_rows) < 0.05] = np.nan
+
+    # phase: subjects move to later ADNI phases over time
+    phase_i = np.minimum(np.searchsorted(PHASES, origprot[subj]) + k // 8, len(PHASES) - 1)
+    imageuid = np.where(rng.random(n_rows) < 0.7, rng.permutation(n_rows) + 10000, np.nan)
+
+    progression = (dx == 'Dementia').astype(float) + (dx == 'MCI') * 0.5
+    faq = np.round(np.clip(progression * 8 + rng.normal(2, 2.5, n_rows), 0, 30))
+    faq[rng.random(n_rows) < 0.1] = np.nan
+
+    merge = pd.DataFrame({'RID': rid[subj], 'PTID': ptid[subj], 'PTGENDER': gender[subj], 'AGE': age[subj],
+                          'PTEDUCAT': educ[subj], 'EXAMDATE': examdate, 'Years_bl': years_bl, 'Month': month,
+                          'Month_bl': np.round(years_bl * 12, 5), 'VISCODE': _visit_codes(k), 'DX': dx, 'DX_bl': dx_bl,
+                          'ORIGPROT': origprot[subj], 'COLPROT': PHASES[phase_i], 'IMAGEUID': imageuid,
+                          'APOE4': apoe4[subj],
+                          'ADAS13': np.round(np.clip(progression * 15 + rng.normal(12, 5, n_rows), 0, 85), 2),
+                          'TRABSCOR': np.round(np.clip(progression * 60 + rng.normal(90, 40, n_rows), 20, 300)),
+                          'RAVLT_perc_forgetting': np.round(np.clip(rng.normal(55, 30, n_rows), -100, 100), 2),
+                          'RAVLT_immediate': np.round(np.clip(rng.normal(35, 10, n_rows) - progression * 8, 0, 75)),
+                          'RAVLT_learning': np.round(np.clip(rng.normal(4, 2.5, n_rows), -5, 14)),
+                          'RAVLT_forgetting': np.round(np.clip(rng.normal(4.5, 2.5, n_rows), -12, 15)),
+                          'ABETA': np.where(k == 0, rng.normal(900, 300, n_rows).round(1), np.nan),
+                          'PTAU': np.where(k == 0, rng.normal(25, 10, n_rows).round(2), np.nan),
+                          'TAU': np.where(k == 0, rng.normal(280, 100, n_rows).round(1), np.nan),
+                          'PTETHCAT': rng.choice(['Not Hisp/Latino', 'Hisp/Latino'], n_rows, p=[0.96, 0.04]),
+                          'PTRACCAT': 'White',
+                          'MMSE': np.round(np.clip(rng.normal(27, 2, n_rows) - progression * 3, 0, 30)),
+                          'CDRSB': np.round(np.clip(progression * 3 + rng.normal(1, 1, n_rows), 0, 18) * 2) / 2,
+                          'LDELTOTAL': np.round(np.clip(rng.normal(7, 4, n_rows) - progression * 3, 0, 25)),
+                          'FAQ': faq})
+    return merge
+
+
+def make_long(merge):
+    """
+    Prepares the long table from an ADNIMERGE(-like) table the same way as in the preprocessing notebook (2.01),
+    i.e. renames columns and adds 'Idx_', 'Age_at_scan_' and 'Imageuid_' columns. The long table is ready to be linked
+    with other scores (mci_linking.link_*).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    long = merge.rename({'COLPROT': 'Phase',
+                         'VISCODE': 'VISCODE3_',
+                         'TRABSCOR': 'TRABSCOR_adni',
+                         'ADAS13': 'ADAS13_adni'}, axis='columns')
+    long['Idx_'] = range(long.shape[0])
+    long['Age_at_scan_'] = long['AGE'].values + long['Years_bl'].values
+    imageuid = long['IMAGEUID']
+    long['Imageuid_'] = ('I' + imageuid.fillna(0).astype(np.int64).astype(str)).where(imageuid.notna(), np.nan)
+    return long
+
+
+def _source_visits(long, rng, fraction=0.9, duplicates=0.002):
+    """
+    A sample of visits (RID, VISCODE2, EXAMDATE, Phase) present in a source table with some duplicated rows.
+    """
+    vis = long[['RID', 'VISCODE3_', 'EXAMDATE', 'Phase']].rename(columns={'VISCODE3_': 'VISCODE2'})
+    vis = vis.loc[rng.random(vis.shape[0]) < fraction]
+    dup = vis.loc[rng.random(vis.shape[0]) < duplicates]
+    return pd.concat([vis, dup]).sort_values(by=['RID', 'EXAMDATE'], kind='stable').reset_index(drop=True)
+
+
+def make_source_tables(long, random_state=None):
+    """
+    Creates source score tables matching visits in the long table (see: make_long()).
+
+    Returns:
+    --------------------------
+    a dict: file name -> table, with keys: 'NEUROBAT.csv', 'ADASSCORES.csv', 'ADAS_ADNIGO23.csv', 'GDSCALE.csv', 'FAQ.csv'
+    and FS_FILE_NAME (FreeSurfer results).
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    rng = np.random.default_rng(random_state)
+    tables = {}
+
+    # NEUROBAT
+    vis = _source_visits(long, rng)
+    n = vis.shape[0]
+    neuro = vis[['Phase', 'RID', 'VISCODE2']].copy()
+    for c, (m, s, hi) in {'TRAASCOR': (45, 20, 150), 'TRABSCOR': (120, 60, 300), 'CLOCKSCOR': (4, 1, 5),
+                          'COPYSCOR': (4.5, 0.7, 5), 'CATANIMSC': (17, 5, 40), 'ANARTERR': (12, 8, 50),
+                          'AVTOT6': (6, 3, 15), 'AVDEL30MIN': (4, 4, 15), 'AVDELTOT': (11, 3, 15),
+                          'AVTOTB': (4, 2, 15)}.items():
+        neuro[c] = _sentinels(np.round(np.clip(rng.normal(m, s, n), 0, hi)), rng, 0.02)
+    neuro['EXAMDATE'] = vis['EXAMDATE']
+    tables['NEUROBAT.csv'] = neuro
+
+    # ADAS (ADNI1 and ADNIGO/2/3 files have different column names)
+    vis = _source_visits(long, rng, duplicates=0)
+    n = vis.shape[0]
+    q = {f'Q{i}': _sentinels(np.round(np.clip(rng.normal(2, 1.5, n), 0, 10)), rng, 0.01, -4) for i in range(1, 14)}
+    total = _sentinels(np.round(np.clip(rng.normal(17, 8, n), 0, 85), 2), rng, 0.01)
+    adni1 = (vis.Phase == 'ADNI1').to_numpy()
+
+    adas1 = pd.DataFrame({'RID': vis.RID, 'VISCODE': vis.VISCODE2, 'TOTALMOD': total})
+    for i in range(1, 13):
+        adas1[f'Q{i}'] = q[f'Q{i}']
+    adas1['Q14'] = q['Q13']
+    tables['ADASSCORES.csv'] = adas1.loc[adni1]
+
+    adas23go = pd.DataFrame({'Phase': vis.Phase, 'RID': vis.RID, 'VISCODE2': vis.VISCODE2, 'TOTAL13': total})
+    for i in range(1, 14):
+        adas23go[f'Q{i}SCORE'] = q[f'Q{i}']
+    tables['ADAS_ADNIGO23.csv'] = adas23go.loc[~adni1]
+
+    # GDSCALE (screening visits coded as 'sc')
+    vis = _source_visits(long, rng)
+    gds = vis[['Phase', 'RID', 'VISCODE2', 'EXAMDATE']].copy()
+    gds['VISCODE2'] = gds['VISCODE2'].replace('bl', 'sc')
+    gds['GDTOTAL'] = _sentinels(np.round(np.clip(rng.normal(2, 2, gds.shape[0]), 0, 15)), rng, 0.01, -4)
+    tables['GDSCALE.csv'] = gds
+
+    # FAQ (screening visits coded as 'sc')
+    vis = _source_visits(long, rng)
+    n = vis.shape[0]
+    faq = vis[['Phase', 'RID', 'VISCODE2', 'EXAMDATE']].copy()
+    faq['VISCODE2'] = faq['VISCODE2'].replace('bl', 'sc')
+    faq['FAQSOURCE'] = rng.choice([1., 2.], n)
+    items = ['FAQFINAN', 'FAQFORM', 'FAQSHOP', 'FAQGAME', 'FAQBEVG', 'FAQMEAL', 'FAQEVENT', 'FAQTV', 'FAQREM', 'FAQTRAVL']
+    for c in items:
+        faq[c] = rng.choice([0., 1., 2., 3., 4., 5., -1.], n, p=[0.6, 0.15, 0.08, 0.08, 0.04, 0.04, 0.01])
+    faq['FAQTOTAL'] = faq[items].clip(lower=0).sum(axis=1)
+    tables['FAQ.csv'] = faq
+
+    # FreeSurfer results (one row for each MR image)
+    img = long.loc[long.Imageuid_.notna(), ['PTID', 'Imageuid_']]
+    n = img.shape[0]
+    fs = pd.DataFrame({'subject': img.PTID.to_numpy(), 'tp_imageuid': img.Imageuid_.to_numpy()})
+    etiv = rng.normal(1.5e6, 1.5e5, n)
+    for kind in ['cross', 'long']:
+        for side in ['Left', 'Right']:
+            fs[f'{side}-Lateral-Ventricle_{kind}'] = np.round(np.clip(rng.normal(2e4, 1e4, n), 3e3, 9e4), 1)
+            fs[f'{side}-Hippocampus_{kind}'] = np.round(rng.normal(3500, 500, n), 1)
+        fs[f'eTIV_x_{kind}'] = np.round(etiv, 1)
+        fs[f'eTIV_y_{kind}'] = np.round(etiv, 1)
+    fs['cross_complete'] = rng.random(n) < 0.97
+    fs['long_complete'] = rng.random(n) < 0.95
+    tables[FS_FILE_NAME] = fs
+
+    return tables
+
+
+def write_source_tables(long, DATA_DIR, DATA_DIR_FS=None, random_state=None, merge=None):
+    """
+    Writes synthetic source csv files (see: make_source_tables()) to DATA_DIR, and the FreeSurfer file to DATA_DIR_FS
+    (default: DATA_DIR). If `merge` is given, it is saved as 'ADNIMERGE.csv'.
+
+    Returns:
+    --------------------------
+    a dict: file name -> path.
+
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    DATA_DIR = Path(DATA_DIR)
+    DATA_DIR_FS = Path(DATA_DIR_FS) if DATA_DIR_FS else DATA_DIR
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    DATA_DIR_FS.mkdir(parents=True, exist_ok=True)
+
+    paths = {}
+    for name, table in make_source_tables(long, random_state).items():
+        pth = (DATA_DIR_FS if name == FS_FILE_NAME else DATA_DIR) / name
+        table.to_csv(pth, index=False)
+        paths[name] = pth
+    if merge is not None:
+        paths['ADNIMERGE.csv'] = DATA_DIR / 'ADNIMERGE.csv'
+        merge.to_csv(paths['ADNIMERGE.csv'], index=False)
+    return paths
@@ -4,8 +4,13 @@ Auxiliary UTiLS functions to MCI tables.
 (C) MCI group.
 
 Created: 2021.03.30
-Updated: 2021.10.06
+Updated: 2026.10.19
 """
+import mci_log as mlog
+import mci_profile as mprof
+
+log = mlog.get_logger('utils')
+
 
 def package_versions(installedOnly=False, theMostImportant=[]):
     """
@@ -116,6 +121,7 @@ def textWrap(text):
     print(p * '#')
 
     
+@mprof.profiled
 def rename_columns(df, dc_names, verbose=True):
     """
     Rename column names in a df. Function returns a COPY of original df with a new column names.
@@ -140,16 +146,16 @@ def rename_columns(df, dc_names, verbose=True):
     
     for k in keys_new:        
         if k not in keys_old:
-            print(f'Wrong column name: {k}')
-    print()
+            mlog.event(log, 'Wrong column name: %s', k, level=mlog.WARNING, column=k)
             
             
-    if verbose: print(f'OLD names:\n{df.columns}\n')
+    if verbose: log.info('OLD names:\n%s\n', df.columns)
     df_new = df.rename(columns=dc_names)    
-    if verbose: print(f'NEW names:\n{df_new.columns}\n')
+    if verbose: log.info('NEW names:\n%s\n', df_new.columns)
     
     return df_new
 
+@mprof.profiled
 def load_train_val_cv_splits_from_file(kfolds_file, CV):
     """
     Gets test/split indices from saved csv file for different fold number (k={10,20,50,...}). This is to have the same subject split
@@ -192,3 +198,152 @@ def load_train_val_cv_splits_from_file(kfolds_file, CV):
         SPLITS.append([np.array(train_index_index), np.array(validation_index_index)])        
     #print(df.loc[validation_index, col])    
     return SPLITS
+
+
+def hash_data(*objs):
+    """
+    A stable hash (hex string) of data objects, e.g. to check if input data or parameters of a cached result have changed.
+    
+    DataFrames and Series are hashed by values, index and column names; numpy arrays by their bytes, 
+    dtype and shape; dicts, lists and tuples recursively; other objects by their repr().
+    
+    Usage:
+    --------------------------
+    key = hash_data(X_train, y_train, {'n_estimators':500})
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import hashlib
+    import numpy as np
+    import pandas as pd
+    
+    h = hashlib.sha1()
+    
+    def _update(obj):
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            h.update(type(obj).__name__.encode())
+            h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+            if isinstance(obj, pd.DataFrame):
+                h.update(repr(list(obj.columns)).encode())
+                h.update(repr(list(obj.dtypes.astype(str))).encode())
+            else:
+                h.update(repr((obj.name, str(obj.dtype))).encode())
+        elif isinstance(obj, np.ndarray):
+            h.update(repr((obj.dtype.str, obj.shape)).encode())
+            h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+        elif isinstance(obj, dict):
+            h.update(b'{')
+            for k in sorted(obj, key=repr):
+                _update(k)
+                _update(obj[k])
+            h.update(b'}')
+        elif isinstance(obj, (list, tuple)):
+            h.update(b'[' if isinstance(obj, list) else b'(')
+            for o in obj:
+                _update(o)
+            h.update(b']')
+        elif callable(obj) and hasattr(obj, '__qualname__'):
+            h.update(f'{getattr(obj, "__module__", "")}.{obj.__qualname__}'.encode())
+        else:
+            h.update(repr(obj).encode())
+    
+    for o in objs:
+        _update(o)
+    return h.hexdigest()
+
+
+#######################################################################################################################################
+# EXECUTION MODE:
+#   'inplace' - (default) helpers add new columns to the input table (e.g. count_* functions, train_test_split_baseline),
+#   'pure'    - helpers return new tables and never modify their inputs. pandas Copy-on-Write is switched on, so new tables
+#               share buffers of unchanged columns with the input table (no full table copy at each stage); the previous
+#               pandas option is restored when the mode is set back to 'inplace'.
+_EXECUTION_MODE = 'inplace'
+# the pandas 'mode.copy_on_write' option before switching to 'pure' (None: not changed by set_execution_mode())
+_COW_BEFORE = None
+
+
+def set_execution_mode(mode='pure'):
+    """
+    Sets the execution mode of mci_* helpers: 'inplace' or 'pure' (see above). Use execution_mode() to set it
+    for a block of code only.
+    
+    Usage:
+    --------------------------
+    mutils.set_execution_mode('pure')
+    long2 = mpre.count_visits_for_patient(long)  # long is not changed
+    mutils.set_execution_mode('inplace')         # pandas Copy-on-Write as before
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import pandas as pd
+    global _EXECUTION_MODE, _COW_BEFORE
+    
+    if mode not in ('inplace', 'pure'):
+        raise ValueError(f"Wrong execution mode: {mode} (use: 'inplace' / 'pure')")
+    if mode == 'pure' and not copy_on_write_enabled():
+        _COW_BEFORE = pd.get_option('mode.copy_on_write')
+        pd.set_option('mode.copy_on_write', True)
+    elif mode == 'inplace' and _COW_BEFORE is not None:
+        pd.set_option('mode.copy_on_write', _COW_BEFORE)
+        _COW_BEFORE = None
+    _EXECUTION_MODE = mode
+    mlog.event(log, 'Execution mode: %s (Copy-on-Write: %s)', mode, copy_on_write_enabled(), mode=mode)
+
+
+class execution_mode:
+    """
+    A context manager to run a block of code in an execution mode; the previous mode (and the pandas Copy-on-Write
+    option) is restored at the end.
+    
+    with mutils.execution_mode('pure'):
+        long2 = mpre.count_visits_for_patient(long)
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    __slots__ = ('mode', '_mode0')
+
+    def __init__(self, mode='pure'):
+        self.mode = mode
+
+    def __enter__(self):
+        self._mode0 = _EXECUTION_MODE
+        set_execution_mode(self.mode)
+        return self
+
+    def __exit__(self, *exc):
+        set_execution_mode(self._mode0)
+        return False
+    
+
+def get_execution_mode():
+    return _EXECUTION_MODE
+
+
+def copy_on_write_enabled():
+    """
+    True if pandas Copy-on-Write is on (always on in pandas >= 3.0).
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    import pandas as pd
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return bool(pd.get_option('mode.copy_on_write'))
+
+
+def assign_columns(df, columns):
+    """
+    Adds (or replaces) columns in df according to the execution mode:
+        'inplace' - columns are set in df, df is returned,
+        'pure' - a new table is returned (df.assign()), df is not changed.
+    
+    columns - a dict: column name -> values.
+    
+    C: 2026.10.19 / U: 2026.10.19
+    """
+    if _EXECUTION_MODE == 'pure':
+        return df.assign(**columns)
+    for c, v in columns.items():
+        df[c] = v
+    return df